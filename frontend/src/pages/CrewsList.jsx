@@ -6,29 +6,35 @@ function CrewsList() {
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState(null)
   const [page, setPage] = useState(1)
+  const [cursor, setCursor] = useState(null)
   const [count, setCount] = useState(0)
   const [next, setNext] = useState(null)
   const [previous, setPrevious] = useState(null)
 
   useEffect(() => {
     fetchCrews()
-  }, [page])
+  }, [cursor])
 
   const fetchCrews = async () => {
     setLoading(true)
     setError(null)
     try {
       const url = new URL('/api/crews/', window.location.origin)
-      url.searchParams.append('page', page)
+      // Pagination par curseur: le total n'est demandé que pour la première page
+      if (cursor) {
+        url.searchParams.append('cursor', cursor)
+      } else {
+        url.searchParams.append('count', 'true')
+      }
       
       const response = await fetch(url)
       if (!response.ok) throw new Error('Erreur lors du chargement')
       
       const data = await response.json()
       setCrews(data.results || [])
-      setCount(data.count || 0)
-      setNext(data.next)
-      setPrevious(data.previous)
+      if (data.count !== undefined) setCount(data.count)
+      setNext(data.next ? new URL(data.next).searchParams.get('cursor') : null)
+      setPrevious(data.previous ? new URL(data.previous).searchParams.get('cursor') : null)
     } catch (err) {
       setError(err.message)
     } finally {
@@ -80,17 +86,23 @@ function CrewsList() {
 
       <div className="flex justify-center items-center gap-4 mt-8">
         <button
-          onClick={() => setPage(p => Math.max(1, p - 1))}
+          onClick={() => {
+            setCursor(previous)
+            setPage(p => Math.max(1, p - 1))
+          }}
           disabled={!previous}
           className="px-6 py-2 bg-op-red text-white font-semibold rounded hover:bg-op-red-dark disabled:opacity-50 disabled:cursor-not-allowed transition-colors"
         >
           Précédent
         </button>
         <span className="text-gray-700 font-semibold">
-          Page {page} sur {Math.ceil(count / 10)}
+          Page {page} sur {Math.max(1, Math.ceil(count / 10))}
         </span>
         <button
-          onClick={() => setPage(p => p + 1)}
+          onClick={() => {
+            setCursor(next)
+            setPage(p => p + 1)
+          }}
           disabled={!next}
           className="px-6 py-2 bg-op-red text-white font-semibold rounded hover:bg-op-red-dark disabled:opacity-50 disabled:cursor-not-allowed transition-colors"
         >
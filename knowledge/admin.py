@@ -1,19 +1,19 @@
 from django.contrib import admin
-from django.http import HttpResponse
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db.models import Case, Count, OuterRef, Subquery, When
+from django.forms.models import BaseInlineFormSet
+from django.db.models.functions import Coalesce
+from django.http import FileResponse, Http404, HttpResponseRedirect, StreamingHttpResponse
 from django.utils.html import format_html
 from django.urls import path, reverse
-from django.shortcuts import redirect
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
-import csv
-from io import BytesIO
-from datetime import datetime
+from django.shortcuts import get_object_or_404
+import os
 
-from .models import Character, Crew, Arc, Episode, DevilFruit, FruitHolder
+from . import exports, jobs
+from .autocomplete import AUTOCOMPLETE_MODELS, index as autocomplete_index
+from .pagination import EstimatedCountPaginator
+from .models import Character, Crew, Arc, Episode, DevilFruit, FruitHolder, ExportJob
 
 
 class EpisodeInline(admin.TabularInline):
@@ -23,15 +23,152 @@ class EpisodeInline(admin.TabularInline):
     fields = ['number', 'title', 'air_date']
 
 
+class FruitHolderFormSet(BaseInlineFormSet):
+    """Un seul détenteur actuel par fruit après enregistrement du formulaire.
+
+    La contrainte ``unique_current_holder_per_fruit`` n'est pas vérifiée par les
+    lignes d'un inline dont elle porte sur la clé étrangère (``devil_fruit`` sous
+    un fruit), ni entre les lignes d'un même envoi: l'état final (lignes du
+    formulaire, autres détenteurs actuels en base) est vérifié ici.
+    """
+
+    def clean(self):
+        super().clean()
+        if any(self.errors):
+            return
+        current, edited = {}, set()
+        for form in self.forms:
+            if form.instance.pk is None and not form.has_changed():
+                continue
+            if form.instance.pk is not None:
+                edited.add(form.instance.pk)
+            if self.can_delete and self._should_delete_form(form):
+                continue
+            if form.cleaned_data.get('is_current'):
+                fruit = self.instance if self.fk.name == 'devil_fruit' else form.cleaned_data['devil_fruit']
+                current.setdefault(fruit.pk, []).append(form)
+        stored = (
+            FruitHolder.objects.filter(devil_fruit_id__in=[pk for pk in current if pk is not None], is_current=True)
+            .exclude(pk__in=edited).values_list('devil_fruit_id', flat=True)
+        )
+        for fruit_id in stored:
+            current[fruit_id].append(None)
+        if any(len(holders) > 1 for holders in current.values()):
+            raise ValidationError(next(
+                constraint.violation_error_message for constraint in FruitHolder._meta.constraints
+                if constraint.name == 'unique_current_holder_per_fruit'
+            ))
+
+    def save_existing_objects(self, commit=True):
+        # Les détenteurs qui cessent d'être actuels d'abord: la base vérifie la contrainte ligne par ligne
+        initial = self.initial_form_count()
+        self.forms[:initial] = sorted(self.forms[:initial], key=lambda form: bool(form.cleaned_data.get('is_current')))
+        return super().save_existing_objects(commit)
+
+
 class FruitHolderInline(admin.TabularInline):
     """Inline pour les détenteurs de fruits"""
     model = FruitHolder
+    formset = FruitHolderFormSet
     extra = 1
     fields = ['character', 'from_date', 'to_date', 'is_current']
+    autocomplete_fields = ['character']
+
+
+class CharacterFruitInline(admin.TabularInline):
+    """Inline pour les fruits détenus par un personnage"""
+    model = FruitHolder
+    formset = FruitHolderFormSet
+    extra = 1
+    fields = ['devil_fruit', 'from_date', 'to_date', 'is_current']
+    autocomplete_fields = ['devil_fruit']
+
+
+# Nombre maximal de propositions d'un widget d'autocomplétion
+ADMIN_AUTOCOMPLETE_LIMIT = 60
+
+
+class IndexedAutocompleteMixin:
+    """Widgets d'autocomplétion servis par l'index en mémoire de /api/search/ (préfixes, fautes de frappe).
+
+    Les résultats sont classés par pertinence; la recherche de la liste de
+    l'admin (search_fields) est inchangée.
+    """
+    
+    def get_search_results(self, request, queryset, search_term):
+        match = request.resolver_match
+        if not search_term or match is None or match.url_name != 'autocomplete':
+            return super().get_search_results(request, queryset, search_term)
+        kind = AUTOCOMPLETE_MODELS[self.model][0]
+        ids = [result['id'] for result in autocomplete_index.search(search_term, ADMIN_AUTOCOMPLETE_LIMIT, {kind})]
+        if not ids:
+            return queryset.none(), False
+        ranking = Case(*[When(pk=pk, then=position) for position, pk in enumerate(ids)])
+        return queryset.filter(pk__in=ids).order_by(ranking), False
+
+
+class ScalableChangeListMixin:
+    """Listes au nombre de requêtes fixe: relations jointes, comptage borné"""
+    paginator = EstimatedCountPaginator
+    # Pas de second COUNT(*) sur toute la table sous une liste filtrée
+    show_full_result_count = False
+
+
+class BackgroundExportMixin:
+    """Actions d'export exécutées en arrière-plan (knowledge.jobs)"""
+    
+    def start_export(self, request, kind, objects):
+        """Lance l'export des ``objects`` (queryset ou ids, dans l'ordre d'export)"""
+        if hasattr(objects, 'values_list'):
+            objects = objects.values_list('pk', flat=True)
+        job = jobs.submit(kind, objects, request.user)
+        url = reverse('admin:knowledge_exportjob_change', args=[job.pk])
+        self.message_user(request, format_html(
+            'Export lancé en arrière-plan: <a href="{}">suivre l\'export #{}</a>', url, job.pk
+        ))
+
+
+class StreamingCSVMixin:
+    """Export CSV téléchargé au fil de la lecture: action sur la sélection, ou bouton
+    « Exporter CSV (liste filtrée) » pour toute la liste sans rien sélectionner"""
+    csv_export = None  # clé de exports.CSV_EXPORTS
+    change_list_template = 'admin/knowledge/change_list_csv.html'
+    
+    def csv_response(self, queryset):
+        filename = exports.CSV_EXPORTS[self.csv_export][3]
+        response = StreamingHttpResponse(
+            exports.stream_csv(self.csv_export, queryset), content_type='text/csv; charset=utf-8'
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    
+    def export_csv(self, request, queryset):
+        """Export CSV des lignes sélectionnées"""
+        return self.csv_response(queryset)
+    
+    export_csv.short_description = "Exporter CSV"
+    
+    def get_urls(self):
+        opts = self.model._meta
+        return [
+            path('export-csv/', self.admin_site.admin_view(self.export_csv_view),
+                 name=f'{opts.app_label}_{opts.model_name}_export_csv'),
+        ] + super().get_urls()
+    
+    def export_csv_view(self, request):
+        """Export CSV de toute la liste, avec les filtres, la recherche et le tri en cours"""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        try:
+            changelist = self.get_changelist_instance(request)
+        except IncorrectLookupParameters:
+            opts = self.model._meta
+            return HttpResponseRedirect(reverse(f'admin:{opts.app_label}_{opts.model_name}_changelist') + '?e=1')
+        return self.csv_response(changelist.queryset)
 
 
 @admin.register(Arc)
-class ArcAdmin(admin.ModelAdmin):
+class ArcAdmin(ScalableChangeListMixin, IndexedAutocompleteMixin, admin.ModelAdmin):
     list_display = ['name', 'saga', 'start_episode_number', 'end_episode_number']
     list_filter = ['saga']
     search_fields = ['name', 'saga', 'description']
@@ -40,331 +177,169 @@ class ArcAdmin(admin.ModelAdmin):
 
 
 @admin.register(Episode)
-class EpisodeAdmin(admin.ModelAdmin):
+class EpisodeAdmin(ScalableChangeListMixin, IndexedAutocompleteMixin, admin.ModelAdmin):
     list_display = ['number', 'title', 'arc', 'air_date']
+    list_select_related = ['arc']
     list_filter = ['arc', 'air_date']
     search_fields = ['title']
+    autocomplete_fields = ['arc']
     ordering = ['number']
 
 
 @admin.register(Crew)
-class CrewAdmin(admin.ModelAdmin):
+class CrewAdmin(ScalableChangeListMixin, IndexedAutocompleteMixin, BackgroundExportMixin, admin.ModelAdmin):
     list_display = ['name', 'ship_name', 'base_location', 'captain', 'member_count']
+    list_select_related = ['captain']
     list_filter = ['base_location']
     search_fields = ['name', 'ship_name', 'base_location']
     ordering = ['name']
     filter_horizontal = ['members']
+    autocomplete_fields = ['captain']
+    
+    actions = ['export_members_pdf']
+    
+    def get_queryset(self, request):
+        # Nombre de membres calculé par la requête de la liste, pour les seules lignes de la
+        # page (sous-requête corrélée plutôt qu'un GROUP BY sur tous les équipages)
+        members = (
+            Character.crews.through.objects
+            .filter(crew=OuterRef('pk'))
+            .order_by()
+            .values('crew')
+            .annotate(total=Count('pk'))
+            .values('total')
+        )
+        return super().get_queryset(request).annotate(member_total=Coalesce(Subquery(members), 0))
     
     def member_count(self, obj):
-        return obj.members.count()
+        return obj.member_total
     member_count.short_description = 'Nombre de membres'
+    member_count.admin_order_field = 'member_total'
+    
+    def export_members_pdf(self, request, queryset):
+        """Fiches PDF des membres des équipages sélectionnés, équipage par équipage"""
+        members = (
+            Character.crews.through.objects
+            .filter(crew__in=queryset)
+            .order_by('crew__name', 'character__name')
+            .values_list('character_id', flat=True)
+        )
+        self.start_export(request, ExportJob.Kind.CHARACTERS_PDF, dict.fromkeys(members))
+    
+    export_members_pdf.short_description = "Exporter les fiches PDF des membres"
 
 
 @admin.register(DevilFruit)
-class DevilFruitAdmin(admin.ModelAdmin):
+class DevilFruitAdmin(ScalableChangeListMixin, IndexedAutocompleteMixin, StreamingCSVMixin, BackgroundExportMixin,
+                      admin.ModelAdmin):
     list_display = ['name', 'romanji', 'fruit_type', 'rarity', 'status']
     list_filter = ['fruit_type', 'status', 'rarity']
     search_fields = ['name', 'romanji', 'ability', 'description']
     ordering = ['name']
+    autocomplete_fields = ['first_appearance_arc']
     inlines = [FruitHolderInline]
+    csv_export = 'fruits'
     
-    actions = ['export_pdf', 'export_csv']
+    actions = ['export_pdf', 'export_pdf_zip', 'export_csv', 'export_csv_background']
     
     def export_pdf(self, request, queryset):
-        """Export PDF pour les fruits du démon"""
-        if queryset.count() != 1:
-            self.message_user(request, "Veuillez sélectionner exactement un fruit du démon.", level='error')
-            return
-        
-        fruit = queryset.first()
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        story = []
-        
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#1a1a1a'),
-            spaceAfter=30,
-            alignment=TA_CENTER
-        )
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=16,
-            textColor=colors.HexColor('#333333'),
-            spaceAfter=12
-        )
-        
-        # Titre
-        story.append(Paragraph(f"Fiche Fruit du Démon: {fruit.name}", title_style))
-        story.append(Spacer(1, 0.3*inch))
-        
-        # Informations principales
-        data = [
-            ['Nom', fruit.name],
-            ['Romanji', fruit.romanji or 'N/A'],
-            ['Type', fruit.get_fruit_type_display()],
-            ['Rareté', str(fruit.rarity) + '/5'],
-            ['Statut', fruit.get_status_display()],
-        ]
-        
-        if fruit.first_appearance_arc:
-            data.append(['Première apparition', fruit.first_appearance_arc.name])
-        
-        table = Table(data, colWidths=[2*inch, 4*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.grey),
-            ('TEXTCOLOR', (0, 0), (0, -1), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('BACKGROUND', (1, 0), (1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        story.append(table)
-        story.append(Spacer(1, 0.3*inch))
-        
-        # Capacité
-        story.append(Paragraph("Capacité", heading_style))
-        story.append(Paragraph(fruit.ability, styles['Normal']))
-        story.append(Spacer(1, 0.2*inch))
-        
-        # Faiblesses
-        if fruit.weaknesses:
-            story.append(Paragraph("Faiblesses", heading_style))
-            story.append(Paragraph(fruit.weaknesses, styles['Normal']))
-            story.append(Spacer(1, 0.2*inch))
-        
-        # Description
-        if fruit.description:
-            story.append(Paragraph("Description", heading_style))
-            story.append(Paragraph(fruit.description, styles['Normal']))
-            story.append(Spacer(1, 0.2*inch))
-        
-        # Détenteurs
-        holders = fruit.holders.all().order_by('-is_current', '-from_date')
-        if holders:
-            story.append(Paragraph("Détenteurs", heading_style))
-            holder_data = [['Personnage', 'Date début', 'Date fin', 'Actuel']]
-            for holder in holders:
-                holder_data.append([
-                    holder.character.name,
-                    str(holder.from_date) if holder.from_date else 'N/A',
-                    str(holder.to_date) if holder.to_date else 'N/A',
-                    'Oui' if holder.is_current else 'Non'
-                ])
-            holder_table = Table(holder_data, colWidths=[2*inch, 1.5*inch, 1.5*inch, 1*inch])
-            holder_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 9),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            story.append(holder_table)
-            story.append(Spacer(1, 0.2*inch))
-        
-        # Date de génération
-        story.append(Spacer(1, 0.3*inch))
-        story.append(Paragraph(
-            f"<i>Généré le {datetime.now().strftime('%d/%m/%Y à %H:%M:%S')}</i>",
-            styles['Normal']
-        ))
-        
-        doc.build(story)
-        buffer.seek(0)
-        
-        response = HttpResponse(buffer, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="fruit_{fruit.name.replace(" ", "_")}.pdf"'
-        return response
+        """Export PDF pour les fruits du démon: toutes les fiches dans un document"""
+        self.start_export(request, ExportJob.Kind.FRUITS_PDF, queryset)
     
-    export_pdf.short_description = "Exporter fiche PDF"
+    export_pdf.short_description = "Exporter les fiches PDF (un document)"
     
-    def export_csv(self, request, queryset):
-        """Export CSV pour les fruits du démon"""
-        response = HttpResponse(content_type='text/csv; charset=utf-8')
-        response['Content-Disposition'] = 'attachment; filename="devil_fruits_export.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow(['Nom', 'Romanji', 'Type', 'Capacité', 'Rareté', 'Statut', 'Arc première apparition'])
-        
-        for fruit in queryset:
-            writer.writerow([
-                fruit.name,
-                fruit.romanji,
-                fruit.get_fruit_type_display(),
-                fruit.ability[:100],  # Limiter la longueur
-                fruit.rarity,
-                fruit.get_status_display(),
-                fruit.first_appearance_arc.name if fruit.first_appearance_arc else ''
-            ])
-        
-        return response
+    def export_pdf_zip(self, request, queryset):
+        """Export PDF pour les fruits du démon: une fiche par fichier, dans un ZIP"""
+        self.start_export(request, ExportJob.Kind.FRUITS_PDF_ZIP, queryset)
     
-    export_csv.short_description = "Exporter CSV"
+    export_pdf_zip.short_description = "Exporter les fiches PDF (ZIP)"
+    
+    def export_csv_background(self, request, queryset):
+        """Export CSV pour les fruits du démon, enregistré par un job d'export"""
+        self.start_export(request, ExportJob.Kind.FRUITS_CSV, queryset)
+    
+    export_csv_background.short_description = "Exporter CSV (en arrière-plan)"
 
 
 @admin.register(Character)
-class CharacterAdmin(admin.ModelAdmin):
+class CharacterAdmin(ScalableChangeListMixin, IndexedAutocompleteMixin, StreamingCSVMixin, BackgroundExportMixin,
+                     admin.ModelAdmin):
     list_display = ['name', 'epithet', 'role', 'bounty', 'status', 'origin']
     list_filter = ['role', 'status']
     search_fields = ['name', 'epithet', 'description']
     ordering = ['name']
-    filter_horizontal = ['crews']
-    inlines = [FruitHolderInline]
+    autocomplete_fields = ['crews', 'first_appearance_episode']
+    inlines = [CharacterFruitInline]
+    csv_export = 'characters'
     
-    actions = ['export_pdf', 'export_csv']
+    actions = ['export_pdf', 'export_pdf_zip', 'export_csv', 'export_csv_background']
     
     def export_pdf(self, request, queryset):
-        """Export PDF pour les personnages"""
-        if queryset.count() != 1:
-            self.message_user(request, "Veuillez sélectionner exactement un personnage.", level='error')
-            return
-        
-        character = queryset.first()
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4)
-        story = []
-        
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#1a1a1a'),
-            spaceAfter=30,
-            alignment=TA_CENTER
-        )
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=16,
-            textColor=colors.HexColor('#333333'),
-            spaceAfter=12
-        )
-        
-        # Titre
-        story.append(Paragraph(f"Fiche Personnage: {character.name}", title_style))
-        if character.epithet:
-            story.append(Paragraph(f"<i>{character.epithet}</i>", styles['Normal']))
-        story.append(Spacer(1, 0.3*inch))
-        
-        # Informations principales
-        data = [
-            ['Nom', character.name],
-            ['Surnom', character.epithet or 'N/A'],
-            ['Rôle', character.get_role_display()],
-            ['Prime', f"{character.bounty:,} Berries" if character.bounty > 0 else 'Aucune'],
-            ['Origine', character.origin or 'N/A'],
-            ['Statut', character.get_status_display()],
-        ]
-        
-        if character.first_appearance_episode:
-            data.append(['Première apparition', f"Épisode #{character.first_appearance_episode.number}: {character.first_appearance_episode.title}"])
-        
-        table = Table(data, colWidths=[2*inch, 4*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.grey),
-            ('TEXTCOLOR', (0, 0), (0, -1), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('BACKGROUND', (1, 0), (1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        story.append(table)
-        story.append(Spacer(1, 0.3*inch))
-        
-        # Description
-        if character.description:
-            story.append(Paragraph("Description", heading_style))
-            story.append(Paragraph(character.description, styles['Normal']))
-            story.append(Spacer(1, 0.2*inch))
-        
-        # Équipages
-        crews = character.crews.all()
-        if crews:
-            story.append(Paragraph("Équipages", heading_style))
-            crew_list = ', '.join([crew.name for crew in crews])
-            story.append(Paragraph(crew_list, styles['Normal']))
-            story.append(Spacer(1, 0.2*inch))
-        
-        # Fruits du démon
-        fruit_holders = character.fruit_history.all().order_by('-is_current', '-from_date')
-        if fruit_holders:
-            story.append(Paragraph("Fruits du démon", heading_style))
-            fruit_data = [['Fruit', 'Date début', 'Date fin', 'Actuel']]
-            for holder in fruit_holders:
-                fruit_data.append([
-                    holder.devil_fruit.name,
-                    str(holder.from_date) if holder.from_date else 'N/A',
-                    str(holder.to_date) if holder.to_date else 'N/A',
-                    'Oui' if holder.is_current else 'Non'
-                ])
-            fruit_table = Table(fruit_data, colWidths=[2.5*inch, 1.5*inch, 1.5*inch, 0.5*inch])
-            fruit_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 9),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            story.append(fruit_table)
-            story.append(Spacer(1, 0.2*inch))
-        
-        # Date de génération
-        story.append(Spacer(1, 0.3*inch))
-        story.append(Paragraph(
-            f"<i>Généré le {datetime.now().strftime('%d/%m/%Y à %H:%M:%S')}</i>",
-            styles['Normal']
-        ))
-        
-        doc.build(story)
-        buffer.seek(0)
-        
-        response = HttpResponse(buffer, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="character_{character.name.replace(" ", "_")}.pdf"'
-        return response
+        """Export PDF pour les personnages: toutes les fiches dans un document"""
+        self.start_export(request, ExportJob.Kind.CHARACTERS_PDF, queryset)
     
-    export_pdf.short_description = "Exporter fiche PDF"
+    export_pdf.short_description = "Exporter les fiches PDF (un document)"
     
-    def export_csv(self, request, queryset):
-        """Export CSV pour les personnages"""
-        response = HttpResponse(content_type='text/csv; charset=utf-8')
-        response['Content-Disposition'] = 'attachment; filename="characters_export.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow(['Nom', 'Surnom', 'Rôle', 'Prime', 'Origine', 'Statut', 'Épisode première apparition'])
-        
-        for character in queryset:
-            writer.writerow([
-                character.name,
-                character.epithet,
-                character.get_role_display(),
-                character.bounty,
-                character.origin,
-                character.get_status_display(),
-                character.first_appearance_episode.number if character.first_appearance_episode else ''
-            ])
-        
-        return response
+    def export_pdf_zip(self, request, queryset):
+        """Export PDF pour les personnages: une fiche par fichier, dans un ZIP"""
+        self.start_export(request, ExportJob.Kind.CHARACTERS_PDF_ZIP, queryset)
     
-    export_csv.short_description = "Exporter CSV"
+    export_pdf_zip.short_description = "Exporter les fiches PDF (ZIP)"
+    
+    def export_csv_background(self, request, queryset):
+        """Export CSV pour les personnages, enregistré par un job d'export"""
+        self.start_export(request, ExportJob.Kind.CHARACTERS_CSV, queryset)
+    
+    export_csv_background.short_description = "Exporter CSV (en arrière-plan)"
 
 
 @admin.register(FruitHolder)
-class FruitHolderAdmin(admin.ModelAdmin):
+class FruitHolderAdmin(ScalableChangeListMixin, admin.ModelAdmin):
     list_display = ['character', 'devil_fruit', 'from_date', 'to_date', 'is_current']
+    list_select_related = ['character', 'devil_fruit']
     list_filter = ['is_current', 'devil_fruit__fruit_type']
     search_fields = ['character__name', 'devil_fruit__name']
+    autocomplete_fields = ['character', 'devil_fruit']
     ordering = ['-is_current', '-from_date']
 
+
+@admin.register(ExportJob)
+class ExportJobAdmin(ScalableChangeListMixin, admin.ModelAdmin):
+    """Suivi des exports lancés depuis les actions d'admin"""
+    list_display = ['__str__', 'status', 'progress_display', 'created_by', 'created_at', 'download_link']
+    list_select_related = ['created_by']
+    list_filter = ['status', 'kind']
+    fields = ['kind', 'status', 'progress_display', 'total', 'created_by', 'created_at',
+              'started_at', 'heartbeat_at', 'finished_at', 'download_link', 'error']
+    readonly_fields = fields
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def progress_display(self, obj):
+        return f"{obj.progress} % ({obj.processed}/{obj.total})"
+    progress_display.short_description = 'Avancement'
+    
+    def download_link(self, obj):
+        if obj.status != ExportJob.Status.DONE or not obj.result:
+            return '-'
+        url = reverse('admin:knowledge_exportjob_download', args=[obj.pk])
+        return format_html('<a href="{}">{}</a>', url, os.path.basename(obj.result.name))
+    download_link.short_description = 'Fichier'
+    
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/', self.admin_site.admin_view(self.download_view),
+                 name='knowledge_exportjob_download'),
+        ] + super().get_urls()
+    
+    def download_view(self, request, pk):
+        job = get_object_or_404(ExportJob, pk=pk)
+        if not self.has_view_permission(request, job):
+            raise Http404
+        if job.status != ExportJob.Status.DONE or not job.result:
+            raise Http404("Export non disponible")
+        return FileResponse(job.result.open('rb'), as_attachment=True, filename=os.path.basename(job.result.name))
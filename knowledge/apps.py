@@ -5,3 +5,5 @@ class KnowledgeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'knowledge'
 
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,164 @@
+"""Variantes asynchrones des endpoints de lecture, sous ``/api/async/``.
+
+Vues Django ``async def`` (DRF 3.14 ne sait pas exécuter de vues asynchrones)
+qui lisent la base avec l'ORM asynchrone de Django 4.2: ``aget`` pour les
+détails, ``async for`` pour les listes et leurs relations. Servies par un serveur
+ASGI (``opkb.asgi``, profil ``asgi`` de docker-compose), elles libèrent la boucle
+d'événements pendant les requêtes SQL.
+
+Les réponses ont le schéma des vues DRF:
+
+- listes: mêmes lignes que les serializers de liste, paginées par id croissant
+  (``?after=<dernier id>&page_size=``), ``{"next": ..., "results": [...]}``;
+- détails: le serializer de détail, appliqué à un objet dont les relations ont
+  été chargées à l'avance (``prefetch_related_objects``, mêmes Prefetch que les vues DRF).
+
+Ni ``?search=``, ni ``?fields=``, ni le cache des réponses ne s'y appliquent.
+
+Avec Django 4.2, chaque requête de l'ORM asynchrone s'exécute encore dans le
+thread dédié à la base (``sync_to_async``): le gain porte sur le nombre de
+connexions HTTP tenues par processus, pas sur le parallélisme SQL (voir la
+commande ``benchmark_asgi``).
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import HttpResponse
+from django.utils.http import urlencode
+from rest_framework.exceptions import NotFound
+
+from .listing import CHARACTER_RELATION_KEYS, character_relation_queries, index_rows
+from .models import Character, Crew, DevilFruit, Arc, Episode
+from .renderers import FastJSONRenderer
+from .serializers import (
+    CharacterListSerializer, CharacterDetailSerializer,
+    CrewListSerializer, CrewDetailSerializer,
+    DevilFruitListSerializer, DevilFruitDetailSerializer,
+    ArcListSerializer, ArcDetailSerializer,
+    EpisodeListSerializer, EpisodeDetailSerializer
+)
+
+
+renderer = FastJSONRenderer()
+
+
+def json_response(data, status=200):
+    return HttpResponse(renderer.render(data), content_type='application/json', status=status)
+
+
+def error_response(status, detail):
+    return json_response({'detail': str(detail)}, status=status)
+
+
+async def prefetch(instance, *lookups):
+    """``prefetch_related_objects`` sur l'objet lu en asynchrone (Django 4.2 n'en a pas de
+    variante asynchrone): les serializers (synchrones) lisent ensuite ses relations sans requête"""
+    await sync_to_async(prefetch_related_objects)([instance], *lookups)
+
+
+# Listes
+
+async def add_character_relations(rows):
+    """Version asynchrone de ``listing.add_character_relations``"""
+    by_id = index_rows(rows, CHARACTER_RELATION_KEYS)
+    if not by_id:
+        return
+    for name, query in character_relation_queries(by_id, CHARACTER_RELATION_KEYS).items():
+        keys = CHARACTER_RELATION_KEYS[name]
+        async for character_id, *values in query:
+            by_id[character_id][name].append(dict(zip(keys, values)))
+
+
+# ressource -> (modèle, champs plats de la ligne, fonction complétant les relations)
+LISTS = {
+    'characters': (
+        Character,
+        [name for name in CharacterListSerializer.Meta.fields if name not in CHARACTER_RELATION_KEYS],
+        add_character_relations,
+    ),
+    'crews': (Crew, CrewListSerializer.Meta.fields, None),
+    'fruits': (DevilFruit, DevilFruitListSerializer.Meta.fields, None),
+    'arcs': (Arc, ArcListSerializer.Meta.fields, None),
+    'episodes': (Episode, EpisodeListSerializer.Meta.fields, None),
+}
+
+
+def _int_param(request, name, default):
+    try:
+        return int(request.GET.get(name, default))
+    except ValueError:
+        return None
+
+
+async def list_view(request, resource):
+    """``GET /api/async/<ressource>/?after=<id>&page_size=<n>``"""
+    model, fields, add_relations = LISTS[resource]
+    page_size = _int_param(request, 'page_size', settings.REST_FRAMEWORK['PAGE_SIZE'])
+    after = _int_param(request, 'after', 0)
+    if page_size is None or after is None:
+        return error_response(400, 'page_size et after doivent être des entiers.')
+    page_size = max(1, min(page_size, settings.API_MAX_PAGE_SIZE))
+
+    # Une ligne de plus que la page: sa présence dit s'il y a une page suivante
+    queryset = model.objects.filter(pk__gt=after).order_by('pk').values(*fields)[:page_size + 1]
+    rows = [row async for row in queryset.aiterator()]
+    next_link = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        query = urlencode({'after': rows[-1]['id'], 'page_size': page_size})
+        next_link = request.build_absolute_uri(f'{request.path}?{query}')
+    if add_relations is not None:
+        await add_relations(rows)
+    return json_response({'next': next_link, 'results': rows})
+
+
+# Détails
+
+async def character_detail(pk):
+    character = await Character.objects.select_related('first_appearance_episode__arc').aget(pk=pk)
+    await prefetch(
+        character, Prefetch('crews', queryset=Crew.objects.select_related('captain')), 'fruit_history__devil_fruit',
+    )
+    # Pas de ?expand=crews.members sur cette variante
+    return CharacterDetailSerializer(character, context={'expand': set()}).data
+
+
+async def crew_detail(pk):
+    crew = await Crew.objects.select_related('captain').aget(pk=pk)
+    await prefetch(crew, 'members')
+    return CrewDetailSerializer(crew).data
+
+
+async def fruit_detail(pk):
+    fruit = await DevilFruit.objects.select_related('first_appearance_arc').aget(pk=pk)
+    await prefetch(fruit, 'holders__character')
+    return DevilFruitDetailSerializer(fruit).data
+
+
+async def arc_detail(pk):
+    arc = await Arc.objects.aget(pk=pk)
+    await prefetch(arc, 'episodes')
+    return ArcDetailSerializer(arc).data
+
+
+async def episode_detail(pk):
+    episode = await Episode.objects.select_related('arc').aget(pk=pk)
+    return EpisodeDetailSerializer(episode).data
+
+
+DETAILS = {
+    'characters': character_detail,
+    'crews': crew_detail,
+    'fruits': fruit_detail,
+    'arcs': arc_detail,
+    'episodes': episode_detail,
+}
+
+
+async def detail_view(request, resource, pk):
+    """``GET /api/async/<ressource>/<id>/``"""
+    try:
+        data = await DETAILS[resource](pk)
+    except LISTS[resource][0].DoesNotExist:
+        return error_response(404, NotFound.default_detail)
+    return json_response(data)
@@ -0,0 +1,281 @@
+"""Index d'autocomplétion en mémoire pour ``/api/search/?q=``.
+
+Un seul index couvre personnages, fruits, équipages, arcs et épisodes (ces derniers
+pour les widgets de l'admin seulement, voir SEARCH_KINDS). Chaque terme tapé
+est cherché en préfixe dans la liste triée des mots indexés, puis, s'il fait au
+moins 3 lettres, en approché: les mots partageant des trigrammes avec lui sont
+retenus si leur début est à une ou deux fautes près ("luffi" -> "luffy").
+
+Les objets candidats viennent du terme dont les mots correspondants ont le
+moins de postings; les autres termes les filtrent (ET).
+
+L'index est propre à chaque processus. Il est construit au démarrage du serveur
+(``preload()``, appelé par opkb.wsgi / opkb.asgi si AUTOCOMPLETE_PRELOAD), sinon à
+la première recherche; il est tenu à jour après chaque commit par les signaux de
+``knowledge.signals`` et reconstruit après les insertions en masse (seed_onepiece,
+import_json).
+
+Les écritures des autres processus sont détectées par une version partagée
+(AUTOCOMPLETE_VERSION_KEY, voir ``knowledge.caching.VersionedIndex``), ce qui
+suppose un cache partagé (CACHE_BACKEND).
+"""
+import heapq
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.urls import reverse
+
+from .caching import VersionedIndex
+from .models import Character, Crew, DevilFruit, Arc, Episode
+from .search import tokenize
+
+
+# Modèles indexés: type renvoyé, route de détail et champs (le premier sert de libellé)
+AUTOCOMPLETE_MODELS = {
+    Character: ('character', 'character-detail', [('name', 2.0), ('epithet', 1.0)]),
+    DevilFruit: ('fruit', 'devilfruit-detail', [('name', 2.0), ('romanji', 1.0)]),
+    Crew: ('crew', 'crew-detail', [('name', 2.0), ('ship_name', 1.0)]),
+    Arc: ('arc', 'arc-detail', [('name', 2.0)]),
+    Episode: ('episode', 'episode-detail', [('title', 2.0), ('number', 1.0)]),
+}
+
+# Types proposés par /api/search/; les épisodes ne servent qu'aux widgets de l'admin
+SEARCH_KINDS = {'character', 'fruit', 'crew', 'arc'}
+
+ROUTES = {kind: route for kind, route, _ in AUTOCOMPLETE_MODELS.values()}
+
+# Nombre maximal de mots indexés considérés pour un terme (préfixes très courts)
+MAX_EXPANSIONS = 200
+
+# Nombre d'objets retenus pour une recherche d'un seul terme (préfixes très courts)
+MAX_CANDIDATES = 500
+
+FUZZY_CACHE_SIZE = 1024
+
+# Nombre d'écritures appliquées à l'index, tous processus confondus
+AUTOCOMPLETE_VERSION_KEY = 'knowledge:autocomplete:version'
+
+# Qualité d'une correspondance: mot identique, préfixe, approché
+EXACT, PREFIX, FUZZY = 1.0, 0.8, 0.5
+
+
+def trigrams(token):
+    padded = f'${token}'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_typos(term):
+    if len(term) < 3:
+        return 0
+    return 1 if len(term) < 6 else 2
+
+
+def prefix_distance(term, token, limit):
+    """Distance d'édition (avec transpositions) entre ``term`` et le début de ``token`` le plus proche"""
+    if len(token) < len(term) - limit:
+        return limit + 1
+    width = min(len(token), len(term) + limit)
+    previous2 = None
+    previous = list(range(width + 1))
+    for i in range(1, len(term) + 1):
+        current = [i] + [0] * width
+        for j in range(1, width + 1):
+            cost = term[i - 1] != token[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous2 is not None and j > 1 and term[i - 1] == token[j - 2]
+                    and term[i - 2] == token[j - 1]):
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return min(previous[max(len(term) - limit, 0):])
+
+
+class AutocompleteIndex(VersionedIndex):
+    """Mots indexés triés (préfixes), index de trigrammes (fautes de frappe) et postings"""
+    version_key = AUTOCOMPLETE_VERSION_KEY
+
+    def _clear(self):
+        self.entries = {}
+        self.documents = {}
+        self.postings = defaultdict(dict)
+        self.tokens = []
+        self.trigrams = defaultdict(set)
+        # Correspondances approchées déjà calculées: les mots déjà tapés reviennent à chaque frappe
+        self.fuzzy_cache = {}
+
+    def build(self):
+        with self.lock:
+            if self.built:
+                return
+            self._start_build()
+            for model, (kind, route, fields) in AUTOCOMPLETE_MODELS.items():
+                names = [name for name, _ in fields]
+                for row in model.objects.values_list('pk', *names).iterator(chunk_size=2000):
+                    self._add(model, row[0], dict(zip(names, row[1:])))
+            self.tokens = sorted(self.postings)
+            self.built = True
+
+    def _add(self, model, pk, values):
+        kind, route, fields = AUTOCOMPLETE_MODELS[model]
+        key = (kind, pk)
+        label = values[fields[0][0]]
+        detail = values[fields[1][0]] if len(fields) > 1 else None
+        self.entries[key] = {
+            'type': kind,
+            'id': pk,
+            'label': label,
+            'detail': detail or None,
+        }
+        tokens = set()
+        for name, weight in fields:
+            for token in tokenize(values[name]):
+                docs = self.postings[token]
+                if not docs:
+                    for gram in trigrams(token):
+                        self.trigrams[gram].add(token)
+                docs[key] = max(docs.get(key, 0.0), weight)
+                tokens.add(token)
+        self.documents[key] = (tokens, ' '.join(tokenize(label)))
+        return tokens
+
+    def _remove(self, key):
+        self.fuzzy_cache.clear()
+        self.entries.pop(key, None)
+        tokens, _ = self.documents.pop(key, (set(), ''))
+        for token in tokens:
+            docs = self.postings.get(token)
+            if docs is not None:
+                docs.pop(key, None)
+                if not docs:
+                    # Le mot reste dans la liste triée et les trigrammes, sans postings
+                    del self.postings[token]
+
+    def update(self, instance):
+        model = type(instance)
+        with self.lock:
+            if self.built:
+                kind, _, fields = AUTOCOMPLETE_MODELS[model]
+                self._remove((kind, instance.pk))
+                tokens = self._add(model, instance.pk, {name: getattr(instance, name) for name, _ in fields})
+                for token in tokens:
+                    i = bisect_left(self.tokens, token)
+                    if i == len(self.tokens) or self.tokens[i] != token:
+                        self.tokens.insert(i, token)
+            self._record_write()
+
+    def remove(self, model, pk):
+        with self.lock:
+            if self.built:
+                self._remove((AUTOCOMPLETE_MODELS[model][0], pk))
+            self._record_write()
+
+    def prefix_matches(self, term):
+        """Mots indexés commençant par le terme (les premiers dans l'ordre alphabétique)"""
+        start = bisect_left(self.tokens, term)
+        end = bisect_left(self.tokens, term + '\uffff', start)
+        matches = {}
+        # Préfixe très court: l'ordre alphabétique place le mot exact et ses extensions courtes en tête
+        for token in self.tokens[start:min(end, start + MAX_EXPANSIONS)]:
+            if token in self.postings:
+                matches[token] = EXACT if token == term else PREFIX
+        return matches
+
+    def fuzzy_matches(self, term, exclude=()):
+        """Mots indexés dont le début est à une ou deux fautes du terme"""
+        cached = self.fuzzy_cache.get(term)
+        if cached is not None:
+            return {token: quality for token, quality in cached.items() if token not in exclude}
+        limit = max_typos(term)
+        matches = {}
+        if limit:
+            grams = trigrams(term)
+            # Chaque faute détruit au plus 3 trigrammes
+            required = max(len(grams) - 3 * limit, 1)
+            shared = Counter(token for gram in grams for token in self.trigrams.get(gram, ()))
+            for token, count in shared.items():
+                if (count >= required and token in self.postings
+                        and prefix_distance(term, token, limit) <= limit):
+                    matches[token] = FUZZY
+        if len(self.fuzzy_cache) >= FUZZY_CACHE_SIZE:
+            self.fuzzy_cache.clear()
+        self.fuzzy_cache[term] = matches
+        return {token: quality for token, quality in matches.items() if token not in exclude}
+
+    def term_matches(self, term):
+        """Mots indexés correspondant au terme (préfixes, puis approchés), avec leur qualité"""
+        matches = self.prefix_matches(term)
+        matches.update(self.fuzzy_matches(term, exclude=matches))
+        return matches
+
+    def _candidates(self, matches, kinds=None, limit=None):
+        """Objets contenant l'un des mots ``matches``, au plus ``limit`` (meilleures correspondances d'abord)"""
+        scores = {}
+        for token in sorted(matches, key=lambda token: (-matches[token], len(token), token)):
+            quality = matches[token]
+            for key, weight in self.postings.get(token, {}).items():
+                if kinds is not None and key[0] not in kinds:
+                    continue
+                score = quality * weight
+                if score > scores.get(key, 0.0):
+                    scores[key] = score
+                    if limit is not None and len(scores) >= limit:
+                        return scores
+        return scores
+
+    def search(self, query, limit=10, kinds=None):
+        """Meilleurs résultats pour ``query``, limités aux types ``kinds`` s'il est donné"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        self.sync()
+        self.build()
+        with self.lock:
+            matches = [self.term_matches(term) for term in terms]
+            # Le terme le plus sélectif (le moins de postings) fournit les candidats, sans limite
+            # dès qu'un autre terme les filtre: aucun objet commun aux termes n'est écarté
+            order = sorted(range(len(terms)), key=lambda i: sum(
+                len(self.postings.get(token, ())) for token in matches[i]
+            ))
+            scores = self._candidates(matches[order[0]], kinds, MAX_CANDIDATES if len(terms) == 1 else None)
+            for i in order[1:]:
+                term_matches = matches[i]
+                filtered = {}
+                for key, score in scores.items():
+                    best = max((term_matches[token] * self.postings[token][key]
+                                for token in self.documents[key][0] if token in term_matches), default=0.0)
+                    if best:
+                        filtered[key] = score + best
+                scores = filtered
+            if not scores:
+                return []
+
+            # Libellé commençant par les termes dans l'ordre tapé
+            phrase = ' '.join(terms)
+            for key in scores:
+                if self.documents[key][1].startswith(phrase):
+                    scores[key] += 1.0
+            best = heapq.nsmallest(
+                limit, scores,
+                key=lambda key: (-scores[key], len(self.entries[key]['label']), self.entries[key]['label'], key)
+            )
+            results = [dict(self.entries[key], score=round(scores[key], 3)) for key in best]
+        for result in results:
+            result['url'] = reverse(ROUTES[result['type']], args=[result['id']])
+        return results
+
+
+index = AutocompleteIndex()
+
+
+def preload():
+    """Construit l'index au démarrage du serveur plutôt qu'à la première frappe"""
+    if not getattr(settings, 'AUTOCOMPLETE_PRELOAD', False):
+        return
+    try:
+        index.build()
+    except DatabaseError:
+        # Base pas encore migrée: construction à la première recherche
+        index.reset()
@@ -0,0 +1,201 @@
+"""Cache des réponses JSON de l'API et requêtes conditionnelles (ETag, Last-Modified).
+
+Chaque modèle a une génération dans le cache: l'instant (en nanosecondes) de sa
+dernière modification. La clé d'une réponse contient l'URL (paramètres triés) et
+les générations des modèles qu'elle affiche: changer une génération rend toutes
+ces réponses inaccessibles sans avoir à les retrouver. Les signaux de
+``knowledge.signals`` renouvellent les générations à chaque modification; les
+commandes d'insertion en masse appellent ``bump_generation()``.
+
+Last-Modified est la seconde de la dernière modification; il n'est envoyé (et
+If-Modified-Since n'est pris en compte) qu'une fois cette seconde écoulée: une
+modification plus tard dans la même seconde ne changerait pas la date, et un
+client qui ne revalide que par If-Modified-Since recevrait un 304 périmé.
+
+Les index en mémoire (graphe, autocomplétion) dérivent de ``VersionedIndex``: une
+version partagée dans le cache compte leurs écritures, tous processus confondus.
+
+Le cache ``default`` de Django est utilisé: en mémoire locale, il est propre à
+chaque processus; avec plusieurs processus, configurer un cache partagé
+(CACHE_BACKEND, voir les réglages).
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, urlencode
+
+from .models import Character, Crew, DevilFruit, Arc, Episode, FruitHolder
+
+
+CACHED_MODELS = (Character, Crew, DevilFruit, FruitHolder, Arc, Episode)
+
+GENERATION_KEY = 'knowledge:generation:{}'
+RESPONSE_KEY = 'knowledge:response:{}'
+
+# Les générations suffisent à invalider: la durée ne sert qu'à libérer la place
+API_CACHE_TIMEOUT = getattr(settings, 'API_CACHE_TIMEOUT', 60 * 60)
+
+# Durée pendant laquelle le navigateur réutilise une réponse sans revalider (0: revalidation
+# systématique, qui coûte un 304 sans corps quand rien n'a changé)
+API_CACHE_MAX_AGE = getattr(settings, 'API_CACHE_MAX_AGE', 0)
+
+
+def generation_key(model):
+    return GENERATION_KEY.format(model._meta.label_lower)
+
+
+def get_generations(models):
+    keys = [generation_key(model) for model in models]
+    generations = cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            # Compteur absent (premier accès ou éviction): partir de l'instant présent
+            value = time.time_ns()
+            if not cache.add(key, value, timeout=None):
+                value = cache.get(key, value)
+            generations[key] = value
+    return [generations[key] for key in keys]
+
+
+def bump_generation(*models):
+    """Invalide les réponses en cache qui affichent ces modèles (tous par défaut)"""
+    # La génération est l'instant de la modification: elle sert aussi de Last-Modified
+    now = time.time_ns()
+    cache.set_many({generation_key(model): now for model in models or CACHED_MODELS}, timeout=None)
+
+
+def read_version(key):
+    return cache.get(key, 0)
+
+
+def next_version(key):
+    """Compte une écriture dans la version partagée ``key`` et renvoie la nouvelle valeur"""
+    cache.add(key, 0, timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Clé évincée entre add et incr
+        cache.set(key, 1, timeout=None)
+        return 1
+
+
+class VersionedIndex:
+    """Index en mémoire propre au processus, tenu à jour par ses propres écritures.
+
+    Avec plusieurs processus (``uvicorn --workers``, gunicorn), une écriture n'est
+    appliquée que par le processus qui l'a faite: chacune incrémente donc la version
+    partagée ``version_key``. Un processus qui y voit des écritures qui ne sont pas
+    les siennes vide son index (``sync``), reconstruit à la lecture suivante.
+
+    Les sous-classes définissent ``version_key``, ``_clear()`` (vide les structures) et
+    ``build()``, qui appelle ``_start_build()`` avant de lire la base; chaque mise à
+    jour appliquée appelle ``_record_write()``.
+    """
+    version_key = None
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.built = False
+        # Version partagée correspondant au contenu de l'index
+        self.version = None
+        self._clear()
+
+    def _clear(self):
+        raise NotImplementedError
+
+    def _invalidate(self):
+        self.built = False
+        self._clear()
+
+    def _start_build(self):
+        self._clear()
+        # Lue avant la base: une écriture pendant la construction provoquera une reconstruction
+        self.version = read_version(self.version_key)
+
+    def reset(self):
+        """Vide l'index de ce processus et fait reconstruire celui des autres"""
+        with self.lock:
+            self._invalidate()
+        next_version(self.version_key)
+
+    def sync(self):
+        """Vide l'index si un autre processus l'a modifié depuis sa construction"""
+        with self.lock:
+            if self.built and read_version(self.version_key) != self.version:
+                self._invalidate()
+
+    def _record_write(self):
+        # L'index reste à jour si aucune écriture d'un autre processus ne s'est intercalée
+        version = next_version(self.version_key)
+        if self.built:
+            if version == self.version + 1:
+                self.version = version
+            else:
+                self._invalidate()
+
+
+class CachedResponseMixin:
+    """Met en cache les réponses JSON de list, retrieve et batch, et répond aux requêtes conditionnelles.
+
+    ``cache_models`` liste les modèles dont dépend le contenu des réponses
+    (y compris les relations imbriquées par les serializers). Leurs générations
+    donnent l'ETag et le Last-Modified sans exécuter de requête: un client à
+    jour reçoit un 304 avant toute lecture en base.
+    """
+    cache_models = CACHED_MODELS
+
+    def get_response_signature(self, request):
+        """Empreinte de la réponse (ETag et clé de cache) et date de dernière modification
+        (None tant que la seconde de la dernière modification n'est pas écoulée)"""
+        query = urlencode(sorted(request.query_params.lists()), doseq=True)
+        generations = get_generations(self.cache_models)
+        # Variante négociée (Accept: application/json; indent=4): contenu différent
+        raw = f'{request.get_host()}|{request.path}?{query}|{request.accepted_media_type}|{generations}'
+        last_modified = max(generations) // 10 ** 9
+        if last_modified >= time.time_ns() // 10 ** 9:
+            last_modified = None
+        return hashlib.sha1(raw.encode()).hexdigest(), last_modified
+
+    def set_validators(self, response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, max_age=API_CACHE_MAX_AGE, must_revalidate=True)
+        return response
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        # L'API navigable affiche l'utilisateur connecté: seul le JSON est partagé
+        if request.accepted_renderer.format != 'json':
+            return handler(request, *args, **kwargs)
+        signature, last_modified = self.get_response_signature(request)
+        etag = f'"{signature}"'
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            return self.set_validators(not_modified, etag, last_modified)
+
+        key = RESPONSE_KEY.format(signature)
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            return self.set_validators(HttpResponse(content, content_type=content_type), etag, last_modified)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            self.set_validators(response, etag, last_modified)
+            response.add_post_render_callback(
+                lambda rendered: cache.set(key, (rendered.content, rendered['Content-Type']), API_CACHE_TIMEOUT)
+            )
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_batch_response(self, request, *args, **kwargs):
+        return self.cached_response(super().get_batch_response, request, *args, **kwargs)
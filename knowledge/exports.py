@@ -0,0 +1,460 @@
+"""Contenu des exports PDF et CSV (fiches de fruits et de personnages).
+
+Les fonctions ``write_*`` écrivent dans un fichier ouvert et appellent
+``progress(n)`` avec le nombre d'objets traités. Elles sont exécutées en
+arrière-plan par ``knowledge.jobs``; les objets sont relus par paquets, dans
+l'ordre des ids reçus.
+
+``stream_csv`` produit le même CSV morceau par morceau, pour un téléchargement
+direct depuis l'admin.
+"""
+import csv
+import multiprocessing
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from io import BytesIO, StringIO
+from itertools import islice
+
+import django
+from django.conf import settings
+from django.db.models import Prefetch
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+
+from .models import Character, DevilFruit, FruitHolder
+
+
+CHUNK_SIZE = 500
+
+
+def iter_objects(queryset, ids, chunk_size=CHUNK_SIZE):
+    """Objets de ``queryset`` d'ids ``ids``, dans cet ordre, lus ``chunk_size`` à la fois"""
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        objects = queryset.in_bulk(chunk)
+        for pk in chunk:
+            if pk in objects:
+                yield objects[pk]
+
+
+# PDF
+#
+# Styles construits une fois par processus; fiches assemblées à partir des relations
+# préchargées. Les ZIP de fiches individuelles sont rendus par paquets dans un pool de
+# processus (EXPORT_PDF_PROCESSES), le document combiné dans le processus du job.
+
+@lru_cache(maxsize=None)
+def get_styles():
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#1a1a1a'),
+        spaceAfter=30,
+        alignment=TA_CENTER
+    ))
+    styles.add(ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=16,
+        textColor=colors.HexColor('#333333'),
+        spaceAfter=12
+    ))
+    return styles
+
+
+INFO_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.grey),
+    ('TEXTCOLOR', (0, 0), (0, -1), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+    ('BACKGROUND', (1, 0), (1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+HISTORY_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+# Nombre de fiches rendues par tâche du pool de processus
+RENDER_BATCH_SIZE = 16
+
+
+def fruit_pdf_queryset():
+    # FruitHolder.Meta.ordering: détenteur actuel puis plus récents d'abord
+    return DevilFruit.objects.select_related('first_appearance_arc').prefetch_related(
+        Prefetch('holders', queryset=FruitHolder.objects.select_related('character'))
+    )
+
+
+def character_pdf_queryset():
+    return Character.objects.select_related('first_appearance_episode').prefetch_related(
+        'crews', Prefetch('fruit_history', queryset=FruitHolder.objects.select_related('devil_fruit'))
+    )
+
+
+def history_section(story, title, rows, first_column, col_widths):
+    styles = get_styles()
+    story.append(Paragraph(title, styles['CustomHeading']))
+    data = [[first_column, 'Date début', 'Date fin', 'Actuel']]
+    for name, holder in rows:
+        data.append([
+            name,
+            str(holder.from_date) if holder.from_date else 'N/A',
+            str(holder.to_date) if holder.to_date else 'N/A',
+            'Oui' if holder.is_current else 'Non'
+        ])
+    table = Table(data, colWidths=col_widths)
+    table.setStyle(HISTORY_TABLE_STYLE)
+    story.append(table)
+    story.append(Spacer(1, 0.2*inch))
+
+
+def text_section(story, title, text):
+    styles = get_styles()
+    story.append(Paragraph(title, styles['CustomHeading']))
+    story.append(Paragraph(text, styles['Normal']))
+    story.append(Spacer(1, 0.2*inch))
+
+
+def generated_footer(story, generated_at):
+    story.append(Spacer(1, 0.3*inch))
+    story.append(Paragraph(
+        f"<i>Généré le {generated_at.strftime('%d/%m/%Y à %H:%M:%S')}</i>",
+        get_styles()['Normal']
+    ))
+
+
+def fruit_story(fruit, generated_at):
+    """Fiche d'un fruit du démon (relations de fruit_pdf_queryset)"""
+    styles = get_styles()
+    story = [
+        Paragraph(f"Fiche Fruit du Démon: {fruit.name}", styles['CustomTitle']),
+        Spacer(1, 0.3*inch),
+    ]
+
+    # Informations principales
+    data = [
+        ['Nom', fruit.name],
+        ['Romanji', fruit.romanji or 'N/A'],
+        ['Type', fruit.get_fruit_type_display()],
+        ['Rareté', str(fruit.rarity) + '/5'],
+        ['Statut', fruit.get_status_display()],
+    ]
+    if fruit.first_appearance_arc:
+        data.append(['Première apparition', fruit.first_appearance_arc.name])
+    table = Table(data, colWidths=[2*inch, 4*inch])
+    table.setStyle(INFO_TABLE_STYLE)
+    story.append(table)
+    story.append(Spacer(1, 0.3*inch))
+
+    text_section(story, "Capacité", fruit.ability)
+    if fruit.weaknesses:
+        text_section(story, "Faiblesses", fruit.weaknesses)
+    if fruit.description:
+        text_section(story, "Description", fruit.description)
+
+    holders = fruit.holders.all()
+    if holders:
+        history_section(
+            story, "Détenteurs", [(holder.character.name, holder) for holder in holders],
+            'Personnage', [2*inch, 1.5*inch, 1.5*inch, 1*inch]
+        )
+
+    generated_footer(story, generated_at)
+    return story
+
+
+def character_story(character, generated_at):
+    """Fiche d'un personnage (relations de character_pdf_queryset)"""
+    styles = get_styles()
+    story = [Paragraph(f"Fiche Personnage: {character.name}", styles['CustomTitle'])]
+    if character.epithet:
+        story.append(Paragraph(f"<i>{character.epithet}</i>", styles['Normal']))
+    story.append(Spacer(1, 0.3*inch))
+
+    # Informations principales
+    data = [
+        ['Nom', character.name],
+        ['Surnom', character.epithet or 'N/A'],
+        ['Rôle', character.get_role_display()],
+        ['Prime', f"{character.bounty:,} Berries" if character.bounty > 0 else 'Aucune'],
+        ['Origine', character.origin or 'N/A'],
+        ['Statut', character.get_status_display()],
+    ]
+    if character.first_appearance_episode:
+        data.append(['Première apparition', f"Épisode #{character.first_appearance_episode.number}: {character.first_appearance_episode.title}"])
+    table = Table(data, colWidths=[2*inch, 4*inch])
+    table.setStyle(INFO_TABLE_STYLE)
+    story.append(table)
+    story.append(Spacer(1, 0.3*inch))
+
+    if character.description:
+        text_section(story, "Description", character.description)
+
+    crews = character.crews.all()
+    if crews:
+        text_section(story, "Équipages", ', '.join([crew.name for crew in crews]))
+
+    fruit_holders = character.fruit_history.all()
+    if fruit_holders:
+        history_section(
+            story, "Fruits du démon", [(holder.devil_fruit.name, holder) for holder in fruit_holders],
+            'Fruit', [2.5*inch, 1.5*inch, 1.5*inch, 0.5*inch]
+        )
+
+    generated_footer(story, generated_at)
+    return story
+
+
+# Type de fiche -> (queryset, fiche, préfixe des fichiers)
+PDF_SHEETS = {
+    'fruit': (fruit_pdf_queryset, fruit_story, 'fruit'),
+    'character': (character_pdf_queryset, character_story, 'character'),
+}
+
+
+def pdf_filename(sheet, obj):
+    return f'{PDF_SHEETS[sheet][2]}_{obj.name.replace(" ", "_")}.pdf'
+
+
+def build_pdf(output, stories):
+    """Un document, une fiche par page (ou plus)"""
+    story = []
+    for sheet_story in stories:
+        if story:
+            story.append(PageBreak())
+        story.extend(sheet_story)
+    SimpleDocTemplate(output, pagesize=A4).build(story)
+
+
+def render_pdfs(sheet, objects, generated_at):
+    """Fiches PDF individuelles: [(nom de fichier, contenu)]. Exécuté dans le pool de processus."""
+    build_story = PDF_SHEETS[sheet][1]
+    rendered = []
+    for obj in objects:
+        buffer = BytesIO()
+        build_pdf(buffer, [build_story(obj, generated_at)])
+        rendered.append((f'{obj.pk}_{pdf_filename(sheet, obj)}', buffer.getvalue()))
+    return rendered
+
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def get_process_pool():
+    """Pool partagé par les jobs du processus (None avec EXPORT_PDF_PROCESSES <= 1)"""
+    global _process_pool
+    # Un seul processus de rendu ne ferait qu'ajouter le coût des échanges
+    if settings.EXPORT_PDF_PROCESSES <= 1:
+        return None
+    with _process_pool_lock:
+        if _process_pool is None:
+            # spawn: pas de fork d'un processus web multi-thread (connexions, verrous)
+            _process_pool = ProcessPoolExecutor(
+                max_workers=settings.EXPORT_PDF_PROCESSES,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup,
+            )
+        return _process_pool
+
+
+def render_in_pool(pool, sheet, batches, generated_at):
+    """Résultats de render_pdfs pour chaque paquet, dans l'ordre, rendus par le pool.
+
+    Au plus 2 paquets par processus sont soumis à la fois: les objets chargés et les
+    PDF en attente d'écriture restent bornés, quelle que soit la taille de l'export.
+    """
+    window = 2 * settings.EXPORT_PDF_PROCESSES
+    pending = deque()
+    try:
+        for batch in batches:
+            pending.append(pool.submit(render_pdfs, sheet, batch, generated_at))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def write_pdf(sheet, output, ids, progress):
+    """Toutes les fiches dans un seul document"""
+    build_queryset, build_story, prefix = PDF_SHEETS[sheet]
+    generated_at = datetime.now()
+    stories = []
+    first = None
+    for count, obj in enumerate(iter_objects(build_queryset(), ids), 1):
+        first = first or obj
+        stories.append(build_story(obj, generated_at))
+        progress(count)
+    if first is None:
+        raise ValueError('Aucun objet à exporter.')
+    build_pdf(output, stories)
+    return pdf_filename(sheet, first) if len(stories) == 1 else f'{prefix}s_{len(stories)}.pdf'
+
+
+def write_pdf_zip(sheet, output, ids, progress):
+    """Une fiche PDF par objet, dans une archive ZIP"""
+    build_queryset, _, prefix = PDF_SHEETS[sheet]
+    generated_at = datetime.now()
+    objects = iter_objects(build_queryset(), ids)
+    batches = iter(lambda: list(islice(objects, RENDER_BATCH_SIZE)), [])
+    pool = get_process_pool() if len(ids) > RENDER_BATCH_SIZE else None
+    if pool is None:
+        results = (render_pdfs(sheet, batch, generated_at) for batch in batches)
+    else:
+        results = render_in_pool(pool, sheet, batches, generated_at)
+
+    count = 0
+    # Les PDF sont déjà compressés
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_STORED) as archive:
+        for rendered in results:
+            for filename, content in rendered:
+                archive.writestr(filename, content)
+            count += len(rendered)
+            progress(count)
+    return f'{prefix}s_{count}.zip'
+
+
+def write_fruit_pdf(output, ids, progress):
+    return write_pdf('fruit', output, ids, progress)
+
+
+def write_fruit_pdf_zip(output, ids, progress):
+    return write_pdf_zip('fruit', output, ids, progress)
+
+
+def write_character_pdf(output, ids, progress):
+    return write_pdf('character', output, ids, progress)
+
+
+def write_character_pdf_zip(output, ids, progress):
+    return write_pdf_zip('character', output, ids, progress)
+
+
+# CSV
+#
+# Une ligne par objet, relations jointes par select_related. Les libellés des choix
+# sont lus dans des dictionnaires construits une fois, pas par get_*_display().
+
+# Lignes écrites à la fois dans le flux d'un export CSV en téléchargement direct
+CSV_STREAM_ROWS = 1000
+
+
+def choice_labels(model, field_name):
+    return dict(model._meta.get_field(field_name).flatchoices)
+
+
+FRUIT_CSV_HEADER = ['Nom', 'Romanji', 'Type', 'Capacité', 'Rareté', 'Statut', 'Arc première apparition']
+FRUIT_TYPE_LABELS = choice_labels(DevilFruit, 'fruit_type')
+FRUIT_STATUS_LABELS = choice_labels(DevilFruit, 'status')
+
+CHARACTER_CSV_HEADER = ['Nom', 'Surnom', 'Rôle', 'Prime', 'Origine', 'Statut', 'Épisode première apparition']
+CHARACTER_ROLE_LABELS = choice_labels(Character, 'role')
+CHARACTER_STATUS_LABELS = choice_labels(Character, 'status')
+
+
+def fruit_csv_queryset(queryset=None):
+    if queryset is None:
+        queryset = DevilFruit.objects.all()
+    return queryset.select_related('first_appearance_arc').only(
+        'name', 'romanji', 'fruit_type', 'ability', 'rarity', 'status', 'first_appearance_arc__name',
+    )
+
+
+def fruit_csv_row(fruit):
+    return [
+        fruit.name,
+        fruit.romanji,
+        FRUIT_TYPE_LABELS.get(fruit.fruit_type, fruit.fruit_type),
+        fruit.ability[:100],  # Limiter la longueur
+        fruit.rarity,
+        FRUIT_STATUS_LABELS.get(fruit.status, fruit.status),
+        fruit.first_appearance_arc.name if fruit.first_appearance_arc else ''
+    ]
+
+
+def character_csv_queryset(queryset=None):
+    if queryset is None:
+        queryset = Character.objects.all()
+    return queryset.select_related('first_appearance_episode').only(
+        'name', 'epithet', 'role', 'bounty', 'origin', 'status', 'first_appearance_episode__number',
+    )
+
+
+def character_csv_row(character):
+    return [
+        character.name,
+        character.epithet,
+        CHARACTER_ROLE_LABELS.get(character.role, character.role),
+        character.bounty,
+        character.origin,
+        CHARACTER_STATUS_LABELS.get(character.status, character.status),
+        character.first_appearance_episode.number if character.first_appearance_episode else ''
+    ]
+
+
+# nom -> (en-tête, queryset, ligne, nom du fichier)
+CSV_EXPORTS = {
+    'fruits': (FRUIT_CSV_HEADER, fruit_csv_queryset, fruit_csv_row, 'devil_fruits_export.csv'),
+    'characters': (CHARACTER_CSV_HEADER, character_csv_queryset, character_csv_row, 'characters_export.csv'),
+}
+
+
+def write_csv(name, output, ids, progress):
+    header, get_queryset, row, filename = CSV_EXPORTS[name]
+    writer = csv.writer(output)
+    writer.writerow(header)
+    for count, obj in enumerate(iter_objects(get_queryset(), ids), 1):
+        writer.writerow(row(obj))
+        progress(count)
+    return filename
+
+
+def write_fruits_csv(output, ids, progress):
+    return write_csv('fruits', output, ids, progress)
+
+
+def write_characters_csv(output, ids, progress):
+    return write_csv('characters', output, ids, progress)
+
+
+def stream_csv(name, queryset):
+    """Texte CSV des objets de ``queryset``, par morceaux de CSV_STREAM_ROWS lignes.
+
+    Les objets sont lus par ``iterator()``: la mémoire reste constante quel que soit
+    le nombre de lignes, et le premier morceau part avant la fin de la lecture.
+    """
+    header, get_queryset, row, _ = CSV_EXPORTS[name]
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    rows = get_queryset(queryset).iterator(chunk_size=CSV_STREAM_ROWS)
+    while True:
+        objects = list(islice(rows, CSV_STREAM_ROWS))
+        writer.writerows(row(obj) for obj in objects)
+        yield buffer.getvalue()
+        if len(objects) < CSV_STREAM_ROWS:
+            return
+        buffer.seek(0)
+        buffer.truncate()
@@ -0,0 +1,32 @@
+from rest_framework.filters import OrderingFilter, SearchFilter
+
+from .search import SEARCH_FIELDS, search_queryset
+
+
+class FullTextSearchFilter(SearchFilter):
+    """``?search=`` servi par le moteur plein texte de ``knowledge.search``.
+
+    Les résultats sont annotés avec ``search_rank`` (plus grand = plus pertinent).
+    Si le moteur a tronqué les résultats, ``request.search_truncated`` est vrai et
+    la pagination le signale. Les modèles non indexés gardent le comportement de
+    SearchFilter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if queryset.model not in SEARCH_FIELDS or not getattr(view, 'search_fields', None):
+            return super().filter_queryset(request, queryset, view)
+        query = ' '.join(self.get_search_terms(request))
+        if not query:
+            return queryset
+        queryset, truncated = search_queryset(queryset, query)
+        request.search_truncated = truncated
+        return queryset
+
+
+class RankedOrderingFilter(OrderingFilter):
+    """Trie par pertinence lors d'une recherche sans ``?ordering=`` explicite"""
+
+    def get_ordering(self, request, queryset, view):
+        if not request.query_params.get(self.ordering_param) and 'search_rank' in queryset.query.annotations:
+            return ('-search_rank', 'id')
+        return super().get_ordering(request, queryset, view)
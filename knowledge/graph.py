@@ -0,0 +1,272 @@
+"""Graphe des relations en mémoire pour ``/api/graph/``.
+
+Les nœuds sont les personnages, équipages, fruits, arcs et épisodes; les arêtes
+(non orientées) relient:
+
+- un personnage à ses équipages (membre) et aux équipages qu'il commande (capitaine);
+- un personnage aux fruits qu'il a détenus (FruitHolder);
+- un épisode à son arc.
+
+Chaque nœud reçoit un numéro entier; ses voisins sont stockés dans un
+``array('q')`` de numéros. Voisins, voisinage à k sauts et plus court chemin
+(recherche en largeur bidirectionnelle) se calculent sans requête SQL.
+
+L'index est propre à chaque processus, construit à la première requête. Les
+signaux de ``knowledge.signals`` recalculent après chaque commit les arêtes des
+seuls nœuds modifiés; seed_onepiece et import_json le réinitialisent.
+
+Les écritures des autres processus sont détectées par une version partagée
+(GRAPH_VERSION_KEY, voir ``knowledge.caching.VersionedIndex``). Cela suppose un
+cache partagé (CACHE_BACKEND); avec le cache en mémoire locale par défaut, les
+autres processus ne voient les écritures qu'à leur redémarrage.
+"""
+from array import array
+from collections import deque
+
+from .caching import VersionedIndex
+from .models import Character, Crew, DevilFruit, Arc, Episode, FruitHolder
+
+
+KINDS = ['character', 'crew', 'fruit', 'arc', 'episode']
+KIND_MODELS = {
+    'character': Character,
+    'crew': Crew,
+    'fruit': DevilFruit,
+    'arc': Arc,
+    'episode': Episode,
+}
+MODEL_KINDS = {model: kind for kind, model in KIND_MODELS.items()}
+LABEL_FIELDS = {
+    'character': 'name',
+    'crew': 'name',
+    'fruit': 'name',
+    'arc': 'name',
+    'episode': 'title',
+}
+
+
+# Nombre d'écritures appliquées au graphe, tous processus confondus
+GRAPH_VERSION_KEY = 'knowledge:graph:version'
+
+
+class GraphIndex(VersionedIndex):
+    """Listes d'adjacence compactes, tenues à jour nœud par nœud.
+
+    Propre au processus: les écritures des autres processus provoquent une
+    reconstruction complète (voir VersionedIndex).
+    """
+    version_key = GRAPH_VERSION_KEY
+
+    def _clear(self):
+        self.nodes = {}
+        self.kinds = array('b')
+        self.pks = array('q')
+        self.labels = []
+        self.adjacency = []
+        # Équipage -> capitaine (numéros de nœuds), pour nommer les arêtes
+        self.captains = {}
+
+    def _node(self, kind, pk, label=''):
+        node = self.nodes.get((kind, pk))
+        if node is None:
+            node = self.nodes[(kind, pk)] = len(self.pks)
+            self.kinds.append(KINDS.index(kind))
+            self.pks.append(pk)
+            self.labels.append(label)
+            self.adjacency.append(array('q'))
+        return node
+
+    def build(self):
+        with self.lock:
+            if self.built:
+                return
+            self._start_build()
+            for kind, model in KIND_MODELS.items():
+                for pk, label in model.objects.values_list('pk', LABEL_FIELDS[kind]).iterator(chunk_size=5000):
+                    self._node(kind, pk, label)
+
+            neighbors = [set() for _ in self.pks]
+            edges = [
+                ('character', 'crew', Character.crews.through.objects.values_list('character_id', 'crew_id')),
+                ('character', 'crew', Crew.objects.filter(captain__isnull=False).values_list('captain_id', 'pk')),
+                ('character', 'fruit', FruitHolder.objects.values_list('character_id', 'devil_fruit_id')),
+                ('episode', 'arc', Episode.objects.filter(arc__isnull=False).values_list('pk', 'arc_id')),
+            ]
+            for kind_a, kind_b, pairs in edges:
+                for pk_a, pk_b in pairs.iterator(chunk_size=5000):
+                    a, b = self.nodes[(kind_a, pk_a)], self.nodes[(kind_b, pk_b)]
+                    neighbors[a].add(b)
+                    neighbors[b].add(a)
+            self.adjacency = [array('q', sorted(node_neighbors)) for node_neighbors in neighbors]
+            for crew_pk, captain_pk in Crew.objects.filter(captain__isnull=False).values_list('pk', 'captain_id'):
+                self.captains[self.nodes[('crew', crew_pk)]] = self.nodes[('character', captain_pk)]
+            self.built = True
+
+    # Mises à jour incrémentales
+
+    def _neighbor_keys(self, kind, pk):
+        """Voisins d'un nœud d'après la base (toutes ses arêtes, quelle que soit leur origine)"""
+        if kind == 'character':
+            crews = set(Character.crews.through.objects.filter(character_id=pk).values_list('crew_id', flat=True))
+            crews.update(Crew.objects.filter(captain_id=pk).values_list('pk', flat=True))
+            fruits = FruitHolder.objects.filter(character_id=pk).values_list('devil_fruit_id', flat=True)
+            return [('crew', crew) for crew in crews] + [('fruit', fruit) for fruit in set(fruits)]
+        if kind == 'crew':
+            members = set(Character.crews.through.objects.filter(crew_id=pk).values_list('character_id', flat=True))
+            captain = Crew.objects.filter(pk=pk).values_list('captain_id', flat=True).first()
+            if captain is not None:
+                members.add(captain)
+            return [('character', member) for member in members]
+        if kind == 'fruit':
+            holders = FruitHolder.objects.filter(devil_fruit_id=pk).values_list('character_id', flat=True)
+            return [('character', holder) for holder in set(holders)]
+        if kind == 'episode':
+            arc = Episode.objects.filter(pk=pk).values_list('arc_id', flat=True).first()
+            return [('arc', arc)] if arc is not None else []
+        return [('episode', episode) for episode in Episode.objects.filter(arc_id=pk).values_list('pk', flat=True)]
+
+    def _set_neighbors(self, node, neighbors):
+        current = set(self.adjacency[node])
+        for other in current - neighbors:
+            self.adjacency[other].remove(node)
+        for other in neighbors - current:
+            self.adjacency[other].append(node)
+        self.adjacency[node] = array('q', sorted(neighbors))
+
+    def refresh(self, instance):
+        """Recalcule le libellé et les arêtes d'un objet créé ou modifié"""
+        with self.lock:
+            self._refresh(instance)
+            self._record_write()
+
+    def _refresh(self, instance):
+        with self.lock:
+            if not self.built:
+                return
+            kind = MODEL_KINDS[type(instance)]
+            node = self._node(kind, instance.pk)
+            self.labels[node] = getattr(instance, LABEL_FIELDS[kind])
+            neighbors = set()
+            for other_kind, other_pk in self._neighbor_keys(kind, instance.pk):
+                neighbors.add(self._node(other_kind, other_pk))
+            self._set_neighbors(node, neighbors)
+            if kind == 'crew':
+                self.captains.pop(node, None)
+                if instance.captain_id is not None:
+                    self.captains[node] = self._node('character', instance.captain_id)
+
+    def refresh_pk(self, model, pk):
+        """Comme refresh, pour un objet connu par sa clé primaire (ex: autre extrémité d'une relation)"""
+        with self.lock:
+            if self.built:
+                instance = model.objects.filter(pk=pk).first()
+                if instance is not None:
+                    self._refresh(instance)
+            self._record_write()
+
+    def remove(self, model, pk):
+        with self.lock:
+            node = self.nodes.pop((MODEL_KINDS[model], pk), None) if self.built else None
+            if node is not None:
+                self._set_neighbors(node, set())
+                self.captains.pop(node, None)
+                for crew in [crew for crew, captain in self.captains.items() if captain == node]:
+                    del self.captains[crew]
+            self._record_write()
+
+    # Requêtes
+
+    def get_node(self, kind, pk):
+        self.sync()
+        self.build()
+        return self.nodes.get((kind, pk))
+
+    def describe(self, node):
+        return {'type': KINDS[self.kinds[node]], 'id': self.pks[node], 'label': self.labels[node]}
+
+    def relation(self, a, b):
+        """Nature de l'arête a - b"""
+        kinds = {KINDS[self.kinds[a]], KINDS[self.kinds[b]]}
+        if kinds == {'character', 'crew'}:
+            crew, character = (a, b) if KINDS[self.kinds[a]] == 'crew' else (b, a)
+            return 'captain' if self.captains.get(crew) == character else 'member'
+        if kinds == {'character', 'fruit'}:
+            return 'holder'
+        return 'arc'
+
+    def neighbors(self, node, kinds=None):
+        with self.lock:
+            return [
+                dict(self.describe(other), relation=self.relation(node, other))
+                for other in self.adjacency[node]
+                if kinds is None or KINDS[self.kinds[other]] in kinds
+            ]
+
+    def expand(self, node, depth, limit, kinds=None):
+        """Nœuds à au plus ``depth`` sauts (parcours en largeur), ``limit`` au plus.
+
+        Avec ``kinds``, seuls ces types de nœuds sont traversés et renvoyés.
+        """
+        with self.lock:
+            distances = {node: 0}
+            queue = deque([node])
+            found = []
+            while queue:
+                current = queue.popleft()
+                distance = distances[current]
+                if distance == depth:
+                    continue
+                for other in self.adjacency[current]:
+                    if other in distances or (kinds is not None and KINDS[self.kinds[other]] not in kinds):
+                        continue
+                    distances[other] = distance + 1
+                    found.append(dict(self.describe(other), distance=distance + 1))
+                    if len(found) >= limit:
+                        return found, True
+                    queue.append(other)
+            return found, False
+
+    def shortest_path(self, source, target, max_depth, via=None):
+        """Plus court chemin (BFS bidirectionnelle), en ne passant que par les nœuds de type ``via``"""
+        with self.lock:
+            if source == target:
+                return [source]
+            parents = [{source: None}, {target: None}]
+            frontiers = [[source], [target]]
+            for _ in range(max_depth):
+                # On étend le côté dont la frontière est la plus petite
+                side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+                seen, other_seen = parents[side], parents[1 - side]
+                next_frontier = []
+                for current in frontiers[side]:
+                    for other in self.adjacency[current]:
+                        if other in seen:
+                            continue
+                        if other in other_seen:
+                            seen[other] = current
+                            return self._join(parents, other)
+                        if via is not None and KINDS[self.kinds[other]] not in via:
+                            continue
+                        seen[other] = current
+                        next_frontier.append(other)
+                if not next_frontier:
+                    return None
+                frontiers[side] = next_frontier
+            return None
+
+    @staticmethod
+    def _join(parents, meeting):
+        path = []
+        node = meeting
+        while node is not None:
+            path.append(node)
+            node = parents[0][node]
+        path.reverse()
+        node = parents[1][meeting]
+        while node is not None:
+            path.append(node)
+            node = parents[1][node]
+        return path
+
+
+index = GraphIndex()
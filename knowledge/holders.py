@@ -0,0 +1,88 @@
+"""Changements de détenteur des fruits du démon.
+
+L'unicité du détenteur actuel est garantie par la contrainte
+``unique_current_holder_per_fruit``. ``FruitHolder.save()`` ne rétrograde plus
+le détenteur précédent: enregistrer un second détenteur actuel lève
+IntegrityError (ValidationError par ``full_clean()`` et les formulaires). Les transferts verrouillent les fruits
+concernés (``select_for_update``) le temps de la transaction: deux transferts
+simultanés d'un même fruit s'exécutent l'un après l'autre au lieu d'échouer sur
+la contrainte.
+
+Les transferts écrivent par ``update()`` et ``bulk_create()``, sans signaux: les
+caches (statistiques, réponses de l'API, graphe) sont invalidés ici.
+"""
+from django.db import transaction
+from django.db.models import DateField, F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .caching import bump_generation
+from .graph import index as graph_index
+from .models import Character, DevilFruit, FruitHolder
+from .stats import invalidate_stats
+
+
+BATCH_SIZE = 500
+
+# Au-delà, le graphe est reconstruit à la demande suivante plutôt que nœud par nœud
+GRAPH_REFRESH_LIMIT = 100
+
+
+def transfer_fruit(fruit, character, date=None):
+    """Fait de ``character`` le détenteur actuel de ``fruit`` à partir de ``date`` (aujourd'hui par défaut).
+
+    Le détenteur précédent n'est plus actuel et sa date de fin devient ``date``
+    si elle n'était pas renseignée. Renvoie le FruitHolder créé, ou None si
+    ``character`` détenait déjà le fruit.
+    """
+    created = transfer_fruits({fruit: character}, date)
+    return created[0] if created else None
+
+
+def transfer_fruits(assignments, date=None):
+    """Réattribue plusieurs fruits en une transaction: ``assignments`` associe fruit -> personnage
+    (objets ou clés primaires).
+
+    Quatre requêtes par paquet de BATCH_SIZE fruits: verrou, détenteurs actuels,
+    fin des détentions précédentes, création des nouvelles. Renvoie les
+    FruitHolder créés (clés primaires renseignées si la base les renvoie).
+    """
+    date = date or timezone.localdate()
+    targets = {_pk(fruit): _pk(character) for fruit, character in assignments.items()}
+    fruit_ids = list(targets)
+    created = []
+    with transaction.atomic():
+        for start in range(0, len(fruit_ids), BATCH_SIZE):
+            batch = fruit_ids[start:start + BATCH_SIZE]
+            list(DevilFruit.objects.select_for_update().filter(pk__in=batch).values_list('pk', flat=True))
+            current = dict(
+                FruitHolder.objects.filter(devil_fruit_id__in=batch, is_current=True)
+                .values_list('devil_fruit_id', 'character_id')
+            )
+            moved = [fruit_id for fruit_id in batch if current.get(fruit_id) != targets[fruit_id]]
+            FruitHolder.objects.filter(devil_fruit_id__in=moved, is_current=True).update(
+                is_current=False, to_date=Coalesce(F('to_date'), Value(date, output_field=DateField())),
+                updated_at=timezone.now(),
+            )
+            created.extend(FruitHolder.objects.bulk_create([
+                FruitHolder(devil_fruit_id=fruit_id, character_id=targets[fruit_id], from_date=date, is_current=True)
+                for fruit_id in moved
+            ]))
+        if created:
+            transaction.on_commit(lambda: _invalidate(created))
+    return created
+
+
+def _pk(obj):
+    return obj.pk if isinstance(obj, (DevilFruit, Character)) else obj
+
+
+def _invalidate(holders):
+    invalidate_stats()
+    bump_generation(FruitHolder)
+    if len(holders) > GRAPH_REFRESH_LIMIT:
+        graph_index.reset()
+        return
+    for holder in holders:
+        graph_index.refresh_pk(Character, holder.character_id)
+        graph_index.refresh_pk(DevilFruit, holder.devil_fruit_id)
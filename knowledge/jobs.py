@@ -0,0 +1,158 @@
+"""Exports exécutés en arrière-plan, suivis dans la table ``ExportJob``.
+
+``submit()`` enregistre un job en attente et rend la main aussitôt. Après le
+commit, le job est confié au pool de threads du processus (réglage
+``EXPORT_JOB_WORKERS``). Le thread le réclame (PENDING -> RUNNING par un UPDATE
+conditionnel: un job n'est exécuté qu'une fois, même avec plusieurs processus),
+écrit le fichier sous ``MEDIA_ROOT/exports/`` et enregistre l'avancement au fil
+de l'export.
+
+Un job en cours enregistre un signe de vie (``heartbeat_at``) avec son
+avancement. Sans signe de vie depuis ``EXPORT_JOB_STALE_TIMEOUT``, le processus
+qui l'exécutait est considéré arrêté: ``requeue_stale_jobs()`` le remet en
+attente (à chaque ``submit()`` et à chaque passage de ``run_export_jobs``). Si
+l'ancien thread termine malgré tout, son résultat est ignoré: les écritures
+d'un job portent sur sa réclamation (``started_at``).
+
+Avec ``EXPORT_JOB_WORKERS = 0``, ou pour les jobs laissés en attente par un
+processus arrêté, ``manage.py run_export_jobs`` exécute les jobs en attente.
+"""
+import io
+import logging
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+from . import exports
+from .models import ExportJob
+
+
+logger = logging.getLogger(__name__)
+
+# type de job -> (fonction d'export, fichier texte ou binaire)
+EXPORTS = {
+    ExportJob.Kind.FRUITS_PDF: (exports.write_fruit_pdf, False),
+    ExportJob.Kind.FRUITS_PDF_ZIP: (exports.write_fruit_pdf_zip, False),
+    ExportJob.Kind.FRUITS_CSV: (exports.write_fruits_csv, True),
+    ExportJob.Kind.CHARACTERS_PDF: (exports.write_character_pdf, False),
+    ExportJob.Kind.CHARACTERS_PDF_ZIP: (exports.write_character_pdf_zip, False),
+    ExportJob.Kind.CHARACTERS_CSV: (exports.write_characters_csv, True),
+}
+
+# Intervalle minimal entre deux écritures de l'avancement, en secondes
+PROGRESS_INTERVAL = 1.0
+
+# Au-delà, le fichier en cours d'écriture passe de la mémoire au disque
+SPOOL_MAX_SIZE = 10 * 1024 * 1024
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.EXPORT_JOB_WORKERS, thread_name_prefix='export-job'
+            )
+        return _executor
+
+
+def submit(kind, object_ids, user=None):
+    """Crée un job d'export des objets ``object_ids`` (dans cet ordre) et le lance après le commit"""
+    object_ids = list(object_ids)
+    job = ExportJob.objects.create(
+        kind=kind, object_ids=object_ids, total=len(object_ids),
+        created_by=user if user is not None and user.is_authenticated else None,
+    )
+    if settings.EXPORT_JOB_WORKERS > 0:
+        transaction.on_commit(lambda: start_jobs([job.pk] + requeue_stale_jobs()))
+    return job
+
+
+def start_jobs(pks):
+    executor = get_executor()
+    for pk in pks:
+        executor.submit(run_job, pk)
+
+
+def requeue_stale_jobs():
+    """Remet en attente les jobs en cours sans signe de vie depuis EXPORT_JOB_STALE_TIMEOUT;
+    renvoie leurs clés primaires"""
+    limit = timezone.now() - timedelta(seconds=settings.EXPORT_JOB_STALE_TIMEOUT)
+    stale = ExportJob.objects.filter(status=ExportJob.Status.RUNNING, heartbeat_at__lt=limit)
+    pks = list(stale.values_list('pk', flat=True))
+    if pks:
+        # Mêmes conditions: un job réclamé entre-temps par un autre processus n'est pas touché
+        stale.filter(pk__in=pks).update(
+            status=ExportJob.Status.PENDING, processed=0, started_at=None, heartbeat_at=None
+        )
+        logger.warning('Jobs d\'export remis en attente (processus arrêté): %s', pks)
+    return pks
+
+
+class Progress:
+    """Enregistre le nombre d'objets traités et un signe de vie, au plus une fois par PROGRESS_INTERVAL"""
+
+    def __init__(self, claim):
+        self.claim = claim
+        self.saved_at = time.monotonic()
+
+    def __call__(self, processed):
+        now = time.monotonic()
+        if now - self.saved_at >= PROGRESS_INTERVAL:
+            self.claim.update(processed=processed, heartbeat_at=timezone.now())
+            self.saved_at = now
+
+
+def run_job(pk):
+    """Exécute le job ``pk`` s'il est encore en attente; renvoie True s'il a été exécuté"""
+    close_old_connections()
+    try:
+        started = timezone.now()
+        claimed = ExportJob.objects.filter(pk=pk, status=ExportJob.Status.PENDING).update(
+            status=ExportJob.Status.RUNNING, started_at=started, heartbeat_at=started
+        )
+        if not claimed:
+            return False
+        # Écritures de cette exécution seulement: sans effet si le job a été remis en attente
+        claim = ExportJob.objects.filter(pk=pk, status=ExportJob.Status.RUNNING, started_at=started)
+        job = ExportJob.objects.get(pk=pk)
+        try:
+            write, text = EXPORTS[job.kind]
+            with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as spool:
+                if text:
+                    output = io.TextIOWrapper(spool, encoding='utf-8', newline='')
+                    filename = write(output, job.object_ids, Progress(claim))
+                    output.flush()
+                    output.detach()
+                else:
+                    filename = write(spool, job.object_ids, Progress(claim))
+                spool.seek(0)
+                job.result.save(filename, File(spool), save=False)
+        except Exception as exc:
+            logger.exception('Échec du job d\'export %s', pk)
+            claim.update(
+                status=ExportJob.Status.FAILED, error=str(exc) or exc.__class__.__name__,
+                finished_at=timezone.now(),
+            )
+        else:
+            finished = claim.update(
+                status=ExportJob.Status.DONE, processed=job.total, result=job.result.name,
+                finished_at=timezone.now(),
+            )
+            if not finished:
+                # Job remis en attente pendant l'export: personne ne référence ce fichier
+                job.result.storage.delete(job.result.name)
+        return True
+    finally:
+        # Connexions propres à ce thread
+        connections.close_all()
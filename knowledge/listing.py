@@ -0,0 +1,162 @@
+"""Forme des réponses de l'API: champs demandés, détails groupés et chemin rapide des listes.
+
+``SparseFieldsetViewMixin`` adapte le queryset à ``?fields=`` / ``?omit=`` (voir
+``SparseFieldsetMixin`` dans les serializers). Avec le réglage ``API_FAST_LISTS``,
+les lignes d'une page sont lues avec ``values()`` et les relations imbriquées
+assemblées en Python par une requête chacune, sans instancier de modèles ni
+passer par les champs des serializers DRF. Le JSON produit a le même schéma
+(mêmes clés, même ordre, mêmes valeurs) que les serializers de liste.
+"""
+from django.conf import settings
+from django.db import models
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .models import Character, FruitHolder
+
+
+class SparseFieldsetViewMixin:
+    """Ne charge que ce que le serializer va afficher"""
+
+    def get_output_fields(self):
+        """Champs de premier niveau de la réponse, après ?fields=, ?omit= et ?expand="""
+        if getattr(self, '_output_fields', None) is None:
+            self._output_fields = set(self.get_serializer().fields)
+        return self._output_fields
+
+    def wants(self, name):
+        return name in self.get_output_fields()
+
+    def defer_unused_text(self, queryset):
+        """Diffère les TextField (description, ability...) absents de la réponse"""
+        unused = [
+            field.name for field in queryset.model._meta.concrete_fields
+            if isinstance(field, models.TextField) and not self.wants(field.name)
+        ]
+        return queryset.defer(*unused) if unused else queryset
+
+
+class BatchDetailMixin:
+    """``GET <ressource>/batch/?ids=1,2,3``: plusieurs détails en un aller-retour.
+
+    Les objets passent par le queryset et le serializer de ``retrieve`` (l'action
+    vaut ``'batch'``): une requête par relation préchargée, quel que soit le nombre
+    d'ids. La réponse associe chaque id trouvé à son détail et liste les absents.
+    """
+
+    def get_batch_ids(self, request):
+        max_ids = getattr(settings, 'API_BATCH_MAX_IDS', 100)
+        try:
+            ids = [int(value) for value in request.query_params.get('ids', '').split(',') if value.strip()]
+        except ValueError:
+            raise ValidationError({'ids': "Liste d'identifiants entiers séparés par des virgules attendue."})
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            raise ValidationError({'ids': 'Au moins un identifiant est requis.'})
+        if len(ids) > max_ids:
+            raise ValidationError({'ids': f'{max_ids} identifiants au maximum par requête.'})
+        return ids
+
+    @action(detail=False, methods=['get'])
+    def batch(self, request, *args, **kwargs):
+        return self.get_batch_response(request, *args, **kwargs)
+
+    def get_batch_response(self, request, *args, **kwargs):
+        ids = self.get_batch_ids(request)
+        objects = {obj.pk: obj for obj in self.get_queryset().filter(pk__in=ids)}
+        found = [objects[pk] for pk in ids if pk in objects]
+        data = self.get_serializer(found, many=True).data
+        return Response({
+            'results': {str(obj.pk): item for obj, item in zip(found, data)},
+            'missing': [pk for pk in ids if pk not in objects],
+        })
+
+
+class ValuesListMixin(SparseFieldsetViewMixin):
+    """Sert ``list`` depuis ``values()`` quand ``API_FAST_LISTS`` est activé.
+
+    ``list_fields`` liste les champs plats de la ligne, dans l'ordre du serializer
+    de liste (par défaut: ses ``Meta.fields``). ``add_list_relations`` complète
+    les lignes de la page avec les relations imbriquées.
+    """
+    list_fields = None
+
+    def get_list_fields(self):
+        if self.list_fields is not None:
+            return list(self.list_fields)
+        return list(self.get_serializer_class().Meta.fields)
+
+    def add_list_relations(self, rows):
+        """Ajoute aux lignes les relations imbriquées demandées (``self.wants``)"""
+
+    def list(self, request, *args, **kwargs):
+        if not getattr(settings, 'API_FAST_LISTS', False) or request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        fields = [name for name in self.get_list_fields() if self.wants(name)]
+        # La pagination par curseur lit la position dans les champs de tri; les relations se
+        # rattachent par l'id
+        ordering = self.paginator.get_ordering(request, queryset, self) if self.paginator else ()
+        extra = [name.lstrip('-') for name in ('id', *ordering) if name.lstrip('-') not in fields]
+        rows = queryset.values(*fields, *dict.fromkeys(extra))
+
+        page = self.paginate_queryset(rows)
+        results = list(rows) if page is None else page
+        self.add_list_relations(results)
+        if extra:
+            results = [{name: row[name] for name in row if name not in extra} for row in results]
+        if page is not None:
+            return self.get_paginated_response(results)
+        return Response(results)
+
+
+# Clés des objets imbriqués de CharacterListSerializer, dans l'ordre des colonnes des requêtes
+CHARACTER_RELATION_KEYS = {
+    'crews': ('id', 'name', 'ship_name'),
+    'current_fruits': ('id', 'name'),
+}
+
+
+def character_relation_queries(character_ids, names):
+    """Requêtes (non évaluées) des relations ``names``: lignes (character_id, *valeurs)"""
+    queries = {}
+    if 'crews' in names:
+        # Même ordre que le prefetch 'crews' (Crew.Meta.ordering)
+        queries['crews'] = (
+            Character.crews.through.objects
+            .filter(character_id__in=character_ids)
+            .order_by('crew__name')
+            .values_list('character_id', 'crew_id', 'crew__name', 'crew__ship_name')
+        )
+    if 'current_fruits' in names:
+        # Même ordre que le prefetch 'current_holders' (FruitHolder.Meta.ordering)
+        queries['current_fruits'] = (
+            FruitHolder.objects
+            .filter(character_id__in=character_ids, is_current=True)
+            .values_list('character_id', 'devil_fruit_id', 'devil_fruit__name')
+        )
+    return queries
+
+
+def index_rows(rows, names):
+    """Lignes par id, avec une liste vide pour chaque relation à remplir"""
+    by_id = {}
+    for row in rows:
+        for name in names:
+            row[name] = []
+        by_id[row['id']] = row
+    return by_id
+
+
+def add_character_relations(rows, crews=True, current_fruits=True):
+    """Ajoute ``crews`` et ``current_fruits`` (CharacterListSerializer) aux lignes de personnages"""
+    names = [name for name, wanted in (('crews', crews), ('current_fruits', current_fruits)) if wanted]
+    by_id = index_rows(rows, names)
+    if not by_id:
+        return
+    for name, query in character_relation_queries(by_id, names).items():
+        keys = CHARACTER_RELATION_KEYS[name]
+        for character_id, *values in query:
+            by_id[character_id][name].append(dict(zip(keys, values)))
@@ -0,0 +1,131 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+import asyncio
+import itertools
+import json
+import threading
+import time
+
+from knowledge.async_views import LISTS
+
+
+# Le cache des réponses servirait la plupart des requêtes synchrones sans lire la base
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+class Command(BaseCommand):
+    help = ("Compare débit et latence des lectures de l'API sous clients concurrents: "
+            "vues DRF servies en WSGI, les mêmes en ASGI, et les vues asynchrones /api/async/")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Nombre de requêtes par mode')
+        parser.add_argument('--concurrency', type=int, default=16, help='Nombre de clients simultanés')
+        parser.add_argument('--details', type=int, default=20,
+                            help='Nombre de fiches de détail demandées par ressource')
+        parser.add_argument('--page-size', type=int, default=10, help='Taille des pages de liste')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests et --concurrency doivent être positifs')
+        self.options = options
+        paths = self.get_paths()
+        with override_settings(CACHES=NO_CACHE):
+            self.check_same_content(paths)
+            self.stdout.write(
+                f"{options['requests']} requêtes, {options['concurrency']} clients, "
+                f"{len(paths)} URLs (listes et détails des 5 ressources), cache des réponses désactivé"
+            )
+            self.stdout.write(f"{'Mode':<24} {'débit':>12} {'p50':>9} {'p95':>9} {'p99':>9}")
+            self.report('WSGI, vues DRF', self.run_wsgi([sync for sync, _ in paths]))
+            self.report('ASGI, vues DRF', asyncio.run(self.run_asgi([sync for sync, _ in paths])))
+            self.report('ASGI, vues async', asyncio.run(self.run_asgi([async_ for _, async_ in paths])))
+
+    def get_paths(self):
+        """Couples (URL DRF, URL /api/async/) qui renvoient les mêmes données"""
+        page_size = self.options['page_size']
+        paths = []
+        for resource, (model, _, _) in LISTS.items():
+            # Les listes asynchrones sont triées par id
+            ordering = '' if resource == 'episodes' else '&ordering=id'
+            paths.append((
+                f'/api/{resource}/?page_size={page_size}{ordering}',
+                f'/api/async/{resource}/?page_size={page_size}',
+            ))
+            for pk in model.objects.order_by('pk').values_list('pk', flat=True)[:self.options['details']]:
+                paths.append((f'/api/{resource}/{pk}/', f'/api/async/{resource}/{pk}/'))
+        return paths
+
+    def check_same_content(self, paths):
+        client = Client()
+        for sync_path, async_path in paths:
+            expected = json.loads(self.fetch(client, sync_path))
+            content = json.loads(asyncio.run(self.afetch(AsyncClient(), async_path)))
+            if 'results' in expected:
+                # Listes: mêmes lignes, liens de pagination différents
+                expected, content = expected['results'], content['results']
+            if expected != content:
+                raise CommandError(f'Réponses différentes pour {sync_path} et {async_path}')
+
+    def run_wsgi(self, paths):
+        """Un thread par client, chacun avec son Client (WSGIHandler) et sa connexion à la base"""
+        urls = itertools.islice(itertools.cycle(paths), self.options['requests'])
+        lock = threading.Lock()
+        latencies = []
+
+        def worker():
+            client = Client()
+            while True:
+                with lock:
+                    path = next(urls, None)
+                if path is None:
+                    return
+                start = time.perf_counter()
+                self.fetch(client, path)
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(self.options['concurrency']) as executor:
+            for future in [executor.submit(worker) for _ in range(self.options['concurrency'])]:
+                future.result()
+        return latencies, time.perf_counter() - start
+
+    async def run_asgi(self, paths):
+        """Une coroutine par client sur une même boucle d'événements (ASGIHandler)"""
+        urls = itertools.islice(itertools.cycle(paths), self.options['requests'])
+        latencies = []
+
+        async def worker():
+            client = AsyncClient()
+            for path in urls:
+                start = time.perf_counter()
+                await self.afetch(client, path)
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(self.options['concurrency'])])
+        return latencies, time.perf_counter() - start
+
+    def report(self, label, result):
+        latencies, elapsed = result
+        latencies.sort()
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+        self.stdout.write(
+            f"{label:<24} {len(latencies) / elapsed:>8.1f} r/s "
+            f"{percentile(0.50):>6.1f} ms {percentile(0.95):>6.1f} ms {percentile(0.99):>6.1f} ms"
+        )
+
+    def fetch(self, client, path):
+        response = client.get(path, HTTP_ACCEPT='application/json')
+        if response.status_code != 200:
+            raise CommandError(f'{path}: HTTP {response.status_code}')
+        return response.content
+
+    async def afetch(self, client, path):
+        response = await client.get(path, HTTP_ACCEPT='application/json')
+        if response.status_code != 200:
+            raise CommandError(f'{path}: HTTP {response.status_code}')
+        return response.content
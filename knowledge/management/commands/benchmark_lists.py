@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+import json
+import time
+
+from knowledge.caching import bump_generation
+from knowledge.renderers import orjson
+
+
+ENDPOINTS = [
+    '/api/characters/',
+    '/api/crews/',
+    '/api/fruits/',
+    '/api/arcs/',
+    '/api/episodes/',
+]
+
+
+class Command(BaseCommand):
+    help = "Compare le débit des listes de l'API avec et sans API_FAST_LISTS"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Nombre de requêtes par endpoint et par mode')
+        parser.add_argument('--page-size', type=int, default=100, help='Taille des pages demandées')
+        parser.add_argument('--query', type=str, default='',
+                            help="Paramètres ajoutés à chaque URL (ex: 'search=luffy&ordering=-bounty')")
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests doit être positif')
+        client = Client()
+        query = f"page_size={options['page_size']}"
+        if options['query']:
+            query += f"&{options['query']}"
+
+        self.stdout.write(f"Encodeur JSON: {'orjson' if orjson else 'json (bibliothèque standard)'}")
+        self.stdout.write(f"{'Endpoint':<20} {'serializers':>14} {'values()':>14} {'gain':>8}")
+        for endpoint in ENDPOINTS:
+            url = f'{endpoint}?{query}'
+            rates = {}
+            bodies = {}
+            for fast in (False, True):
+                with override_settings(API_FAST_LISTS=fast):
+                    bodies[fast] = self.fetch(client, url)
+                    elapsed = 0.0
+                    for _ in range(options['requests']):
+                        # Nouvelle génération: la réponse n'est jamais servie par le cache
+                        bump_generation()
+                        start = time.perf_counter()
+                        self.fetch(client, url)
+                        elapsed += time.perf_counter() - start
+                    rates[fast] = options['requests'] / elapsed
+
+            if json.loads(bodies[False]) != json.loads(bodies[True]):
+                raise CommandError(f'Réponses différentes entre les deux modes pour {url}')
+            self.stdout.write(
+                f"{endpoint:<20} {rates[False]:>10.1f} r/s {rates[True]:>10.1f} r/s "
+                f"{rates[True] / rates[False]:>7.2f}x"
+            )
+
+    def fetch(self, client, url):
+        response = client.get(url, HTTP_ACCEPT='application/json')
+        if response.status_code != 200:
+            raise CommandError(f'{url}: HTTP {response.status_code}')
+        return response.content
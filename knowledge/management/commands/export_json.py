@@ -1,61 +1,231 @@
-from django.core.management.base import BaseCommand
-from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core import serializers
+from django.core.serializers.json import DjangoJSONEncoder
 from django.conf import settings
-from io import StringIO
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from itertools import islice
+import gzip
+import io
 import os
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
 
-from knowledge.models import Character, Crew, DevilFruit, Arc, Episode, FruitHolder
+from knowledge.models import Character, Crew, DevilFruit, Arc, Episode, FruitHolder, DeletedRecord, natural_key
+
+
+# Modèles exportés, dans l'ordre des dépendances
+MODELS_TO_EXPORT = [
+    (Arc, 'arcs'),
+    (Episode, 'episodes'),
+    (Crew, 'crews'),
+    (Character, 'characters'),
+    (DevilFruit, 'devil_fruits'),
+    (FruitHolder, 'fruit_holders'),
+]
+
+EXTENSIONS = {
+    'json': '.json',
+    'jsonl': '.jsonl',
+}
+
+# Recouvrement entre deux deltas: updated_at est fixé au save(), avant le commit; une ligne
+# enregistrée juste avant l'export mais validée après sa lecture reste ainsi dans le suivant.
+# Les lignes du recouvrement sont ré-exportées, sans effet pour un import --upsert
+EXPORT_SINCE_OVERLAP = timedelta(minutes=5)
+
+COMPRESSION_EXTENSIONS = {
+    'none': '',
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+
+def open_output(filename, compress):
+    """Ouvre le fichier de sortie en texte, compressé à la volée si demandé"""
+    if compress == 'gzip':
+        return gzip.open(filename, 'wt', encoding='utf-8')
+    if compress == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise CommandError("La compression zstd nécessite le paquet 'zstandard' (pip install zstandard)")
+        raw = open(filename, 'wb')
+        writer = zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        return io.TextIOWrapper(writer, encoding='utf-8')
+    return open(filename, 'w', encoding='utf-8')
+
+
+def natural_foreign_keys(obj):
+    """Clé naturelle des cibles de chaque relation de ``obj``: un import --upsert retrouve
+    ainsi dans la base cible les lignes référencées qui ne sont pas dans le fichier"""
+    keys = {}
+    for field in obj._meta.concrete_fields:
+        if field.is_relation and getattr(obj, field.attname) is not None:
+            keys[field.name] = natural_key(getattr(obj, field.name))
+    for field in obj._meta.many_to_many:
+        keys[field.name] = [natural_key(target) for target in getattr(obj, field.name).all()]
+    return keys
+
+
+def iter_serialized(model, chunk_size, since=None):
+    """Sérialise un modèle par paquets, sans jamais charger toute la table"""
+    queryset = model.objects.order_by('pk')
+    if since is not None:
+        queryset = queryset.filter(updated_at__gt=since)
+    foreign_keys = [f.name for f in model._meta.concrete_fields if f.is_relation]
+    if foreign_keys:
+        queryset = queryset.select_related(*foreign_keys)
+    m2m_fields = [f.name for f in model._meta.many_to_many]
+    if m2m_fields:
+        queryset = queryset.prefetch_related(*m2m_fields)
+    rows = queryset.iterator(chunk_size=chunk_size)
+    while True:
+        batch = list(islice(rows, chunk_size))
+        if not batch:
+            break
+        for obj, record in zip(batch, serializers.serialize('python', batch)):
+            record['natural_foreign_keys'] = natural_foreign_keys(obj)
+            yield record
+
+
+def iter_tombstones(since, chunk_size):
+    records = DeletedRecord.objects.filter(deleted_at__gt=since).order_by('pk')
+    for record in records.iterator(chunk_size=chunk_size):
+        yield {
+            'model': record.model_label, 'pk': record.object_pk, 'natural_key': record.natural_key,
+            'deleted_at': record.deleted_at,
+        }
+
+
+def read_manifest(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def parse_since(value, manifest_path):
+    """Interprète --since: un horodatage ISO 8601, une date, ou 'last' (dernier manifeste)"""
+    if value == 'last':
+        manifest = read_manifest(manifest_path)
+        if not manifest:
+            raise CommandError(f'Aucun export précédent trouvé ({manifest_path})')
+        value = manifest['high_water_mark']
+    try:
+        since = parse_datetime(value)
+        day = parse_date(value) if since is None else None
+    except ValueError:
+        since = day = None
+    if since is None:
+        if day is None:
+            raise CommandError(f"--since invalide: '{value}' (attendu: horodatage ISO 8601, date ou 'last')")
+        since = datetime(day.year, day.month, day.day)
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+def dump(obj):
+    return json.dumps(obj, cls=DjangoJSONEncoder, ensure_ascii=False)
 
 
 class Command(BaseCommand):
     help = 'Exporte toutes les données en JSON dans le dossier /exports'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--output', type=str, help='Chemin du fichier de sortie (par défaut: exports/opkb_export_<date>)')
+        parser.add_argument('--format', choices=list(EXTENSIONS), default='json',
+                            help='json: un objet par modèle (défaut), jsonl: un enregistrement par ligne')
+        parser.add_argument('--compress', choices=list(COMPRESSION_EXTENSIONS), default='none',
+                            help='Compression du fichier de sortie')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Nombre de lignes lues par requête')
+        parser.add_argument('--since', type=str,
+                            help="Export incrémental: uniquement les lignes modifiées depuis cet horodatage "
+                                 "(ou 'last' pour reprendre au dernier export), plus les suppressions")
+        parser.add_argument('--manifest', type=str,
+                            help='Manifeste des exports (par défaut: exports/manifest.json)')
+
     def handle(self, *args, **options):
+        fmt = options['format']
+        compress = options['compress']
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size doit être positif')
+
         # Créer le dossier exports s'il n'existe pas
         exports_dir = os.path.join(settings.BASE_DIR, 'exports')
         os.makedirs(exports_dir, exist_ok=True)
-        
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        
-        # Exporter chaque modèle
-        models_to_export = [
-            ('knowledge.Arc', 'arcs'),
-            ('knowledge.Episode', 'episodes'),
-            ('knowledge.Crew', 'crews'),
-            ('knowledge.Character', 'characters'),
-            ('knowledge.DevilFruit', 'devil_fruits'),
-            ('knowledge.FruitHolder', 'fruit_holders'),
-        ]
-        
-        all_data = {}
-        
-        for model_path, key in models_to_export:
-            self.stdout.write(f'Export de {key}...')
-            output = StringIO()
-            call_command('dumpdata', model_path, stdout=output, indent=2)
-            output.seek(0)
-            content = output.getvalue()
-            if content.strip():
-                data = json.loads(content)
-                all_data[key] = data
-            else:
-                all_data[key] = []
-        
-        # Sauvegarder dans un fichier unique
-        filename = os.path.join(exports_dir, f'opkb_export_{timestamp}.json')
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(all_data, f, indent=2, ensure_ascii=False)
-        
+        manifest_path = options['manifest'] or os.path.join(exports_dir, 'manifest.json')
+
+        since = parse_since(options['since'], manifest_path) if options['since'] else None
+        # Pris avant la lecture, moins le recouvrement: une ligne modifiée pendant l'export, ou
+        # validée après sa lecture, sera ré-exportée au prochain delta
+        high_water_mark = timezone.now() - EXPORT_SINCE_OVERLAP
+
+        filename = options['output']
+        if not filename:
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            prefix = 'opkb_delta' if since else 'opkb_export'
+            filename = os.path.join(
+                exports_dir,
+                f'{prefix}_{timestamp}{EXTENSIONS[fmt]}{COMPRESSION_EXTENSIONS[compress]}'
+            )
+
+        counts = {}
+        # Écriture incrémentale: la mémoire utilisée ne dépend pas de la taille des tables
+        with open_output(filename, compress) as f:
+            if fmt == 'json':
+                f.write('{')
+            for index, (model, key) in enumerate(MODELS_TO_EXPORT):
+                self.stdout.write(f'Export de {key}...')
+                counts[key] = 0
+                if fmt == 'json':
+                    f.write(f'{"," if index else ""}\n  {dump(key)}: [')
+                for obj in iter_serialized(model, chunk_size, since):
+                    if fmt == 'json':
+                        f.write(f'{"," if counts[key] else ""}\n    {dump(obj)}')
+                    else:
+                        f.write(dump(obj) + '\n')
+                    counts[key] += 1
+                if fmt == 'json':
+                    f.write('\n  ]' if counts[key] else ']')
+            if since is not None:
+                # Tombstones des lignes supprimées depuis le dernier export
+                counts['deleted'] = 0
+                if fmt == 'json':
+                    f.write(',\n  "deleted": [')
+                for tombstone in iter_tombstones(since, chunk_size):
+                    if fmt == 'json':
+                        f.write(f'{"," if counts["deleted"] else ""}\n    {dump(tombstone)}')
+                    else:
+                        f.write(dump(tombstone) + '\n')
+                    counts['deleted'] += 1
+                if fmt == 'json':
+                    f.write('\n  ]' if counts['deleted'] else ']')
+            if fmt == 'json':
+                f.write('\n}\n')
+
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'high_water_mark': high_water_mark.isoformat(),
+                'since': since.isoformat() if since else None,
+                'file': filename,
+                'format': fmt,
+                'compress': compress,
+                'counts': counts,
+            }, f, indent=2, ensure_ascii=False)
+
         self.stdout.write(self.style.SUCCESS(f'Export terminé: {filename}'))
-        
+
         # Afficher les statistiques
         self.stdout.write('\nStatistiques:')
-        self.stdout.write(f'  - Arcs: {Arc.objects.count()}')
-        self.stdout.write(f'  - Épisodes: {Episode.objects.count()}')
-        self.stdout.write(f'  - Équipages: {Crew.objects.count()}')
-        self.stdout.write(f'  - Personnages: {Character.objects.count()}')
-        self.stdout.write(f'  - Fruits du démon: {DevilFruit.objects.count()}')
-        self.stdout.write(f'  - Détenteurs: {FruitHolder.objects.count()}')
-
+        self.stdout.write(f'  - Arcs: {counts["arcs"]}')
+        self.stdout.write(f'  - Épisodes: {counts["episodes"]}')
+        self.stdout.write(f'  - Équipages: {counts["crews"]}')
+        self.stdout.write(f'  - Personnages: {counts["characters"]}')
+        self.stdout.write(f'  - Fruits du démon: {counts["devil_fruits"]}')
+        self.stdout.write(f'  - Détenteurs: {counts["fruit_holders"]}')
+        if since is not None:
+            self.stdout.write(f'  - Suppressions: {counts["deleted"]}')
@@ -0,0 +1,391 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import IntegrityError, connection, transaction
+from collections import defaultdict
+from itertools import zip_longest
+import gzip
+import io
+import json
+import re
+
+from knowledge.models import Character, Crew, DevilFruit, Arc, Episode, FruitHolder, NATURAL_KEYS
+from knowledge.signals import invalidate_after_bulk_write
+
+
+# Ordre des dépendances; en --upsert, la clé naturelle (NATURAL_KEYS) retrouve la ligne locale
+# d'un enregistrement (les clés primaires de deux bases n'ont rien en commun)
+IMPORT_ORDER = [Arc, Episode, Crew, Character, DevilFruit, FruitHolder]
+MODELS_BY_LABEL = {model._meta.label_lower: model for model in IMPORT_ORDER}
+
+WHITESPACE = re.compile(r'[\s,:]*')
+
+
+def open_input(filename):
+    """Ouvre le fichier d'export en texte, décompressé à la volée selon l'extension"""
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'rt', encoding='utf-8')
+    if filename.endswith('.zst'):
+        try:
+            import zstandard
+        except ImportError:
+            raise CommandError("La décompression zstd nécessite le paquet 'zstandard' (pip install zstandard)")
+        reader = zstandard.ZstdDecompressor().stream_reader(open(filename, 'rb'), closefd=True)
+        return io.TextIOWrapper(reader, encoding='utf-8')
+    return open(filename, encoding='utf-8')
+
+
+def iter_json_records(f, read_size=1 << 16):
+    """Parcourt les enregistrements des tableaux d'un export JSON sans charger tout le fichier.
+
+    Accepte le format de export_json ({"arcs": [...], ...}) comme une liste dumpdata.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos = '', 0
+    in_array = False
+    eof = False
+    while True:
+        pos = WHITESPACE.match(buffer, pos).end()
+        if pos >= len(buffer) or (in_array and buffer[pos] == '{' and not eof and len(buffer) - pos < read_size):
+            if eof:
+                if pos >= len(buffer):
+                    return
+            else:
+                chunk = f.read(read_size)
+                buffer, pos = buffer[pos:] + chunk, 0
+                eof = not chunk
+                continue
+        char = buffer[pos]
+        if char == '[':
+            in_array = True
+            pos += 1
+        elif char == ']':
+            in_array = False
+            pos += 1
+        elif not in_array and char in '{}':
+            pos += 1
+        else:
+            try:
+                value, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise CommandError(f'JSON invalide près de: {buffer[pos:pos + 80]!r}')
+                chunk = f.read(read_size)
+                buffer, pos = buffer[pos:] + chunk, 0
+                eof = not chunk
+                continue
+            if in_array:
+                yield value
+
+
+def iter_jsonl_records(f):
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+
+def natural_key_paths(model, prefix=''):
+    """Chemins de lookup des valeurs d'une clé naturelle, une fois aplatie (voir flatten_natural_key)"""
+    paths = []
+    for name in NATURAL_KEYS[model]:
+        field = model._meta.get_field(name)
+        if field.is_relation:
+            paths.extend(natural_key_paths(field.related_model, f'{prefix}{name}__'))
+        else:
+            paths.append(f'{prefix}{name}')
+    return paths
+
+
+def flatten_natural_key(model, key):
+    """Clé naturelle lue dans l'export (listes imbriquées pour les clés étrangères) -> tuple de valeurs"""
+    names = NATURAL_KEYS[model]
+    if not isinstance(key, list) or len(key) != len(names):
+        raise ValueError(key)
+    values = []
+    for name, value in zip(names, key):
+        field = model._meta.get_field(name)
+        if field.is_relation:
+            values.extend(flatten_natural_key(field.related_model, value))
+        else:
+            values.append(field.to_python(value))
+    return tuple(values)
+
+
+class Importer:
+    """Insère les enregistrements par paquets (bulk_create) dans l'ordre des dépendances"""
+
+    def __init__(self, batch_size, upsert):
+        self.batch_size = batch_size
+        self.upsert = upsert
+        # --upsert: clé primaire source -> clé primaire cible, des lignes écrites et des références
+        # retrouvées par clé naturelle. Sans --upsert, les clés primaires source sont conservées
+        self.pk_maps = defaultdict(dict)
+        # --upsert: références hors du fichier, modèle -> {clé source: (clé naturelle, origine)}
+        self.lookups = defaultdict(dict)
+        # --upsert: clés primaires cibles écrites par l'import, que les tombstones ne suppriment pas
+        self.written = defaultdict(set)
+        self.model = None
+        self.pending = []
+        self.deferred = []
+        self.tombstones = defaultdict(list)
+        self.counts = defaultdict(int)
+
+    def resolve(self, model, source_pk):
+        if source_pk is None or not self.upsert:
+            return source_pk
+        return self.pk_maps[model][source_pk]
+
+    def reference(self, model, source_pk, key, origin):
+        """--upsert: une référence hors du fichier sera retrouvée par sa clé naturelle (resolve_lookups).
+
+        Jamais par sa clé primaire source: dans la base cible, elle désigne au mieux une ligne
+        inexistante, au pire une autre ligne.
+        """
+        if not self.upsert or source_pk is None or source_pk in self.pk_maps[model]:
+            return
+        if key is None:
+            raise CommandError(
+                f'{origin}: {model._meta.label_lower} #{source_pk} absent du fichier, '
+                f'sans clé naturelle pour le retrouver dans la base cible'
+            )
+        self.lookups[model].setdefault(source_pk, (key, origin))
+
+    def find_natural_keys(self, model, keys, origins):
+        """Clé naturelle aplatie -> clé primaire des lignes locales correspondantes, par paquets.
+
+        ``keys`` et ``origins`` sont alignés; origine citée si une clé est invalide.
+        """
+        flattened = []
+        for key, origin in zip(keys, origins):
+            try:
+                flattened.append(flatten_natural_key(model, key))
+            except (TypeError, ValueError, ValidationError):
+                raise CommandError(f'{origin}: clé naturelle invalide pour {model._meta.label_lower}: {key!r}')
+        paths = natural_key_paths(model)
+        distinct = list(set(flattened))
+        found = {}
+        for start in range(0, len(distinct), self.batch_size):
+            batch = distinct[start:start + self.batch_size]
+            rows = model.objects.filter(**{f'{paths[0]}__in': {key[0] for key in batch}})
+            found.update((tuple(row[1:]), row[0]) for row in rows.values_list('pk', *paths))
+        return flattened, found
+
+    def resolve_lookups(self):
+        """--upsert: clés primaires cibles des références hors du fichier; erreur si l'une est introuvable"""
+        for model, lookups in self.lookups.items():
+            source_pks = list(lookups)
+            keys, origins = zip(*lookups.values())
+            flattened, found = self.find_natural_keys(model, keys, origins)
+            for source_pk, key, flat, origin in zip(source_pks, keys, flattened, origins):
+                if flat not in found:
+                    raise CommandError(
+                        f'{origin}: {model._meta.label_lower} #{source_pk} absent du fichier et de la base cible '
+                        f'(clé naturelle {key!r})'
+                    )
+                self.pk_maps[model][source_pk] = found[flat]
+        self.lookups.clear()
+
+    def feed(self, record):
+        model = MODELS_BY_LABEL.get(record.get('model'))
+        if model is None:
+            raise CommandError(f"Modèle inconnu dans l'export: {record.get('model')!r}")
+        if 'fields' not in record:
+            self.tombstones[model].append(record)
+            return
+        if model is not self.model:
+            self.flush()
+            self.model = model
+        self.pending.append(self.build(model, record))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def build(self, model, record):
+        obj = model(pk=record['pk'])
+        keys = record.get('natural_foreign_keys') or {}
+        relations, m2m = [], {}
+        for name, value in record['fields'].items():
+            field = model._meta.get_field(name)
+            origin = f"{record['model']} #{record['pk']} ({name})"
+            if field.many_to_many:
+                m2m[field] = value
+                for target, key in zip_longest(value, keys.get(name) or []):
+                    self.reference(field.related_model, target, key, origin)
+            elif field.is_relation:
+                if value is not None and IMPORT_ORDER.index(field.related_model) > IMPORT_ORDER.index(model):
+                    # Cible pas encore importée (ex: Crew.captain): renseignée à la fin
+                    self.deferred.append((model, record['pk'], field, value, keys.get(name)))
+                    value = None
+                self.reference(field.related_model, value, keys.get(name), origin)
+                relations.append((field, value))
+            else:
+                setattr(obj, field.attname, field.to_python(value))
+        return obj, relations, m2m
+
+    def flush(self):
+        if not self.pending:
+            return
+        model = self.model
+        if self.upsert:
+            self.resolve_lookups()
+        for obj, relations, _ in self.pending:
+            for field, value in relations:
+                setattr(obj, field.attname, self.resolve(field.related_model, value))
+        objs = [obj for obj, _, _ in self.pending]
+        source_pks = [obj.pk for obj in objs]
+        if self.upsert:
+            self.upsert_objects(model, objs)
+            for source_pk, obj in zip(source_pks, objs):
+                self.pk_maps[model][source_pk] = obj.pk
+                self.written[model].add(obj.pk)
+        else:
+            model.objects.bulk_create(objs, batch_size=self.batch_size)
+
+        for field in model._meta.many_to_many:
+            self.flush_m2m(model, field, source_pks)
+        self.counts[model] += len(objs)
+        self.pending = []
+
+    def upsert_objects(self, model, objs):
+        """Met à jour les lignes de même clé naturelle, crée les autres avec une nouvelle clé primaire"""
+        attnames = [model._meta.get_field(name).attname for name in NATURAL_KEYS[model]]
+
+        def natural_key(obj):
+            return tuple(getattr(obj, attname) for attname in attnames)
+
+        existing = self.find_existing(model, attnames, objs)
+        updates, inserts = [], []
+        for obj in objs:
+            obj.pk = existing.get(natural_key(obj))
+            (inserts if obj.pk is None else updates).append(obj)
+        if updates:
+            update_fields = [f.name for f in model._meta.concrete_fields if not f.primary_key]
+            model.objects.bulk_update(updates, update_fields, batch_size=self.batch_size)
+        if inserts:
+            model.objects.bulk_create(inserts, batch_size=self.batch_size)
+            if any(obj.pk is None for obj in inserts):
+                # Base qui ne renvoie pas les clés primaires créées par bulk_create
+                created = self.find_existing(model, attnames, inserts)
+                for obj in inserts:
+                    obj.pk = created[natural_key(obj)]
+
+    @staticmethod
+    def find_existing(model, attnames, objs):
+        """Clé naturelle -> clé primaire des lignes locales correspondant à ``objs`` (une requête)"""
+        first = attnames[0]
+        rows = model.objects.filter(**{f'{first}__in': {getattr(obj, first) for obj in objs}})
+        return {tuple(row[1:]): row[0] for row in rows.values_list('pk', *attnames)}
+
+    def flush_m2m(self, model, field, source_pks):
+        through = field.remote_field.through
+        source_column = f'{field.m2m_field_name()}_id'
+        target_column = f'{field.m2m_reverse_field_name()}_id'
+        owner_ids = [self.resolve(model, pk) for pk in source_pks]
+        if self.upsert:
+            through.objects.filter(**{f'{source_column}__in': owner_ids}).delete()
+        rows = [
+            through(**{source_column: owner_id, target_column: self.resolve(field.related_model, target)})
+            for owner_id, (_, _, m2m) in zip(owner_ids, self.pending)
+            for target in m2m.get(field, [])
+        ]
+        through.objects.bulk_create(rows, batch_size=self.batch_size, ignore_conflicts=True)
+
+    def tombstone_pks(self, model, tombstones):
+        """Clés primaires cibles des lignes supprimées dans la base source.
+
+        --upsert: retrouvées par clé naturelle; erreur pour un tombstone qui n'en a pas. Une ligne
+        déjà absente n'a rien à supprimer; une ligne écrite par cet import (supprimée puis recréée
+        dans la base source) est conservée.
+        """
+        if not self.upsert:
+            return [tombstone['pk'] for tombstone in tombstones]
+        label = model._meta.label_lower
+        for tombstone in tombstones:
+            if tombstone.get('natural_key') is None:
+                raise CommandError(
+                    f"Suppression de {label} #{tombstone['pk']} sans clé naturelle: "
+                    f"impossible de retrouver la ligne dans la base cible"
+                )
+        keys = [tombstone['natural_key'] for tombstone in tombstones]
+        origins = [f"suppression de {label} #{tombstone['pk']}" for tombstone in tombstones]
+        flattened, found = self.find_natural_keys(model, keys, origins)
+        pks = {found[key] for key in flattened if key in found}
+        return sorted(pks - self.written[model])
+
+    def finish(self):
+        self.flush()
+        self.model = None
+
+        # Références vers des modèles importés plus tard (capitaines d'équipage)
+        for model, source_pk, field, value, key in self.deferred:
+            self.reference(field.related_model, value, key, f'{model._meta.label_lower} #{source_pk} ({field.name})')
+        if self.upsert:
+            self.resolve_lookups()
+        updates = defaultdict(list)
+        for model, source_pk, field, value, _ in self.deferred:
+            obj = model(pk=self.resolve(model, source_pk))
+            setattr(obj, field.attname, self.resolve(field.related_model, value))
+            updates[(model, field.attname)].append(obj)
+        for (model, attname), objs in updates.items():
+            model.objects.bulk_update(objs, [attname], batch_size=self.batch_size)
+
+        # Tombstones d'un export incrémental, dans l'ordre inverse des dépendances
+        for model in reversed(IMPORT_ORDER):
+            pks = self.tombstone_pks(model, self.tombstones.get(model, []))
+            for start in range(0, len(pks), self.batch_size):
+                model.objects.filter(pk__in=pks[start:start + self.batch_size]).delete()
+
+        # Clés primaires source conservées (hors --upsert): remettre les séquences à niveau (Oracle, PostgreSQL)
+        sequence_sql = connection.ops.sequence_reset_sql(no_style(), IMPORT_ORDER)
+        if sequence_sql:
+            with connection.cursor() as cursor:
+                for line in sequence_sql:
+                    cursor.execute(line)
+
+
+class Command(BaseCommand):
+    help = 'Importe un export JSON (ou JSON-Lines) produit par export_json'
+
+    def add_arguments(self, parser):
+        parser.add_argument('filename', type=str, help='Fichier exporté (.json, .jsonl, éventuellement .gz/.zst)')
+        parser.add_argument('--format', choices=['auto', 'json', 'jsonl'], default='auto',
+                            help="Format du fichier (auto: d'après l'extension)")
+        parser.add_argument('--batch-size', type=int, default=1000, help='Nombre de lignes par bulk_create')
+        parser.add_argument('--upsert', action='store_true',
+                            help='Met à jour les lignes existantes (même clé naturelle) au lieu d\'échouer; '
+                                 'les nouvelles lignes reçoivent une clé primaire locale')
+
+    def handle(self, *args, **options):
+        filename = options['filename']
+        fmt = options['format']
+        if fmt == 'auto':
+            fmt = 'jsonl' if '.jsonl' in filename else 'json'
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size doit être positif')
+
+        importer = Importer(options['batch_size'], options['upsert'])
+        try:
+            with open_input(filename) as f, transaction.atomic():
+                records = iter_jsonl_records(f) if fmt == 'jsonl' else iter_json_records(f)
+                for record in records:
+                    importer.feed(record)
+                importer.finish()
+        except FileNotFoundError:
+            raise CommandError(f'Fichier introuvable: {filename}')
+        except IntegrityError as e:
+            if options['upsert']:
+                raise CommandError(f"Conflit à l'import ({e}): données incompatibles avec les lignes existantes")
+            raise CommandError(f"Conflit à l'import ({e}); utiliser --upsert pour mettre à jour les lignes existantes")
+
+        invalidate_after_bulk_write()
+
+        self.stdout.write(self.style.SUCCESS(f'Import terminé: {filename}'))
+        self.stdout.write('\nStatistiques:')
+        self.stdout.write(f'  - Arcs: {importer.counts[Arc]}')
+        self.stdout.write(f'  - Épisodes: {importer.counts[Episode]}')
+        self.stdout.write(f'  - Équipages: {importer.counts[Crew]}')
+        self.stdout.write(f'  - Personnages: {importer.counts[Character]}')
+        self.stdout.write(f'  - Fruits du démon: {importer.counts[DevilFruit]}')
+        self.stdout.write(f'  - Détenteurs: {importer.counts[FruitHolder]}')
+        deleted = sum(len(tombstones) for tombstones in importer.tombstones.values())
+        if deleted:
+            self.stdout.write(f'  - Suppressions: {deleted}')
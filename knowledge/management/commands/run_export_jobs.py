@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+import time
+
+from knowledge.jobs import requeue_stale_jobs, run_job
+from knowledge.models import ExportJob
+
+
+class Command(BaseCommand):
+    help = ("Exécute les exports en attente (jobs lancés depuis l'admin), y compris les jobs "
+            "d'un processus arrêté (en cours sans avancement depuis EXPORT_JOB_STALE_TIMEOUT)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Attendre et exécuter les nouveaux jobs au lieu de s\'arrêter')
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help='Délai entre deux recherches de jobs avec --loop (secondes)')
+
+    def handle(self, *args, **options):
+        while True:
+            requeue_stale_jobs()
+            pending = ExportJob.objects.filter(status=ExportJob.Status.PENDING).order_by('created_at')
+            for pk in list(pending.values_list('pk', flat=True)):
+                # Un autre processus a pu le réclamer entre-temps
+                if run_job(pk):
+                    job = ExportJob.objects.get(pk=pk)
+                    self.stdout.write(f'{job}: {job.get_status_display()} {job.result.name or job.error}')
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
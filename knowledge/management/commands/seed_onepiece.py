@@ -1,8 +1,16 @@
-from django.core.management.base import BaseCommand
-from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from array import array
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import date, timedelta
+from itertools import islice
 import random
 
-from knowledge.models import Character, Crew, DevilFruit, Arc, Episode, FruitHolder
+from knowledge.models import Character, Crew, DevilFruit, Arc, Episode, FruitHolder, DeletedRecord
+from knowledge.signals import invalidate_after_bulk_write
 
 
 # Données réelles One Piece
@@ -109,6 +117,101 @@ ONE_PIECE_ARCS = [
 ]
 
 
+CREW_CAPTAINS = {
+    'Équipage du Chapeau de Paille': 'Monkey D. Luffy',
+    'Équipage de Barbe Rouge': 'Edward Newgate',
+    'Équipage de Barbe Noire': 'Marshall D. Teach',
+    'Équipage du Chapeau de Paille (Heart)': 'Trafalgar D. Water Law',
+    'Équipage de Kid': 'Eustass Kid',
+    'Équipage de Big Mom': 'Charlotte Linlin',
+    'Équipage de Kaido': 'Kaido',
+    'Équipage de Buggy': 'Buggy',
+    'Équipage de Crocodile': 'Crocodile',
+    'Équipage de Donquixote': 'Donquixote Doflamingo',
+    'Équipage de Shanks': 'Shanks',
+    'Équipage de Kuja': 'Boa Hancock',
+}
+
+# Membres de chaque équipage (assignations cohérentes)
+CREW_MEMBERS = {
+    'Équipage du Chapeau de Paille': ['Monkey D. Luffy', 'Roronoa Zoro', 'Nami', 'Usopp', 'Sanji', 'Tony Tony Chopper', 'Nico Robin', 'Franky', 'Brook', 'Jinbe'],
+    'Équipage de Barbe Rouge': ['Edward Newgate'],  # Seulement le capitaine pour éviter les erreurs
+    'Équipage de Barbe Noire': ['Marshall D. Teach'],  # Seulement le capitaine
+    'Équipage du Chapeau de Paille (Heart)': ['Trafalgar D. Water Law'],  # Seulement le capitaine
+    'Équipage de Kid': ['Eustass Kid'],  # Seulement le capitaine
+    'Équipage de Big Mom': ['Charlotte Linlin'],  # Seulement le capitaine
+    'Équipage de Kaido': ['Kaido'],  # Seulement le capitaine
+    'Équipage de Buggy': ['Buggy'],  # Seulement le capitaine
+    'Équipage de Crocodile': ['Crocodile'],  # Seulement le capitaine
+    'Équipage de Donquixote': ['Donquixote Doflamingo'],  # Seulement le capitaine
+    'Équipage de Shanks': ['Shanks'],  # Seulement le capitaine
+    'Équipage de Kuja': ['Boa Hancock'],  # Seulement le capitaine
+    'Équipage de Jinbe': ['Jinbe'],  # Seulement le capitaine
+}
+
+# Détenteurs actuels (assignations réelles)
+FRUIT_HOLDERS = {
+    'Gomu Gomu no Mi': 'Monkey D. Luffy',
+    'Mera Mera no Mi': 'Portgas D. Ace',
+    'Magu Magu no Mi': 'Sakazuki',
+    'Pika Pika no Mi': 'Borsalino',
+    'Hana Hana no Mi': 'Nico Robin',
+    'Yami Yami no Mi': 'Marshall D. Teach',
+    'Gura Gura no Mi': 'Edward Newgate',
+    'Ope Ope no Mi': 'Trafalgar D. Water Law',
+    'Mero Mero no Mi': 'Boa Hancock',
+    'Suna Suna no Mi': 'Crocodile',
+    'Ito Ito no Mi': 'Donquixote Doflamingo',
+    'Hito Hito no Mi': 'Tony Tony Chopper',
+    'Soru Soru no Mi': 'Charlotte Linlin',
+    'Yomi Yomi no Mi': 'Brook',
+    'Suke Suke no Mi': 'Absalom',
+    'Bara Bara no Mi': 'Buggy',
+}
+
+BATCH_SIZE = 5000
+
+
+class ArcIndex:
+    """Index d'intervalles [start, end] des arcs: recherche par dichotomie"""
+
+    def __init__(self, arcs):
+        self.arcs = sorted(arcs, key=lambda a: a.start_episode_number)
+        self.starts = [a.start_episode_number for a in self.arcs]
+
+    def find(self, episode_number):
+        i = bisect_right(self.starts, episode_number) - 1
+        if i >= 0 and episode_number <= self.arcs[i].end_episode_number:
+            return self.arcs[i]
+        return None
+
+
+def bulk_insert(model, objs, key):
+    """bulk_create puis dictionnaire clé naturelle -> objet avec sa clé primaire"""
+    model.objects.bulk_create(objs, batch_size=BATCH_SIZE)
+    if connection.features.can_return_rows_from_bulk_insert:
+        return {getattr(obj, key): obj for obj in objs}
+    return model.objects.in_bulk([getattr(obj, key) for obj in objs], field_name=key)
+
+
+def name_offset(model):
+    """Premier numéro des noms synthétiques (uniques) d'un nouveau lot: la plus grande clé primaire.
+
+    Le numéro donné à une ligne est inférieur à sa clé primaire: un nouveau lot ne reprend
+    jamais le numéro d'une ligne existante, même après des suppressions (ce que count() ferait).
+    """
+    return model.objects.aggregate(Max('pk'))['pk__max'] or 0
+
+
+def batched(iterable, size=BATCH_SIZE):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
 class Command(BaseCommand):
     help = 'Génère des données One Piece pour One Piece Knowledge Base'
 
@@ -119,65 +222,75 @@ class Command(BaseCommand):
         parser.add_argument('--fruits', type=int, default=0, help='Nombre de fruits à créer (0 = tous)')
         parser.add_argument('--arcs', type=int, default=0, help='Nombre d\'arcs à créer (0 = tous)')
         parser.add_argument('--episodes', type=int, default=200, help='Nombre d\'épisodes à créer')
+        parser.add_argument('--scale', type=int, default=0,
+                            help='Ajoute N personnages synthétiques (Faker), avec épisodes, équipages, fruits '
+                                 'et détenteurs en proportion, pour les tests de charge; sur une base déjà remplie, '
+                                 'seules ces données sont ajoutées')
+        parser.add_argument('--seed', type=int, help='Graine aléatoire (génération reproductible)')
 
     def handle(self, *args, **options):
+        if options['scale'] < 0:
+            raise CommandError('--scale doit être positif')
+        if options['seed'] is not None:
+            random.seed(options['seed'])
+
         if options['reset']:
             self.stdout.write(self.style.WARNING('Suppression de toutes les données...'))
-            FruitHolder.objects.all().delete()
-            Character.objects.all().delete()
-            Crew.objects.all().delete()
-            DevilFruit.objects.all().delete()
-            Episode.objects.all().delete()
-            Arc.objects.all().delete()
+            # Vidage des tables en SQL (comme la commande flush) plutôt qu'un delete() ligne par ligne
+            # avec signaux; les tombstones n'ont plus de sens après une remise à zéro des clés
+            models = [FruitHolder, Character.crews.through, Crew, Character, DevilFruit, Episode, Arc, DeletedRecord]
+            connection.ops.execute_sql_flush(connection.ops.sql_flush(
+                no_style(), [model._meta.db_table for model in models], reset_sequences=True
+            ))
             self.stdout.write(self.style.SUCCESS('Données supprimées'))
 
+        # Les données de référence ont des noms fixes: on ne les insère que dans une base vide
+        seeded = Arc.objects.exists()
+        if seeded and not options['scale']:
+            raise CommandError('La base contient déjà des données: relancer avec --reset, '
+                               'ou avec --scale pour n\'ajouter que des données synthétiques')
+
+        with transaction.atomic():
+            if seeded:
+                self.stdout.write('Données de référence déjà présentes: ajout des seules données synthétiques')
+            else:
+                self.seed_reference_data(options)
+            if options['scale']:
+                self.seed_synthetic_data(options['scale'], options['seed'])
+        invalidate_after_bulk_write()
+
+    def seed_reference_data(self, options):
         # Créer les arcs
         self.stdout.write('Création des arcs...')
-        arcs = []
         num_arcs = options['arcs'] if options['arcs'] > 0 else len(ONE_PIECE_ARCS)
         selected_arcs = ONE_PIECE_ARCS[:num_arcs] if num_arcs <= len(ONE_PIECE_ARCS) else ONE_PIECE_ARCS
-        
-        for arc_data in selected_arcs:
-            arc = Arc.objects.create(
+        arcs = list(bulk_insert(Arc, [
+            Arc(
                 name=arc_data['name'],
                 saga=arc_data['saga'],
                 start_episode_number=arc_data['start'],
                 end_episode_number=arc_data['end'],
                 description=f"Arc {arc_data['name']} de la saga {arc_data['saga']}"
             )
-            arcs.append(arc)
-        
+            for arc_data in selected_arcs
+        ], 'name').values())
         self.stdout.write(self.style.SUCCESS(f'{len(arcs)} arcs créés'))
 
-        # Créer les épisodes
+        # Créer les épisodes (arc trouvé par dichotomie sur les intervalles)
         self.stdout.write('Création des épisodes...')
-        episodes = []
-        for i in range(options['episodes']):
-            # Trouver l'arc correspondant
-            arc = None
-            for a in arcs:
-                if a.start_episode_number <= (i + 1) <= a.end_episode_number:
-                    arc = a
-                    break
-            
-            episode = Episode.objects.create(
-                number=i + 1,
-                title=f"Épisode {i + 1}",
-                air_date=None,
-                arc=arc
-            )
-            episodes.append(episode)
-        
+        arc_index = ArcIndex(arcs)
+        episodes = list(bulk_insert(Episode, [
+            Episode(number=i + 1, title=f"Épisode {i + 1}", air_date=None, arc=arc_index.find(i + 1))
+            for i in range(options['episodes'])
+        ], 'number').values())
         self.stdout.write(self.style.SUCCESS(f'{len(episodes)} épisodes créés'))
 
         # Créer les fruits du démon
         self.stdout.write('Création des fruits du démon...')
-        fruits = []
         num_fruits = options['fruits'] if options['fruits'] > 0 else len(ONE_PIECE_FRUITS)
         selected_fruits = ONE_PIECE_FRUITS[:num_fruits] if num_fruits <= len(ONE_PIECE_FRUITS) else ONE_PIECE_FRUITS
-        
-        for fruit_data in selected_fruits:
-            fruit = DevilFruit.objects.create(
+        fruits = bulk_insert(DevilFruit, [
+            DevilFruit(
                 name=fruit_data['name'],
                 romanji=fruit_data.get('romanji', ''),
                 fruit_type=fruit_data['fruit_type'],
@@ -188,35 +301,31 @@ class Command(BaseCommand):
                 first_appearance_arc=random.choice(arcs) if arcs and random.random() > 0.5 else None,
                 description=f"Fruit du démon de type {fruit_data['fruit_type']}"
             )
-            fruits.append(fruit)
-        
+            for fruit_data in selected_fruits
+        ], 'name')
         self.stdout.write(self.style.SUCCESS(f'{len(fruits)} fruits créés'))
 
         # Créer les équipages
         self.stdout.write('Création des équipages...')
-        crews = []
         num_crews = options['crews'] if options['crews'] > 0 else len(ONE_PIECE_CREWS)
         selected_crews = ONE_PIECE_CREWS[:num_crews] if num_crews <= len(ONE_PIECE_CREWS) else ONE_PIECE_CREWS
-        
-        for crew_data in selected_crews:
-            crew = Crew.objects.create(
+        crews = bulk_insert(Crew, [
+            Crew(
                 name=crew_data['name'],
                 ship_name=crew_data.get('ship_name', ''),
                 base_location=crew_data.get('base_location', ''),
                 description=f"Équipage de pirates célèbre"
             )
-            crews.append(crew)
-        
+            for crew_data in selected_crews
+        ], 'name')
         self.stdout.write(self.style.SUCCESS(f'{len(crews)} équipages créés'))
 
         # Créer les personnages
         self.stdout.write('Création des personnages...')
-        characters = []
         num_chars = options['characters'] if options['characters'] > 0 else len(ONE_PIECE_CHARACTERS)
         selected_chars = ONE_PIECE_CHARACTERS[:num_chars] if num_chars <= len(ONE_PIECE_CHARACTERS) else ONE_PIECE_CHARACTERS
-        
-        for char_data in selected_chars:
-            character = Character.objects.create(
+        characters = bulk_insert(Character, [
+            Character(
                 name=char_data['name'],
                 epithet=char_data.get('epithet', ''),
                 role=char_data['role'],
@@ -227,97 +336,168 @@ class Command(BaseCommand):
                 description=f"Personnage de One Piece",
                 image_url=''
             )
-            characters.append(character)
-        
+            for char_data in selected_chars
+        ], 'name')
         self.stdout.write(self.style.SUCCESS(f'{len(characters)} personnages créés'))
 
         # Assigner des capitaines aux équipages
         self.stdout.write('Assignation des capitaines...')
-        crew_captains = {
-            'Équipage du Chapeau de Paille': 'Monkey D. Luffy',
-            'Équipage de Barbe Rouge': 'Edward Newgate',
-            'Équipage de Barbe Noire': 'Marshall D. Teach',
-            'Équipage du Chapeau de Paille (Heart)': 'Trafalgar D. Water Law',
-            'Équipage de Kid': 'Eustass Kid',
-            'Équipage de Big Mom': 'Charlotte Linlin',
-            'Équipage de Kaido': 'Kaido',
-            'Équipage de Buggy': 'Buggy',
-            'Équipage de Crocodile': 'Crocodile',
-            'Équipage de Donquixote': 'Donquixote Doflamingo',
-            'Équipage de Shanks': 'Shanks',
-            'Équipage de Kuja': 'Boa Hancock',
-        }
-        
-        for crew in crews:
-            captain_name = crew_captains.get(crew.name)
-            if captain_name:
-                captain = next((c for c in characters if c.name == captain_name), None)
-                if captain:
-                    crew.captain = captain
-                    crew.save()
-
-        # Assigner des personnages aux équipages (assignations cohérentes)
+        captained = []
+        for crew_name, captain_name in CREW_CAPTAINS.items():
+            if crew_name in crews and captain_name in characters:
+                crews[crew_name].captain = characters[captain_name]
+                captained.append(crews[crew_name])
+        Crew.objects.bulk_update(captained, ['captain'])
+
+        # Assigner des personnages aux équipages (une seule insertion dans la table de liaison)
         self.stdout.write('Assignation des membres aux équipages...')
-        
-        # Définir les membres de chaque équipage
-        crew_members_map = {
-            'Équipage du Chapeau de Paille': ['Monkey D. Luffy', 'Roronoa Zoro', 'Nami', 'Usopp', 'Sanji', 'Tony Tony Chopper', 'Nico Robin', 'Franky', 'Brook', 'Jinbe'],
-            'Équipage de Barbe Rouge': ['Edward Newgate'],  # Seulement le capitaine pour éviter les erreurs
-            'Équipage de Barbe Noire': ['Marshall D. Teach'],  # Seulement le capitaine
-            'Équipage du Chapeau de Paille (Heart)': ['Trafalgar D. Water Law'],  # Seulement le capitaine
-            'Équipage de Kid': ['Eustass Kid'],  # Seulement le capitaine
-            'Équipage de Big Mom': ['Charlotte Linlin'],  # Seulement le capitaine
-            'Équipage de Kaido': ['Kaido'],  # Seulement le capitaine
-            'Équipage de Buggy': ['Buggy'],  # Seulement le capitaine
-            'Équipage de Crocodile': ['Crocodile'],  # Seulement le capitaine
-            'Équipage de Donquixote': ['Donquixote Doflamingo'],  # Seulement le capitaine
-            'Équipage de Shanks': ['Shanks'],  # Seulement le capitaine
-            'Équipage de Kuja': ['Boa Hancock'],  # Seulement le capitaine
-            'Équipage de Jinbe': ['Jinbe'],  # Seulement le capitaine
-        }
-        
-        # Assigner les membres selon le mapping
-        for crew in crews:
-            member_names = crew_members_map.get(crew.name, [])
-            if member_names:
-                crew_members = [c for c in characters if c.name in member_names]
-                if crew_members:
-                    crew.members.set(crew_members)
-                    self.stdout.write(f'  - {crew.name}: {len(crew_members)} membres assignés')
+        Membership = Character.crews.through
+        memberships = []
+        for crew_name, member_names in CREW_MEMBERS.items():
+            crew = crews.get(crew_name)
+            crew_members = [characters[name] for name in member_names if name in characters]
+            if crew and crew_members:
+                memberships.extend(Membership(character_id=c.pk, crew_id=crew.pk) for c in crew_members)
+                self.stdout.write(f'  - {crew.name}: {len(crew_members)} membres assignés')
+        Membership.objects.bulk_create(memberships, batch_size=BATCH_SIZE)
 
         # Créer des FruitHolders (assignations réelles)
         self.stdout.write('Création des détenteurs de fruits...')
-        fruit_holders_map = {
-            'Gomu Gomu no Mi': 'Monkey D. Luffy',
-            'Mera Mera no Mi': 'Portgas D. Ace',
-            'Magu Magu no Mi': 'Sakazuki',
-            'Pika Pika no Mi': 'Borsalino',
-            'Hana Hana no Mi': 'Nico Robin',
-            'Yami Yami no Mi': 'Marshall D. Teach',
-            'Gura Gura no Mi': 'Edward Newgate',
-            'Ope Ope no Mi': 'Trafalgar D. Water Law',
-            'Mero Mero no Mi': 'Boa Hancock',
-            'Suna Suna no Mi': 'Crocodile',
-            'Ito Ito no Mi': 'Donquixote Doflamingo',
-            'Hito Hito no Mi': 'Tony Tony Chopper',
-            'Soru Soru no Mi': 'Charlotte Linlin',
-            'Yomi Yomi no Mi': 'Brook',
-            'Suke Suke no Mi': 'Absalom',
-            'Bara Bara no Mi': 'Buggy',
-        }
-        
-        for fruit in fruits:
-            holder_name = fruit_holders_map.get(fruit.name)
-            if holder_name:
-                holder = next((c for c in characters if c.name == holder_name), None)
-                if holder:
-                    FruitHolder.objects.create(
-                        devil_fruit=fruit,
-                        character=holder,
-                        from_date=None,
-                        to_date=None,
-                        is_current=True
-                    )
+        FruitHolder.objects.bulk_create([
+            FruitHolder(
+                devil_fruit=fruits[fruit_name],
+                character=characters[holder_name],
+                from_date=None,
+                to_date=None,
+                is_current=True
+            )
+            for fruit_name, holder_name in FRUIT_HOLDERS.items()
+            if fruit_name in fruits and holder_name in characters
+        ], batch_size=BATCH_SIZE)
 
         self.stdout.write(self.style.SUCCESS('Données générées avec succès!'))
         self.stdout.write(f'Résumé: {len(characters)} personnages, {len(crews)} équipages, {len(fruits)} fruits, {len(arcs)} arcs, {len(episodes)} épisodes')
+
+    def seed_synthetic_data(self, scale, seed):
+        """Jeu de données synthétique pour les tests de charge: N personnages et le reste en proportion"""
+        from faker import Faker
+
+        fake = Faker('fr_FR')
+        if seed is not None:
+            Faker.seed(seed)
+        # Faker est lent à l'unité: on tire des réservoirs puis on combine au hasard
+        first_names = [fake.first_name() for _ in range(500)]
+        last_names = [fake.last_name() for _ in range(500)]
+        places = [fake.city() for _ in range(200)]
+        words = [fake.word() for _ in range(300)]
+        sentences = [fake.sentence(nb_words=12) for _ in range(200)]
+        roles = [choice for choice, _ in Character.Role.choices]
+        statuses = [choice for choice, _ in Character.Status.choices]
+        fruit_types = [choice for choice, _ in DevilFruit.FruitType.choices]
+
+        num_episodes = max(scale // 10, 1)
+        num_crews = max(scale // 50, 1)
+        num_fruits = max(scale // 20, 1)
+        self.stdout.write(f'Génération synthétique: {scale} personnages, {num_episodes} épisodes, '
+                          f'{num_crews} équipages, {num_fruits} fruits...')
+
+        # Épisodes à la suite des existants, rattachés à des arcs synthétiques de 50 épisodes
+        first_number = (Episode.objects.order_by('-number').values_list('number', flat=True).first() or 0) + 1
+        arc_count = name_offset(Arc)
+        arcs = []
+        for start in range(first_number, first_number + num_episodes, 50):
+            arc_count += 1
+            arcs.append(Arc(
+                name=f'Arc synthétique {arc_count}', saga=random.choice(words).capitalize(),
+                start_episode_number=start, end_episode_number=min(start + 49, first_number + num_episodes - 1),
+                description=random.choice(sentences),
+            ))
+        arc_index = ArcIndex(bulk_insert(Arc, arcs, 'name').values())
+        episode_ids = array('q')
+        air_date = date(1999, 10, 20)
+        for batch in batched(range(first_number, first_number + num_episodes)):
+            objs = [
+                Episode(number=n, title=f"{random.choice(words).capitalize()} {random.choice(words)}",
+                        air_date=air_date + timedelta(weeks=n), arc=arc_index.find(n))
+                for n in batch
+            ]
+            episode_ids.extend(obj.pk for obj in bulk_insert(Episode, objs, 'number').values())
+        self.stdout.write(self.style.SUCCESS(f'{len(episode_ids)} épisodes synthétiques créés'))
+
+        crew_offset = name_offset(Crew)
+        crew_ids = array('q')
+        for batch in batched(range(num_crews)):
+            objs = [
+                Crew(name=f'Équipage {random.choice(last_names)} #{crew_offset + i}',
+                     ship_name=f'{random.choice(words).capitalize()} {random.choice(words)}',
+                     base_location=random.choice(places), description=random.choice(sentences))
+                for i in batch
+            ]
+            crew_ids.extend(obj.pk for obj in bulk_insert(Crew, objs, 'name').values())
+        self.stdout.write(self.style.SUCCESS(f'{len(crew_ids)} équipages synthétiques créés'))
+
+        fruit_offset = name_offset(DevilFruit)
+        fruit_ids = array('q')
+        for batch in batched(range(num_fruits)):
+            objs = []
+            for i in batch:
+                word = random.choice(words).capitalize()
+                objs.append(DevilFruit(
+                    name=f'{word} {word.lower()} no Mi #{fruit_offset + i}', romanji=f'{word} {word.lower()} no Mi',
+                    fruit_type=random.choice(fruit_types), ability=random.choice(sentences),
+                    weaknesses='Eau de mer', rarity=random.randint(1, 5), description=random.choice(sentences),
+                ))
+            fruit_ids.extend(obj.pk for obj in bulk_insert(DevilFruit, objs, 'name').values())
+        self.stdout.write(self.style.SUCCESS(f'{len(fruit_ids)} fruits synthétiques créés'))
+
+        Membership = Character.crews.through
+        character_offset = name_offset(Character)
+        character_ids = array('q')
+        # Capitaine de chaque équipage: un membre tiré au hasard (échantillonnage au fil de l'eau)
+        member_counts, captain_ids = defaultdict(int), {}
+        for batch in batched(range(scale)):
+            objs = [
+                Character(
+                    name=f'{random.choice(first_names)} {random.choice(last_names)} #{character_offset + i}',
+                    epithet=random.choice(words).capitalize(), role=random.choice(roles),
+                    bounty=random.choice((0, random.randint(1, 5000) * 1_000_000)), origin=random.choice(places),
+                    status=random.choice(statuses), first_appearance_episode_id=random.choice(episode_ids),
+                    description=random.choice(sentences),
+                )
+                for i in batch
+            ]
+            created = bulk_insert(Character, objs, 'name').values()
+            memberships = []
+            for character in created:
+                character_ids.append(character.pk)
+                if random.random() < 0.8:
+                    crew_id = random.choice(crew_ids)
+                    memberships.append(Membership(character_id=character.pk, crew_id=crew_id))
+                    member_counts[crew_id] += 1
+                    if random.randrange(member_counts[crew_id]) == 0:
+                        captain_ids[crew_id] = character.pk
+            Membership.objects.bulk_create(memberships, batch_size=BATCH_SIZE)
+        self.stdout.write(self.style.SUCCESS(f'{len(character_ids)} personnages synthétiques créés'))
+
+        # Capitaines: un membre tiré au hasard par équipage (pas de capitaine sans membre)
+        captains = [Crew(pk=crew_id, captain_id=captain_id) for crew_id, captain_id in captain_ids.items()]
+        Crew.objects.bulk_update(captains, ['captain'], batch_size=BATCH_SIZE)
+
+        # Historique de 1 à 3 détenteurs par fruit, le dernier étant l'actuel
+        holder_count = 0
+        for batch in batched(fruit_ids):
+            holders = []
+            for fruit_id in batch:
+                start = date(1990, 1, 1) + timedelta(days=random.randint(0, 8000))
+                history = random.randint(1, 3)
+                for position in range(history):
+                    end = start + timedelta(days=random.randint(30, 3000))
+                    is_current = position == history - 1
+                    holders.append(FruitHolder(
+                        devil_fruit_id=fruit_id, character_id=random.choice(character_ids),
+                        from_date=start, to_date=None if is_current else end, is_current=is_current,
+                    ))
+                    start = end
+            FruitHolder.objects.bulk_create(holders, batch_size=BATCH_SIZE)
+            holder_count += len(holders)
+        self.stdout.write(self.style.SUCCESS(f'{holder_count} détenteurs synthétiques créés'))
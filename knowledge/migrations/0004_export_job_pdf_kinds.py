@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0003_export_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='exportjob',
+            name='kind',
+            field=models.CharField(choices=[('FRUITS_PDF', 'Fiches PDF de fruits'), ('FRUITS_PDF_ZIP', 'Fiches PDF de fruits (ZIP)'), ('FRUITS_CSV', 'CSV des fruits'), ('CHARACTERS_PDF', 'Fiches PDF de personnages'), ('CHARACTERS_PDF_ZIP', 'Fiches PDF de personnages (ZIP)'), ('CHARACTERS_CSV', 'CSV des personnages')], max_length=20),
+        ),
+    ]
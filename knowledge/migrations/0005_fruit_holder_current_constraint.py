@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:22
+
+from django.db import migrations, models
+
+
+def keep_one_current_holder(apps, schema_editor):
+    """Avant la contrainte: un seul détenteur actuel par fruit, le plus récent"""
+    FruitHolder = apps.get_model('knowledge', 'FruitHolder')
+    duplicated = (
+        FruitHolder.objects.filter(is_current=True).values('devil_fruit_id')
+        .annotate(total=models.Count('pk')).filter(total__gt=1).values_list('devil_fruit_id', flat=True)
+    )
+    for devil_fruit_id in list(duplicated):
+        holders = FruitHolder.objects.filter(devil_fruit_id=devil_fruit_id, is_current=True)
+        latest = holders.order_by(models.F('from_date').desc(nulls_last=True), '-pk').first()
+        holders.exclude(pk=latest.pk).update(is_current=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0004_export_job_pdf_kinds'),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_one_current_holder, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='fruitholder',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_current', True)), fields=('devil_fruit',), name='unique_current_holder_per_fruit', violation_error_message='Un seul détenteur actuel est autorisé par fruit du démon'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0005_fruit_holder_current_constraint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='fruitholder',
+            name='character',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='fruit_history', to='knowledge.character'),
+        ),
+        migrations.AlterField(
+            model_name='fruitholder',
+            name='devil_fruit',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='holders', to='knowledge.devilfruit'),
+        ),
+        migrations.AddIndex(
+            model_name='arc',
+            index=models.Index(fields=['start_episode_number'], name='arc_start_episode_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='character',
+            index=models.Index(fields=['bounty'], name='character_bounty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='character',
+            index=models.Index(fields=['role', 'bounty'], name='character_role_bounty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='character',
+            index=models.Index(fields=['role', 'name'], name='character_role_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='character',
+            index=models.Index(fields=['status', 'bounty'], name='character_status_bounty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='character',
+            index=models.Index(fields=['status', 'name'], name='character_status_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='devilfruit',
+            index=models.Index(fields=['rarity'], name='devilfruit_rarity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='devilfruit',
+            index=models.Index(fields=['fruit_type'], name='devilfruit_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='episode',
+            index=models.Index(fields=['title'], name='episode_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fruitholder',
+            index=models.Index(fields=['character', 'is_current'], name='holder_character_current_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fruitholder',
+            index=models.Index(fields=['devil_fruit', 'is_current'], name='holder_fruit_current_idx'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+from django.db import migrations
+
+
+# Copie figée de knowledge.search.SEARCH_FIELDS (table -> colonnes indexées)
+SEARCH_COLUMNS = {
+    'knowledge_character': ['name', 'epithet', 'role', 'description'],
+    'knowledge_crew': ['name', 'ship_name', 'base_location'],
+    'knowledge_devilfruit': ['name', 'romanji', 'ability', 'description'],
+    'knowledge_arc': ['name', 'saga', 'description'],
+    'knowledge_episode': ['title'],
+}
+
+
+def fts5_available(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def oracle_index_name(table, column):
+    return f'{table}_{column}_ctx'[:30].upper()
+
+
+def create_search_indexes(apps, schema_editor):
+    """Tables FTS5 remplies depuis les tables existantes (SQLite), index CONTEXT (Oracle)"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite' and fts5_available(schema_editor):
+        for table, columns in SEARCH_COLUMNS.items():
+            names = ', '.join(columns)
+            # Tables créées à la demande par les versions précédentes: reconstruites
+            schema_editor.execute(f'DROP TABLE IF EXISTS {table}_fts')
+            schema_editor.execute(
+                f'CREATE VIRTUAL TABLE {table}_fts USING fts5({names}, '
+                f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            )
+            schema_editor.execute(f'INSERT INTO {table}_fts (rowid, {names}) SELECT id, {names} FROM {table}')
+    elif vendor == 'oracle':
+        for table, columns in SEARCH_COLUMNS.items():
+            for column in columns:
+                schema_editor.execute(
+                    f'CREATE INDEX {oracle_index_name(table, column)} ON {table} ({column}) '
+                    f"INDEXTYPE IS CTXSYS.CONTEXT PARAMETERS ('SYNC (ON COMMIT)')"
+                )
+
+
+def drop_search_indexes(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for table in SEARCH_COLUMNS:
+            schema_editor.execute(f'DROP TABLE IF EXISTS {table}_fts')
+    elif vendor == 'oracle':
+        for table, columns in SEARCH_COLUMNS.items():
+            for column in columns:
+                schema_editor.execute(f'DROP INDEX {oracle_index_name(table, column)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0006_api_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
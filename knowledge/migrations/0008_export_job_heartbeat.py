@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:42
+
+from django.db import migrations, models
+
+
+def heartbeat_from_start(apps, schema_editor):
+    # Jobs déjà bloqués en cours: leur réclamation sert de dernier signe de vie
+    ExportJob = apps.get_model('knowledge', 'ExportJob')
+    ExportJob.objects.filter(status='RUNNING').update(heartbeat_at=models.F('started_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0007_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(heartbeat_from_start, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 16:12
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge', '0008_export_job_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deletedrecord',
+            name='natural_key',
+            field=models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True),
+        ),
+    ]
@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.db import models
-from django.core.exceptions import ValidationError
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils.translation import gettext_lazy as _
 
 
@@ -10,9 +12,11 @@ class Arc(models.Model):
     start_episode_number = models.IntegerField(default=1)
     end_episode_number = models.IntegerField(default=1)
     description = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ['start_episode_number']
+        indexes = [models.Index(fields=['start_episode_number'], name='arc_start_episode_idx')]
 
     def __str__(self):
         return self.name
@@ -24,9 +28,11 @@ class Episode(models.Model):
     title = models.CharField(max_length=300)
     air_date = models.DateField(null=True, blank=True)
     arc = models.ForeignKey(Arc, on_delete=models.SET_NULL, null=True, blank=True, related_name='episodes')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ['number']
+        indexes = [models.Index(fields=['title'], name='episode_title_idx')]
 
     def __str__(self):
         return f"#{self.number} - {self.title}"
@@ -39,6 +45,7 @@ class Crew(models.Model):
     base_location = models.CharField(max_length=200, blank=True)
     description = models.TextField(blank=True)
     captain = models.ForeignKey('Character', on_delete=models.SET_NULL, null=True, blank=True, related_name='captain_of')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ['name']
@@ -73,9 +80,21 @@ class Character(models.Model):
     description = models.TextField(blank=True)
     image_url = models.URLField(blank=True)
     crews = models.ManyToManyField(Crew, related_name='members', blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            # Tris de l'API (?ordering=bounty / name), seuls ou sous les filtres ?role= / ?status=
+            models.Index(fields=['bounty'], name='character_bounty_idx'),
+            models.Index(fields=['role', 'bounty'], name='character_role_bounty_idx'),
+            models.Index(fields=['role', 'name'], name='character_role_name_idx'),
+            models.Index(fields=['status', 'bounty'], name='character_status_bounty_idx'),
+            models.Index(fields=['status', 'name'], name='character_status_name_idx'),
+            # ?role= / ?status= triés par id (?ordering=id): la page se lit dans l'index, sans parcourir la table
+            models.Index(fields=['role', 'id'], name='character_role_id_idx'),
+            models.Index(fields=['status', 'id'], name='character_status_id_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -102,9 +121,14 @@ class DevilFruit(models.Model):
     status = models.CharField(max_length=10, choices=Status.choices, default=Status.ACTIVE)
     first_appearance_arc = models.ForeignKey(Arc, on_delete=models.SET_NULL, null=True, blank=True, related_name='fruits')
     description = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['rarity'], name='devilfruit_rarity_idx'),
+            models.Index(fields=['fruit_type'], name='devilfruit_type_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -116,37 +140,122 @@ class DevilFruit(models.Model):
 
 class FruitHolder(models.Model):
     """Historique des détenteurs de fruits du démon"""
-    devil_fruit = models.ForeignKey(DevilFruit, on_delete=models.CASCADE, related_name='holders')
-    character = models.ForeignKey(Character, on_delete=models.CASCADE, related_name='fruit_history')
+    # Index des clés étrangères remplacés par les index composites ci-dessous (même préfixe)
+    devil_fruit = models.ForeignKey(DevilFruit, on_delete=models.CASCADE, related_name='holders', db_index=False)
+    character = models.ForeignKey(Character, on_delete=models.CASCADE, related_name='fruit_history', db_index=False)
     from_date = models.DateField(null=True, blank=True)
     to_date = models.DateField(null=True, blank=True)
     is_current = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ['-is_current', '-from_date']
+        indexes = [
+            # Détenteurs actuels d'un personnage ou d'un fruit (listes, fiches, transferts)
+            models.Index(fields=['character', 'is_current'], name='holder_character_current_idx'),
+            models.Index(fields=['devil_fruit', 'is_current'], name='holder_fruit_current_idx'),
+        ]
+        constraints = [
+            # Un seul détenteur actuel par fruit, garanti par la base (index unique partiel).
+            # Pour changer de détenteur: knowledge.holders.transfer_fruit()
+            models.UniqueConstraint(
+                fields=['devil_fruit'], condition=models.Q(is_current=True),
+                name='unique_current_holder_per_fruit',
+                violation_error_message='Un seul détenteur actuel est autorisé par fruit du démon',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.character.name} - {self.devil_fruit.name}"
 
-    def clean(self):
-        # Vérifier qu'un seul holder est actuel par fruit
-        if self.is_current:
-            existing_current = FruitHolder.objects.filter(
-                devil_fruit=self.devil_fruit,
-                is_current=True
-            ).exclude(pk=self.pk if self.pk else None)
-            if existing_current.exists():
-                raise ValidationError(
-                    {'is_current': 'Un seul détenteur actuel est autorisé par fruit du démon'}
-                )
-
-    def save(self, *args, **kwargs):
-        self.full_clean()
-        # Si on définit un nouveau holder comme actuel, désactiver les autres
-        if self.is_current:
-            FruitHolder.objects.filter(
-                devil_fruit=self.devil_fruit,
-                is_current=True
-            ).exclude(pk=self.pk if self.pk else None).update(is_current=False)
-        super().save(*args, **kwargs)
 
+# Clé naturelle de chaque modèle: retrouve la ligne d'un enregistrement dans une autre base,
+# dont les clés primaires n'ont rien en commun avec celles-ci (import_json --upsert, tombstones)
+NATURAL_KEYS = {
+    Arc: ('name',),
+    Episode: ('number',),
+    Crew: ('name',),
+    Character: ('name',),
+    DevilFruit: ('name',),
+    FruitHolder: ('devil_fruit', 'character', 'from_date'),
+}
+
+
+def natural_key(instance):
+    """Valeurs de la clé naturelle d'une ligne, une clé étrangère remplacée par la clé naturelle de sa cible.
+
+    None si une cible n'existe plus.
+    """
+    values = []
+    for name in NATURAL_KEYS[type(instance)]:
+        field = instance._meta.get_field(name)
+        if field.is_relation:
+            try:
+                value = natural_key(getattr(instance, name))
+            except ObjectDoesNotExist:
+                value = None
+            if value is None:
+                return None
+        else:
+            value = getattr(instance, field.attname)
+        values.append(value)
+    return values
+
+
+class DeletedRecord(models.Model):
+    """Trace des suppressions, pour les exports incrémentaux (tombstones)"""
+    model_label = models.CharField(max_length=100)
+    object_pk = models.BigIntegerField()
+    # Clé naturelle de la ligne supprimée (voir NATURAL_KEYS), pour une base cible aux autres clés primaires
+    natural_key = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['deleted_at']
+
+    def __str__(self):
+        return f"{self.model_label}#{self.object_pk}"
+
+
+class ExportJob(models.Model):
+    """Export PDF/CSV exécuté en arrière-plan (voir knowledge/jobs.py)"""
+    class Kind(models.TextChoices):
+        FRUITS_PDF = 'FRUITS_PDF', _('Fiches PDF de fruits')
+        FRUITS_PDF_ZIP = 'FRUITS_PDF_ZIP', _('Fiches PDF de fruits (ZIP)')
+        FRUITS_CSV = 'FRUITS_CSV', _('CSV des fruits')
+        CHARACTERS_PDF = 'CHARACTERS_PDF', _('Fiches PDF de personnages')
+        CHARACTERS_PDF_ZIP = 'CHARACTERS_PDF_ZIP', _('Fiches PDF de personnages (ZIP)')
+        CHARACTERS_CSV = 'CHARACTERS_CSV', _('CSV des personnages')
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', _('En attente')
+        RUNNING = 'RUNNING', _('En cours')
+        DONE = 'DONE', _('Terminé')
+        FAILED = 'FAILED', _('Échec')
+
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    object_ids = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING, db_index=True)
+    total = models.IntegerField(default=0)
+    processed = models.IntegerField(default=0)
+    result = models.FileField(upload_to='exports/%Y/%m/', blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Dernier signe de vie du job en cours (réclamation, avancement)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.pk}"
+
+    @property
+    def progress(self):
+        """Avancement en pourcentage"""
+        if self.status == self.Status.DONE:
+            return 100
+        return int(100 * self.processed / self.total) if self.total else 0
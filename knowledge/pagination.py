@@ -0,0 +1,201 @@
+from base64 import b64decode, b64encode
+from urllib.parse import parse_qs, urlencode
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, _reverse_ordering
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+# Au-delà de cette estimation, une liste non filtrée de l'admin affiche le nombre estimé
+ADMIN_EXACT_COUNT_LIMIT = getattr(settings, 'ADMIN_EXACT_COUNT_LIMIT', 100_000)
+
+# Les listes filtrées comptent au plus ce nombre de lignes
+ADMIN_COUNT_CAP = getattr(settings, 'ADMIN_COUNT_CAP', 10_000)
+
+# Nombre de lignes d'une table sans la parcourir
+ESTIMATE_QUERIES = {
+    # Plus grand rowid: lecture d'une feuille du B-tree, juste tant qu'il y a peu de suppressions
+    'sqlite': "SELECT MAX(_ROWID_) FROM {table}",
+    # Statistiques de l'optimiseur (DBMS_STATS, autovacuum)
+    'oracle': "SELECT num_rows FROM user_tables WHERE table_name = UPPER(%s)",
+    'postgresql': "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+}
+
+
+def keyset_filter(ordering, position):
+    """Lignes situées après ``position`` (une valeur par champ de ``ordering``) dans cet ordre.
+
+    (a, b) > (x, y) s'écrit a >= x AND (a > x OR (a = x AND b > y)): la première
+    condition, sur le premier champ seul, permet à la base de partir de la position
+    dans l'index au lieu de le lire depuis le début.
+    """
+    after, equal = Q(), Q()
+    for name, value in zip(ordering, position):
+        field, lookup = name.lstrip('-'), 'lt' if name.startswith('-') else 'gt'
+        after |= equal & Q(**{f'{field}__{lookup}': value})
+        equal &= Q(**{field: value})
+    first = ordering[0]
+    return Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": position[0]}) & after
+
+
+class KnowledgeCursorPagination(CursorPagination):
+    """Pagination par curseur (keyset) sur l'ordre stable de chaque ViewSet.
+
+    Pas de COUNT(*) ni d'OFFSET croissant: le coût d'une page ne dépend pas de sa
+    position. Le total n'est calculé que sur demande (``?count=true``).
+
+    L'ordre est complété par ``id`` et le curseur contient la valeur de chaque champ
+    de tri de la dernière ligne lue: un tri sur un champ non unique (``?ordering=bounty``)
+    parcourt toutes les lignes, sans doublon ni offset.
+
+    ``truncated: true`` signale une recherche dont le moteur n'a classé qu'une
+    partie des résultats (SEARCH_MAX_RESULTS).
+    """
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+    # Utilisé seulement si la vue n'a pas d'OrderingFilter
+    ordering = 'id'
+    count_query_param = 'count'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not any(name.lstrip('-') in ('id', 'pk') for name in ordering):
+            ordering += ('id',)
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = None
+        self.truncated = getattr(request, 'search_truncated', False)
+        if request.query_params.get(self.count_query_param, '').lower() in ('1', 'true'):
+            self.count = queryset.count()
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self.cursor.position if self.cursor is not None else None
+
+        # Curseur « précédent »: lignes avant la position, lues dans l'ordre inverse
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(keyset_filter(ordering, position))
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_next_link(self):
+        if not (self.has_next and self.page):
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self.get_position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not (self.has_previous and self.page):
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self.get_position(self.page[0])))
+
+    def get_position(self, item):
+        """Valeurs des champs de tri d'une ligne (objet ou dict de ``values()``)"""
+        names = [name.lstrip('-') for name in self.ordering]
+        if isinstance(item, dict):
+            return [item[name] for name in names]
+        return [getattr(item, name) for name in names]
+
+    def encode_cursor(self, cursor):
+        tokens = {'p': json.dumps(cursor.position, cls=DjangoJSONEncoder)}
+        if cursor.reverse:
+            tokens['r'] = '1'
+        encoded = b64encode(urlencode(tokens).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            tokens = parse_qs(b64decode(encoded.encode('ascii')).decode('ascii'), keep_blank_values=True)
+            position = json.loads(tokens['p'][0])
+            reverse = bool(int(tokens.get('r', ['0'])[0]))
+        except (KeyError, TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        # Curseur d'un autre tri que celui de la requête
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(offset=0, reverse=reverse, position=position)
+
+    def get_paginated_response(self, data):
+        payload = {'next': self.get_next_link(), 'previous': self.get_previous_link()}
+        if self.count is not None:
+            payload['count'] = self.count
+        if self.truncated:
+            payload['truncated'] = True
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count'] = {'type': 'integer', 'example': 123}
+        response_schema['properties']['truncated'] = {'type': 'boolean', 'example': True}
+        return response_schema
+
+
+def estimated_count(queryset):
+    """Nombre estimé de lignes de la table de ``queryset``, ou None si la base n'en a pas"""
+    connection = connections[queryset.db]
+    sql = ESTIMATE_QUERIES.get(connection.vendor)
+    if sql is None:
+        return None
+    table = queryset.model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if '%s' in sql:
+                cursor.execute(sql, [table])
+            else:
+                cursor.execute(sql.format(table=connection.ops.quote_name(table)))
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator des listes de l'admin, au nombre de lignes borné.
+
+    Liste complète: nombre estimé par les statistiques de la base au-delà
+    de ADMIN_EXACT_COUNT_LIMIT lignes, exact en deçà. Liste filtrée (recherche,
+    filtres): COUNT(*) limité à ADMIN_COUNT_CAP lignes, les pages au-delà ne sont
+    pas proposées.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.has_filters():
+            estimate = estimated_count(queryset)
+            if estimate is not None and estimate >= ADMIN_EXACT_COUNT_LIMIT:
+                return estimate
+            return super().count
+        return queryset.order_by()[:ADMIN_COUNT_CAP].count()
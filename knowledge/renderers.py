@@ -0,0 +1,27 @@
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer encodé par orjson (requirements.txt), par la bibliothèque standard s'il manque.
+
+    La sortie est celle de JSONRenderer avec ses réglages par défaut (COMPACT_JSON,
+    UNICODE_JSON): JSON compact, UTF-8, U+2028 et U+2029 échappés.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Indentation demandée (API navigable, Accept: ...; indent=4): rendu standard
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(data, default=self.encoder_class().default)
+        except TypeError:
+            # Entiers de plus de 64 bits, clés non textuelles...
+            return super().render(data, accepted_media_type, renderer_context)
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
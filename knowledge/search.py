@@ -0,0 +1,372 @@
+"""Recherche plein texte pour ``?search=`` sur les ViewSets.
+
+Le moteur est choisi par le réglage ``SEARCH_BACKEND``:
+
+- ``'auto'`` (défaut): FTS5 sous SQLite, Oracle Text sous Oracle, sinon index Python;
+- ``'sqlite'``, ``'oracle'`` ou ``'python'``;
+- ou le chemin pointé d'une sous-classe de ``SearchBackend``.
+
+``search_queryset()`` restreint un queryset aux objets trouvés et l'annote avec
+``search_rank``. Sous SQLite, la table FTS5 est jointe à la requête: classement,
+tri et pagination se font dans la même requête SQL, sur tous les résultats. Les
+autres moteurs classent d'abord les clés primaires (au plus SEARCH_MAX_RESULTS,
+la réponse signale alors qu'elle est tronquée).
+
+Tous les moteurs trouvent les objets dont chaque terme (en préfixe) figure dans
+l'un des champs indexés, pas forcément le même pour tous les termes.
+
+Les tables FTS5 et les index Oracle Text sont créés par la migration
+``0007_search_indexes``. L'index est tenu à jour par les signaux de
+``knowledge.signals``; les insertions en masse (seed_onepiece, import_json)
+appellent ``rebuild_index()``.
+"""
+import math
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Case, FloatField, IntegerField, Value, When
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import Character, Crew, DevilFruit, Arc, Episode
+
+
+# Champs indexés par modèle, avec leur poids dans le classement. Chacun est une
+# colonne de la table FTS5 / un index Oracle Text: les modifier demande une
+# migration qui recrée ces index (voir 0007_search_indexes).
+SEARCH_FIELDS = {
+    Character: [('name', 4.0), ('epithet', 2.0), ('role', 1.0), ('description', 1.0)],
+    Crew: [('name', 4.0), ('ship_name', 2.0), ('base_location', 1.0)],
+    DevilFruit: [('name', 4.0), ('romanji', 2.0), ('ability', 1.0), ('description', 1.0)],
+    Arc: [('name', 4.0), ('saga', 2.0), ('description', 1.0)],
+    Episode: [('title', 1.0)],
+}
+
+# Nombre maximal de résultats classés par les moteurs qui classent hors de la base
+SEARCH_MAX_RESULTS = getattr(settings, 'SEARCH_MAX_RESULTS', 1000)
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def strip_accents(text):
+    """Retire les accents des lettres latines, comme ``remove_diacritics`` du tokenizer FTS5
+    unicode61; les autres écritures (kana, cyrillique...) sont gardées telles quelles"""
+    chars, latin = [], False
+    for char in unicodedata.normalize('NFKD', text):
+        if not unicodedata.combining(char):
+            latin = 'LATIN' in unicodedata.name(char, '')
+        elif latin:
+            continue
+        chars.append(char)
+    return unicodedata.normalize('NFC', ''.join(chars))
+
+
+def tokenize(text):
+    """Découpe en mots, en minuscules et sans accents"""
+    return TOKEN_RE.findall(strip_accents(str(text or '')).lower())
+
+
+class SearchBackend:
+    """Interface commune des moteurs de recherche"""
+
+    def search(self, model, terms, limit=SEARCH_MAX_RESULTS):
+        """Clés primaires des objets contenant tous les termes (en préfixe), par pertinence décroissante"""
+        raise NotImplementedError
+
+    def filter(self, queryset, terms):
+        """``queryset`` restreint aux objets trouvés et annoté avec ``search_rank`` (plus grand =
+        plus pertinent); renvoie aussi True si des résultats au-delà de SEARCH_MAX_RESULTS manquent"""
+        ranked_pks = self.search(queryset.model, terms, SEARCH_MAX_RESULTS + 1)
+        truncated = len(ranked_pks) > SEARCH_MAX_RESULTS
+        ranked_pks = ranked_pks[:SEARCH_MAX_RESULTS]
+        if not ranked_pks:
+            return queryset.none(), False
+        total = len(ranked_pks)
+        return queryset.filter(pk__in=ranked_pks).annotate(search_rank=Case(
+            *[When(pk=pk, then=Value(total - position)) for position, pk in enumerate(ranked_pks)],
+            output_field=IntegerField(),
+        )), truncated
+
+    def update(self, instance):
+        """Réindexe un objet après sa création ou modification"""
+
+    def remove(self, model, pk):
+        """Retire un objet supprimé de l'index"""
+
+    def rebuild(self, model=None):
+        """Reconstruit l'index d'un modèle (ou de tous) depuis la base"""
+
+
+class PythonSearchBackend(SearchBackend):
+    """Index inversé en mémoire (par processus), construit à la première recherche"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.indexes = {}
+
+    def build(self, model):
+        fields = SEARCH_FIELDS[model]
+        postings = defaultdict(dict)
+        documents = {}
+        names = [name for name, _ in fields]
+        for row in model.objects.values_list('pk', *names).iterator(chunk_size=2000):
+            documents[row[0]] = self._index_document(postings, row[0], zip(row[1:], (w for _, w in fields)))
+        return {'postings': postings, 'documents': documents, 'tokens': sorted(postings)}
+
+    @staticmethod
+    def _index_document(postings, pk, weighted_values):
+        tokens = set()
+        for value, weight in weighted_values:
+            for token in tokenize(value):
+                postings[token][pk] = postings[token].get(pk, 0.0) + weight
+                tokens.add(token)
+        return tokens
+
+    def get_index(self, model):
+        index = self.indexes.get(model)
+        if index is None:
+            with self.lock:
+                index = self.indexes.get(model)
+                if index is None:
+                    index = self.indexes[model] = self.build(model)
+        return index
+
+    def search(self, model, terms, limit=SEARCH_MAX_RESULTS):
+        index = self.get_index(model)
+        with self.lock:
+            postings, tokens = index['postings'], index['tokens']
+            total = max(len(index['documents']), 1)
+            scores = None
+            for term in terms:
+                term_scores = defaultdict(float)
+                # Tous les mots indexés commençant par le terme (liste triée + dichotomie)
+                i = bisect_left(tokens, term)
+                while i < len(tokens) and tokens[i].startswith(term):
+                    docs = postings.get(tokens[i])
+                    if docs:
+                        idf = math.log(1 + total / len(docs))
+                        for pk, weight in docs.items():
+                            term_scores[pk] += weight * idf
+                    i += 1
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {pk: score + term_scores[pk] for pk, score in scores.items() if pk in term_scores}
+                if not scores:
+                    return []
+        return sorted(scores, key=lambda pk: (-scores[pk], pk))[:limit]
+
+    def update(self, instance):
+        model = type(instance)
+        with self.lock:
+            index = self.indexes.get(model)
+            if index is None:
+                return
+            self._remove(index, instance.pk)
+            weighted = ((getattr(instance, name), weight) for name, weight in SEARCH_FIELDS[model])
+            new_tokens = self._index_document(index['postings'], instance.pk, weighted)
+            index['documents'][instance.pk] = new_tokens
+            # Les mots retirés peuvent rester dans la liste triée: ils n'ont plus de postings
+            tokens = index['tokens']
+            for token in new_tokens:
+                i = bisect_left(tokens, token)
+                if i == len(tokens) or tokens[i] != token:
+                    tokens.insert(i, token)
+
+    def remove(self, model, pk):
+        with self.lock:
+            index = self.indexes.get(model)
+            if index is not None:
+                self._remove(index, pk)
+
+    @staticmethod
+    def _remove(index, pk):
+        for token in index['documents'].pop(pk, ()):
+            docs = index['postings'].get(token)
+            if docs is not None:
+                docs.pop(pk, None)
+                if not docs:
+                    del index['postings'][token]
+
+    def rebuild(self, model=None):
+        with self.lock:
+            if model is None:
+                self.indexes.clear()
+            else:
+                self.indexes.pop(model, None)
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    """Tables virtuelles FTS5 (une par modèle, rowid = clé primaire), classement bm25"""
+
+    @staticmethod
+    def table(model):
+        return f'{model._meta.db_table}_fts'
+
+    def _populate(self, cursor, model):
+        table = self.table(model)
+        names = ', '.join(name for name, _ in SEARCH_FIELDS[model])
+        cursor.execute(
+            f'INSERT INTO {table} (rowid, {names}) SELECT {model._meta.pk.column}, {names} FROM {model._meta.db_table}'
+        )
+
+    @staticmethod
+    def match_expression(terms):
+        # Chaque terme en préfixe, implicitement combinés en ET
+        return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+    @staticmethod
+    def rank_sql(model, table):
+        weights = ', '.join(str(weight) for _, weight in SEARCH_FIELDS[model])
+        return f'bm25({table}, {weights})'
+
+    def search(self, model, terms, limit=SEARCH_MAX_RESULTS):
+        table = self.table(model)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {table} WHERE {table} MATCH %s ORDER BY {self.rank_sql(model, table)}, rowid LIMIT %s',
+                [self.match_expression(terms), limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def filter(self, queryset, terms):
+        # La base filtre, classe (bm25), trie et pagine tous les résultats: lignes trouvées
+        # par la table FTS5 (IN, évalué une fois), rang lu dans la même table pour chaque
+        # ligne retenue (sous-requête corrélée, accès par rowid)
+        model = queryset.model
+        quote = connection.ops.quote_name
+        table = quote(self.table(model))
+        match = self.match_expression(terms)
+        column = f'{quote(model._meta.db_table)}.{quote(model._meta.pk.column)}'
+        rank = RawSQL(
+            f'SELECT -{self.rank_sql(model, table)} FROM {table} WHERE {table} MATCH %s AND {table}.rowid = {column}',
+            (match,), output_field=FloatField(),
+        )
+        found = RawSQL(f'SELECT rowid FROM {table} WHERE {table} MATCH %s', (match,))
+        return queryset.filter(pk__in=found).annotate(search_rank=rank), False
+
+    def update(self, instance):
+        model = type(instance)
+        table = self.table(model)
+        names = [name for name, _ in SEARCH_FIELDS[model]]
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table} WHERE rowid = %s', [instance.pk])
+            cursor.execute(
+                f"INSERT INTO {table} (rowid, {', '.join(names)}) VALUES (%s{', %s' * len(names)})",
+                [instance.pk] + [getattr(instance, name) or '' for name in names]
+            )
+
+    def remove(self, model, pk):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table(model)} WHERE rowid = %s', [pk])
+
+    def rebuild(self, model=None):
+        for model in ([model] if model else SEARCH_FIELDS):
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {self.table(model)}')
+                self._populate(cursor, model)
+
+    @staticmethod
+    def is_available():
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+                return bool(cursor.fetchone()[0])
+        except DatabaseError:
+            return False
+
+
+class OracleTextBackend(SearchBackend):
+    """Index CTXSYS.CONTEXT par colonne, synchronisés par Oracle au commit (pas de mise à jour côté Django).
+
+    CONTAINS ne porte que sur une colonne: chaque terme est cherché dans toutes
+    les colonnes (OU), et les termes sont combinés en ET, comme avec FTS5.
+    """
+
+    @staticmethod
+    def index_name(model, column):
+        return f'{model._meta.db_table}_{column}_ctx'[:30].upper()
+
+    @staticmethod
+    def contains_term(term):
+        # Terme échappé entre accolades, en préfixe
+        return '{%s}%%' % term.replace('}', '')
+
+    def search(self, model, terms, limit=SEARCH_MAX_RESULTS):
+        fields = SEARCH_FIELDS[model]
+        conditions, scores, params = [], [], []
+        label = 0
+        for term in terms:
+            term_conditions = []
+            for name, weight in fields:
+                label += 1
+                column = model._meta.get_field(name).column
+                term_conditions.append(f'CONTAINS({column}, %s, {label}) > 0')
+                scores.append(f'SCORE({label}) * {weight}')
+                params.append(self.contains_term(term))
+            conditions.append(f"({' OR '.join(term_conditions)})")
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT {model._meta.pk.column} FROM {model._meta.db_table} '
+                f"WHERE {' AND '.join(conditions)} "
+                f"ORDER BY {' + '.join(scores)} DESC, {model._meta.pk.column} "
+                f'FETCH FIRST %s ROWS ONLY',
+                params + [limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+BACKENDS = {
+    'python': PythonSearchBackend,
+    'sqlite': SQLiteFTS5Backend,
+    'oracle': OracleTextBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Instance unique du moteur configuré"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                name = getattr(settings, 'SEARCH_BACKEND', 'auto')
+                if name == 'auto':
+                    if connection.vendor == 'sqlite' and SQLiteFTS5Backend.is_available():
+                        name = 'sqlite'
+                    elif connection.vendor == 'oracle':
+                        name = 'oracle'
+                    else:
+                        name = 'python'
+                backend_class = BACKENDS[name] if name in BACKENDS else import_string(name)
+                _backend = backend_class()
+    return _backend
+
+
+def search(model, query, limit=SEARCH_MAX_RESULTS):
+    terms = tokenize(query)
+    if not terms:
+        return []
+    return get_backend().search(model, terms, limit)
+
+
+def search_queryset(queryset, query):
+    """(queryset des objets trouvés annoté avec ``search_rank``, résultats tronqués ou non)
+
+    Une recherche sans aucun mot (ex: ponctuation seule) ne trouve rien.
+    """
+    terms = tokenize(query)
+    if not terms:
+        return queryset.none(), False
+    return get_backend().filter(queryset, terms)
+
+
+def rebuild_index(model=None):
+    get_backend().rebuild(model)
@@ -1,15 +1,46 @@
 from rest_framework import serializers
-from .models import Character, Crew, DevilFruit, Arc, Episode, FruitHolder
+from .models import Character, Crew, DevilFruit, Arc, Episode
 
 
-class EpisodeListSerializer(serializers.ModelSerializer):
+def parse_field_list(value):
+    """'id, name' -> {'id', 'name'}"""
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+class SparseFieldsetMixin:
+    """Champs de premier niveau choisis par ``?fields=id,name`` et/ou retirés par ``?omit=description``.
+
+    Seul le serializer racine de la réponse est filtré: les serializers imbriqués
+    gardent tous leurs champs. Les noms inconnus sont ignorés.
+    """
+
+    def is_root(self):
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or not self.is_root():
+            return fields
+        only = parse_field_list(request.query_params.get('fields', ''))
+        omit = parse_field_list(request.query_params.get('omit', ''))
+        for name in list(fields):
+            if (only and name not in only) or name in omit:
+                fields.pop(name)
+        return fields
+
+
+class EpisodeListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer pour liste d'épisodes"""
     class Meta:
         model = Episode
         fields = ['id', 'number', 'title', 'air_date']
 
 
-class EpisodeDetailSerializer(serializers.ModelSerializer):
+class EpisodeDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer pour détail d'épisode"""
     arc = serializers.StringRelatedField()
     
@@ -18,14 +49,14 @@ class EpisodeDetailSerializer(serializers.ModelSerializer):
         fields = ['id', 'number', 'title', 'air_date', 'arc']
 
 
-class ArcListSerializer(serializers.ModelSerializer):
+class ArcListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer pour liste d'arcs"""
     class Meta:
         model = Arc
         fields = ['id', 'name', 'saga', 'start_episode_number', 'end_episode_number']
 
 
-class ArcDetailSerializer(serializers.ModelSerializer):
+class ArcDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer pour détail d'arc avec épisodes"""
     episodes = EpisodeListSerializer(many=True, read_only=True)
     
@@ -34,14 +65,14 @@ class ArcDetailSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'saga', 'start_episode_number', 'end_episode_number', 'description', 'episodes']
 
 
-class CrewListSerializer(serializers.ModelSerializer):
+class CrewListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer pour liste d'équipages"""
     class Meta:
         model = Crew
         fields = ['id', 'name', 'ship_name']
 
 
-class CrewDetailSerializer(serializers.ModelSerializer):
+class CrewDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer pour détail d'équipage avec membres"""
     members = serializers.SerializerMethodField()
     captain = serializers.SerializerMethodField()
@@ -60,14 +91,41 @@ class CrewDetailSerializer(serializers.ModelSerializer):
         return [{'id': m.id, 'name': m.name, 'bounty': m.bounty} for m in members]
 
 
-class DevilFruitListSerializer(serializers.ModelSerializer):
+class CrewSummarySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """Serializer compact d'équipage, imbriqué dans le détail d'un personnage.
+
+    Les membres ne sont inclus qu'avec ``?expand=crews.members``.
+    """
+    captain = serializers.SerializerMethodField()
+    members = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Crew
+        fields = ['id', 'name', 'ship_name', 'captain', 'members']
+    
+    def get_fields(self):
+        fields = super().get_fields()
+        if 'crews.members' not in self.context.get('expand', ()):
+            fields.pop('members')
+        return fields
+    
+    def get_captain(self, obj):
+        if obj.captain:
+            return {'id': obj.captain.id, 'name': obj.captain.name}
+        return None
+    
+    def get_members(self, obj):
+        return [{'id': m.id, 'name': m.name, 'bounty': m.bounty} for m in obj.members.all()]
+
+
+class DevilFruitListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer pour liste de fruits"""
     class Meta:
         model = DevilFruit
         fields = ['id', 'name', 'romanji', 'fruit_type', 'rarity']
 
 
-class DevilFruitDetailSerializer(serializers.ModelSerializer):
+class DevilFruitDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer pour détail de fruit avec détenteurs"""
     holders = serializers.SerializerMethodField()
     first_appearance_arc = serializers.SerializerMethodField()
@@ -93,7 +151,7 @@ class DevilFruitDetailSerializer(serializers.ModelSerializer):
         } for h in holders]
 
 
-class CharacterListSerializer(serializers.ModelSerializer):
+class CharacterListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer pour liste de personnages"""
     crews = CrewListSerializer(many=True, read_only=True)
     current_fruits = serializers.SerializerMethodField()
@@ -103,13 +161,16 @@ class CharacterListSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'epithet', 'role', 'bounty', 'origin', 'status', 'crews', 'current_fruits']
     
     def get_current_fruits(self, obj):
-        current_holders = FruitHolder.objects.filter(character=obj, is_current=True)
+        # Rempli par le Prefetch 'current_holders' de CharacterViewSet
+        current_holders = getattr(obj, 'current_holders', None)
+        if current_holders is None:
+            current_holders = obj.fruit_history.filter(is_current=True).select_related('devil_fruit')
         return [{'id': h.devil_fruit.id, 'name': h.devil_fruit.name} for h in current_holders]
 
 
-class CharacterDetailSerializer(serializers.ModelSerializer):
+class CharacterDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer pour détail de personnage"""
-    crews = CrewDetailSerializer(many=True, read_only=True)
+    crews = CrewSummarySerializer(many=True, read_only=True)
     fruits_history = serializers.SerializerMethodField()
     first_appearance_episode = serializers.SerializerMethodField()
     
@@ -0,0 +1,146 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.utils import timezone
+
+from .autocomplete import AUTOCOMPLETE_MODELS, index as autocomplete_index
+from .caching import CACHED_MODELS, bump_generation
+from .graph import MODEL_KINDS as GRAPH_MODELS, index as graph_index
+from .models import Character, Crew, DevilFruit, Arc, Episode, FruitHolder, DeletedRecord, natural_key
+from .search import SEARCH_FIELDS, get_backend as get_search_backend, rebuild_index
+from .stats import invalidate_stats
+
+
+STATS_MODELS = (Character, Crew, DevilFruit, FruitHolder, Arc, Episode)
+TRACKED_MODELS = (Arc, Episode, Crew, Character, DevilFruit, FruitHolder)
+
+
+def invalidate_stats_on_change(sender, **kwargs):
+    """Invalide le résumé statistique quand un modèle agrégé change, après le commit: un calcul
+    pendant la transaction remettrait sinon les anciens chiffres en cache"""
+    transaction.on_commit(invalidate_stats)
+
+
+def invalidate_stats_on_crew_members_change(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(invalidate_stats)
+
+
+def record_deletion(sender, instance, **kwargs):
+    """Conserve une trace de la suppression pour les exports incrémentaux"""
+    DeletedRecord.objects.create(
+        model_label=sender._meta.label_lower, object_pk=instance.pk, natural_key=natural_key(instance),
+    )
+
+
+def touch_characters_on_crews_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Met à jour updated_at des personnages dont les équipages changent"""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        character_ids = [instance.pk]
+    elif action == 'pre_clear':
+        character_ids = list(instance.members.values_list('pk', flat=True))
+    else:
+        character_ids = pk_set
+    Character.objects.filter(pk__in=character_ids).update(updated_at=timezone.now())
+
+
+def bump_generation_on_change(sender, **kwargs):
+    """Invalide les réponses de l'API en cache qui affichent ce modèle, après le commit: une
+    lecture pendant la transaction mettrait sinon les anciennes lignes en cache sous la nouvelle génération"""
+    transaction.on_commit(lambda: bump_generation(sender))
+
+
+def bump_generation_on_crew_members_change(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(lambda: bump_generation(Character, Crew))
+
+
+def refresh_graph_node(sender, instance, **kwargs):
+    """Recalcule les arêtes du nœud après le commit (rien en cas de rollback)"""
+    transaction.on_commit(lambda: graph_index.refresh(instance))
+
+
+def remove_graph_node(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: graph_index.remove(sender, pk))
+
+
+def refresh_graph_holder(sender, instance, **kwargs):
+    character_id, devil_fruit_id = instance.character_id, instance.devil_fruit_id
+
+    def refresh():
+        graph_index.refresh_pk(Character, character_id)
+        graph_index.refresh_pk(DevilFruit, devil_fruit_id)
+    transaction.on_commit(refresh)
+
+
+def refresh_graph_crew_members(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(lambda: graph_index.refresh(instance))
+
+
+def update_search_index(sender, instance, **kwargs):
+    """Réindexe l'objet pour la recherche plein texte"""
+    get_search_backend().update(instance)
+
+
+def remove_from_search_index(sender, instance, **kwargs):
+    get_search_backend().remove(sender, instance.pk)
+
+
+def update_autocomplete_index(sender, instance, **kwargs):
+    """Réindexe l'objet après le commit: les autres processus reconstruisent alors un index à jour"""
+    transaction.on_commit(lambda: autocomplete_index.update(instance))
+
+
+def remove_from_autocomplete_index(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: autocomplete_index.remove(sender, pk))
+
+
+def invalidate_after_bulk_write():
+    """Invalide statistiques, index et caches après une écriture en masse: bulk_create et
+    bulk_update n'envoient pas les signaux ci-dessus"""
+    invalidate_stats()
+    rebuild_index()
+    autocomplete_index.reset()
+    bump_generation()
+    graph_index.reset()
+
+
+for model in STATS_MODELS:
+    post_save.connect(invalidate_stats_on_change, sender=model, dispatch_uid=f'stats_save_{model.__name__}')
+    post_delete.connect(invalidate_stats_on_change, sender=model, dispatch_uid=f'stats_delete_{model.__name__}')
+m2m_changed.connect(
+    invalidate_stats_on_crew_members_change, sender=Character.crews.through, dispatch_uid='stats_crew_members'
+)
+
+for model in TRACKED_MODELS:
+    post_delete.connect(record_deletion, sender=model, dispatch_uid=f'tombstone_{model.__name__}')
+m2m_changed.connect(
+    touch_characters_on_crews_change, sender=Character.crews.through, dispatch_uid='touch_crew_members'
+)
+
+for model in SEARCH_FIELDS:
+    post_save.connect(update_search_index, sender=model, dispatch_uid=f'search_save_{model.__name__}')
+    post_delete.connect(remove_from_search_index, sender=model, dispatch_uid=f'search_delete_{model.__name__}')
+
+for model in AUTOCOMPLETE_MODELS:
+    post_save.connect(update_autocomplete_index, sender=model, dispatch_uid=f'autocomplete_save_{model.__name__}')
+    post_delete.connect(remove_from_autocomplete_index, sender=model,
+                        dispatch_uid=f'autocomplete_delete_{model.__name__}')
+
+for model in CACHED_MODELS:
+    post_save.connect(bump_generation_on_change, sender=model, dispatch_uid=f'generation_save_{model.__name__}')
+    post_delete.connect(bump_generation_on_change, sender=model, dispatch_uid=f'generation_delete_{model.__name__}')
+m2m_changed.connect(
+    bump_generation_on_crew_members_change, sender=Character.crews.through, dispatch_uid='generation_crew_members'
+)
+
+for model in GRAPH_MODELS:
+    post_save.connect(refresh_graph_node, sender=model, dispatch_uid=f'graph_save_{model.__name__}')
+    post_delete.connect(remove_graph_node, sender=model, dispatch_uid=f'graph_delete_{model.__name__}')
+post_save.connect(refresh_graph_holder, sender=FruitHolder, dispatch_uid='graph_save_FruitHolder')
+post_delete.connect(refresh_graph_holder, sender=FruitHolder, dispatch_uid='graph_delete_FruitHolder')
+m2m_changed.connect(refresh_graph_crew_members, sender=Character.crews.through, dispatch_uid='graph_crew_members')
@@ -0,0 +1,107 @@
+"""Statistiques agrégées de la base, calculées en SQL et conservées en cache.
+
+Le résumé est invalidé par les signaux de ``knowledge.signals`` à chaque
+modification et recalculé à la demande suivante.
+"""
+from django.core.cache import cache
+from django.db.models import Avg, Count, Max, Min, Q, Sum
+
+from .models import Character, Crew, DevilFruit, Arc, Episode, FruitHolder
+
+
+STATS_CACHE_KEY = 'knowledge:stats'
+# Filet de sécurité si un autre processus a modifié les données (cache locmem)
+STATS_CACHE_TIMEOUT = 60 * 5
+
+# Tranches de primes (bornes en Berries, borne haute exclue)
+BOUNTY_BUCKETS = [
+    ('Aucune', 0, 1),
+    ('< 100M', 1, 100_000_000),
+    ('100M - 500M', 100_000_000, 500_000_000),
+    ('500M - 1B', 500_000_000, 1_000_000_000),
+    ('1B - 3B', 1_000_000_000, 3_000_000_000),
+    ('>= 3B', 3_000_000_000, None),
+]
+
+
+def _breakdown(model, field, choices):
+    labels = dict(choices)
+    return [
+        {field: row[field], 'label': str(labels.get(row[field], row[field])), 'count': row['count']}
+        for row in model.objects.values(field).annotate(count=Count('id')).order_by(field)
+    ]
+
+
+def _bounty_distribution():
+    aggregates = {}
+    for index, (label, low, high) in enumerate(BOUNTY_BUCKETS):
+        condition = Q(bounty__gte=low)
+        if high is not None:
+            condition &= Q(bounty__lt=high)
+        aggregates[f'bucket_{index}'] = Count('id', filter=condition)
+    result = Character.objects.aggregate(
+        total=Sum('bounty'), average=Avg('bounty'), minimum=Min('bounty'), maximum=Max('bounty'),
+        **aggregates
+    )
+    return {
+        'total': result['total'] or 0,
+        'average': round(result['average'] or 0),
+        'min': result['minimum'] or 0,
+        'max': result['maximum'] or 0,
+        'buckets': [
+            {'label': label, 'min': low, 'max': high, 'count': result[f'bucket_{index}']}
+            for index, (label, low, high) in enumerate(BOUNTY_BUCKETS)
+        ],
+    }
+
+
+def compute_stats():
+    """Calcule toutes les statistiques (une requête agrégée par indicateur)"""
+    top_crews = (
+        Crew.objects.annotate(member_count=Count('members'))
+        .order_by('-member_count', 'name')
+        .values('id', 'name', 'member_count')[:10]
+    )
+    fruits_per_arc = dict(
+        Arc.objects.annotate(count=Count('fruits')).values_list('id', 'count')
+    )
+    arcs = Arc.objects.annotate(episode_count=Count('episodes')).values(
+        'id', 'name', 'start_episode_number', 'episode_count'
+    )
+    return {
+        'totals': {
+            'characters': Character.objects.count(),
+            'crews': Crew.objects.count(),
+            'devil_fruits': DevilFruit.objects.count(),
+            'fruit_holders': FruitHolder.objects.count(),
+            'arcs': Arc.objects.count(),
+            'episodes': Episode.objects.count(),
+        },
+        'fruit_types': _breakdown(DevilFruit, 'fruit_type', DevilFruit.FruitType.choices),
+        'top_crews': list(top_crews),
+        'bounty_distribution': _bounty_distribution(),
+        'character_roles': _breakdown(Character, 'role', Character.Role.choices),
+        'character_statuses': _breakdown(Character, 'status', Character.Status.choices),
+        'arcs': [
+            {
+                'id': arc['id'],
+                'name': arc['name'],
+                'episode_count': arc['episode_count'],
+                'fruit_count': fruits_per_arc.get(arc['id'], 0),
+            }
+            for arc in arcs
+        ],
+    }
+
+
+def get_stats():
+    """Retourne les statistiques depuis le cache, en les recalculant si besoin"""
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is None:
+        stats = compute_stats()
+        cache.set(STATS_CACHE_KEY, stats, STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def invalidate_stats():
+    cache.delete(STATS_CACHE_KEY)
@@ -0,0 +1,1450 @@
+from io import BytesIO, StringIO
+from unittest import mock
+from datetime import date, timedelta
+import csv
+import gzip
+import json
+import os
+import re
+import tempfile
+import unittest
+import zipfile
+
+from django.contrib.admin.sites import site
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+
+from . import autocomplete, caching, exports, graph, holders, jobs, pagination, search, stats
+from .management.commands.export_json import EXPORT_SINCE_OVERLAP
+from .models import Arc, Character, Crew, DevilFruit, Episode, ExportJob, FruitHolder
+
+
+# Le cache des réponses servirait les requêtes suivantes sans lire la base
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+def create_dataset(characters=12):
+    """Petit jeu de données relié: arcs, épisodes, équipages, personnages, fruits et détenteurs"""
+    arcs = [
+        Arc.objects.create(name=f'Arc {i}', start_episode_number=i * 10 + 1, end_episode_number=i * 10 + 10)
+        for i in range(3)
+    ]
+    episodes = [
+        Episode.objects.create(number=i + 1, title=f'Épisode {i + 1}', arc=arcs[i % len(arcs)])
+        for i in range(6)
+    ]
+    crews = [Crew.objects.create(name=f'Équipage {i}', ship_name=f'Navire {i}') for i in range(3)]
+    people = []
+    for i in range(characters):
+        character = Character.objects.create(
+            name=f'Personnage {i:03d}', role=Character.Role.PIRATE if i % 2 else Character.Role.MARINE,
+            bounty=(i % 4) * 1000, first_appearance_episode=episodes[i % len(episodes)],
+        )
+        character.crews.set([crews[i % len(crews)], crews[(i + 1) % len(crews)]])
+        people.append(character)
+    for i, crew in enumerate(crews):
+        crew.captain = people[i]
+        crew.save()
+    fruits = [
+        DevilFruit.objects.create(name=f'Fruit {i}', ability='Pouvoir', rarity=i % 5 + 1, first_appearance_arc=arcs[0])
+        for i in range(characters // 2)
+    ]
+    for i, fruit in enumerate(fruits):
+        FruitHolder.objects.create(devil_fruit=fruit, character=people[i + 1], is_current=False)
+        FruitHolder.objects.create(devil_fruit=fruit, character=people[i], is_current=True)
+    return people
+
+
+@override_settings(CACHES=NO_CACHE)
+class QueryCountTests(TestCase):
+    """Nombre de requêtes par réponse de l'API, indépendant du nombre de lignes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_dataset()
+
+    def assertQueries(self, count, url):
+        with self.assertNumQueries(count):
+            response = self.client.get(url, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200, url)
+
+    def test_lists(self):
+        # page, puis une requête par relation imbriquée (équipages, fruits actuels)
+        self.assertQueries(3, '/api/characters/?page_size=50')
+        self.assertQueries(1, '/api/crews/?page_size=50')
+        self.assertQueries(1, '/api/fruits/?page_size=50')
+        self.assertQueries(1, '/api/arcs/?page_size=50')
+        self.assertQueries(1, '/api/episodes/?page_size=50')
+
+    def test_fast_lists(self):
+        with self.settings(API_FAST_LISTS=True):
+            self.assertQueries(3, '/api/characters/?page_size=50')
+            self.assertQueries(1, '/api/episodes/?page_size=50')
+
+    def test_details(self):
+        character = Character.objects.get(name='Personnage 001')
+        self.assertQueries(4, f'/api/characters/{character.pk}/')
+        self.assertQueries(2, f'/api/crews/{Crew.objects.first().pk}/')
+        self.assertQueries(3, f'/api/fruits/{DevilFruit.objects.first().pk}/')
+        self.assertQueries(2, f'/api/arcs/{Arc.objects.first().pk}/')
+        self.assertQueries(1, f'/api/episodes/{Episode.objects.first().pk}/')
+
+    def test_expand(self):
+        character = Character.objects.get(name='Personnage 001')
+        self.assertQueries(5, f'/api/characters/{character.pk}/?expand=crews.members')
+
+    def test_fields(self):
+        character = Character.objects.get(name='Personnage 001')
+        # Sans les relations, pas de requête pour les charger
+        self.assertQueries(1, '/api/characters/?page_size=50&fields=id,name,bounty')
+        self.assertQueries(2, '/api/characters/?page_size=50&fields=id,name,crews')
+        self.assertQueries(1, f'/api/characters/{character.pk}/?fields=id,name')
+        self.assertQueries(3, f'/api/characters/{character.pk}/?omit=crews,first_appearance_episode')
+
+    def test_batch(self):
+        ids = ','.join(str(pk) for pk in Character.objects.values_list('pk', flat=True)[:5])
+        self.assertQueries(4, f'/api/characters/batch/?ids={ids}')
+
+
+@override_settings(CACHES=NO_CACHE)
+class FastListTests(TestCase):
+    """API_FAST_LISTS: listes lues par values(), JSON identique à celui des serializers"""
+
+    URLS = [
+        '/api/characters/?page_size=5',
+        '/api/characters/?fields=id,name,crews&ordering=-bounty',
+        '/api/characters/?omit=crews,epithet&role=PIRATE',
+        '/api/characters/?fields=id,current_fruits&search=Personnage',
+        '/api/crews/',
+        '/api/crews/?fields=name,captain&ordering=-name',
+        '/api/fruits/?page_size=2&ordering=-rarity',
+        '/api/arcs/',
+        '/api/episodes/?page_size=1',
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        people = create_dataset(characters=12)
+        # Deux fruits actuels pour un même personnage: ordre des objets imbriqués
+        FruitHolder.objects.create(
+            devil_fruit=DevilFruit.objects.create(name='Fruit supplémentaire'), character=people[0], is_current=True,
+        )
+
+    def pages(self, url):
+        contents = []
+        while url and len(contents) < 4:
+            response = self.client.get(url, HTTP_ACCEPT='application/json')
+            self.assertEqual(response.status_code, 200, url)
+            contents.append(response.content)
+            url = response.json()['next']
+        return contents
+
+    def test_same_json_as_serializers(self):
+        for url in self.URLS:
+            with self.subTest(url=url):
+                with override_settings(API_FAST_LISTS=False):
+                    expected = self.pages(url)
+                with override_settings(API_FAST_LISTS=True):
+                    self.assertEqual(self.pages(url), expected)
+
+    @override_settings(API_FAST_LISTS=True)
+    def test_browsable_api_uses_serializers(self):
+        response = self.client.get('/api/characters/', HTTP_ACCEPT='text/html')
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(CACHES=NO_CACHE)
+class AsyncViewTests(TestCase):
+    """/api/async/: mêmes lignes et mêmes détails que les vues DRF"""
+
+    RESOURCES = ['characters', 'crews', 'fruits', 'arcs', 'episodes']
+
+    @classmethod
+    def setUpTestData(cls):
+        create_dataset(characters=8)
+
+    def get(self, url):
+        response = self.client.get(url, HTTP_ACCEPT='application/json')
+        return response.status_code, response.json()
+
+    def walk(self, url):
+        rows = []
+        while url:
+            status, data = self.get(url)
+            self.assertEqual(status, 200, url)
+            rows.extend(data['results'])
+            url = data['next']
+        return rows
+
+    def test_lists(self):
+        for resource in self.RESOURCES:
+            with self.subTest(resource):
+                expected = sorted(self.walk(f'/api/{resource}/?page_size=100'), key=lambda row: row['id'])
+                self.assertEqual(self.walk(f'/api/async/{resource}/?page_size=3'), expected)
+
+    def test_details(self):
+        for resource, model in [('characters', Character), ('crews', Crew), ('fruits', DevilFruit),
+                                ('arcs', Arc), ('episodes', Episode)]:
+            for pk in model.objects.values_list('pk', flat=True)[:3]:
+                with self.subTest(resource, pk=pk):
+                    self.assertEqual(self.get(f'/api/async/{resource}/{pk}/'), self.get(f'/api/{resource}/{pk}/'))
+
+    def test_errors(self):
+        self.assertEqual(self.get('/api/async/characters/9999/'), self.get('/api/characters/9999/'))
+        status, data = self.get('/api/async/characters/?page_size=abc')
+        self.assertEqual(status, 400)
+        self.assertIn('detail', data)
+
+
+class CursorPaginationTests(TestCase):
+    """Parcours complet des listes par curseur, y compris sur des tris non uniques"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Primes et raretés répétées: chaque valeur de tri couvre plusieurs pages
+        create_dataset(characters=30)
+
+    def walk(self, url, link='next'):
+        """Ids de toutes les pages, en suivant les liens ``link`` jusqu'au dernier"""
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url, HTTP_ACCEPT='application/json')
+            self.assertEqual(response.status_code, 200, url)
+            data = response.json()
+            page = [row['id'] for row in data['results']]
+            ids.extend(page if link == 'next' else reversed(page))
+            url = data[link]
+            pages += 1
+            self.assertLess(pages, 100, 'la pagination ne se termine pas')
+        return ids, response.json()
+
+    def test_every_ordering_walks_all_rows(self):
+        from .urls import router
+
+        for prefix, viewset, _ in router.registry:
+            model = viewset.queryset.model
+            for field in viewset.ordering_fields:
+                for ordering in (field, f'-{field}'):
+                    expected = list(model.objects.order_by(ordering, 'id').values_list('id', flat=True))
+                    for fast in (False, True):
+                        with self.subTest(prefix=prefix, ordering=ordering, fast=fast), \
+                                self.settings(API_FAST_LISTS=fast):
+                            ids, last = self.walk(f'/api/{prefix}/?ordering={ordering}&page_size=4')
+                            self.assertEqual(ids, expected)
+                            # Retour au début par les liens « previous » depuis la dernière page
+                            back, _ = self.walk(last['previous'], link='previous') if last['previous'] else ([], None)
+                            self.assertEqual(list(reversed(back)), expected[:len(back)])
+                            self.assertEqual(len(back) + len(last['results']), len(expected))
+
+    def test_default_ordering_with_ties(self):
+        Arc.objects.create(name='Arc ex aequo', start_episode_number=1, end_episode_number=5)
+        expected = list(Arc.objects.order_by('start_episode_number', 'id').values_list('id', flat=True))
+        ids, _ = self.walk('/api/arcs/?page_size=1')
+        self.assertEqual(ids, expected)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/characters/?cursor=invalide', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(CACHES=NO_CACHE)
+class SearchPaginationTests(TestCase):
+    """``?search=`` parcourt tous les résultats, ou signale qu'ils sont tronqués"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_dataset(characters=30)
+
+    def walk(self, url):
+        ids, truncated = [], False
+        while url:
+            data = self.client.get(url, HTTP_ACCEPT='application/json').json()
+            ids.extend(row['id'] for row in data['results'])
+            truncated = truncated or data.get('truncated', False)
+            url = data['next']
+        return ids, truncated
+
+    def test_sqlite_pages_every_match(self):
+        if not isinstance(search.get_backend(), search.SQLiteFTS5Backend):
+            self.skipTest('FTS5 indisponible')
+        expected = set(Character.objects.values_list('id', flat=True))
+        for fast in (False, True):
+            with self.subTest(fast=fast), self.settings(API_FAST_LISTS=fast), \
+                    mock.patch.object(search, 'SEARCH_MAX_RESULTS', 10):
+                ids, truncated = self.walk('/api/characters/?search=personnage&page_size=4')
+                self.assertEqual(len(ids), len(expected))
+                self.assertEqual(set(ids), expected)
+                self.assertFalse(truncated)
+
+    def test_sqlite_rank(self):
+        backend = search.get_backend()
+        if not isinstance(backend, search.SQLiteFTS5Backend):
+            self.skipTest('FTS5 indisponible')
+        # Terme rare, répété dans la description du mieux classé; Personnage 004 (sans prime) est filtré
+        for name, description in [('Personnage 002', 'Navigateur'), ('Personnage 017', 'Navigateur, navigateur'),
+                                  ('Personnage 004', 'Navigateur, navigateur, navigateur')]:
+            character = Character.objects.get(name=name)
+            character.description = description
+            character.save()
+        queryset, truncated = backend.filter(Character.objects.filter(bounty__gt=0), ['navigateur'])
+        ranked = list(queryset.order_by('-search_rank').values_list('name', 'search_rank'))
+        self.assertFalse(truncated)
+        self.assertEqual([name for name, _ in ranked], ['Personnage 017', 'Personnage 002'])
+        self.assertGreater(ranked[0][1], ranked[1][1])
+        self.assertGreater(ranked[1][1], 0)
+        self.assertEqual(list(backend.filter(Character.objects.all(), ['introuvable'])[0]), [])
+
+    def test_fallback_reports_truncation(self):
+        with mock.patch.object(search, '_backend', search.PythonSearchBackend()), \
+                mock.patch.object(search, 'SEARCH_MAX_RESULTS', 10):
+            ids, truncated = self.walk('/api/characters/?search=personnage&page_size=4')
+            self.assertEqual(len(set(ids)), 10)
+            self.assertTrue(truncated)
+            ids, truncated = self.walk('/api/characters/?search=personnage+001&page_size=4')
+            self.assertEqual(ids, [Character.objects.get(name='Personnage 001').pk])
+            self.assertFalse(truncated)
+
+    def test_non_latin_and_empty_terms(self):
+        gomu = Character.objects.create(name='Gomu ゴムゴム', epithet='Noël')
+        sasha = Character.objects.create(name='Саша Йорк')
+        for backend in (search.get_backend(), search.PythonSearchBackend()):
+            with self.subTest(backend=type(backend).__name__), mock.patch.object(search, '_backend', backend):
+                self.assertEqual(self.walk('/api/characters/?search=ゴム')[0], [gomu.pk])
+                self.assertEqual(self.walk('/api/characters/?search=noel')[0], [gomu.pk])
+                self.assertEqual(self.walk('/api/characters/?search=йорк')[0], [sasha.pk])
+                # Sans aucun mot: rien, pas toute la table
+                self.assertEqual(self.walk('/api/characters/?search=%22')[0], [])
+                self.assertEqual(self.walk('/api/characters/?search=-+!')[0], [])
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'knowledge-tests-holders',
+}})
+class TransferFruitTests(TestCase):
+    """Changements de détenteur actuel (knowledge.holders) et contrainte d'unicité"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.people = create_dataset(characters=8)
+        cls.fruits = list(DevilFruit.objects.order_by('pk'))
+
+    def current_holder(self, fruit):
+        return fruit.holders.get(is_current=True)
+
+    def test_direct_save_of_a_second_current_holder(self):
+        fruit = self.fruits[0]
+        holder = FruitHolder(devil_fruit=fruit, character=self.people[5], is_current=True)
+        with self.assertRaises(ValidationError):
+            holder.full_clean()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            holder.save()
+        self.assertEqual(self.current_holder(fruit).character, self.people[0])
+
+    def test_transfer_fruit(self):
+        fruit, day = self.fruits[0], date(2024, 5, 1)
+        previous = self.current_holder(fruit)
+        generations = caching.get_generations([FruitHolder])
+        with mock.patch.object(holders.graph_index, 'refresh_pk') as refresh_pk, \
+                self.captureOnCommitCallbacks(execute=True) as callbacks:
+            # Verrou, détenteurs actuels, fin de la détention précédente, création (et points de sauvegarde)
+            with self.assertNumQueries(6):
+                created = holders.transfer_fruit(fruit, self.people[5], day)
+            # Invalidation seulement après le commit
+            self.assertEqual(caching.get_generations([FruitHolder]), generations)
+        self.assertEqual(len(callbacks), 1)
+        self.assertNotEqual(caching.get_generations([FruitHolder]), generations)
+        refresh_pk.assert_any_call(Character, self.people[5].pk)
+        refresh_pk.assert_any_call(DevilFruit, fruit.pk)
+
+        previous.refresh_from_db()
+        self.assertFalse(previous.is_current)
+        self.assertEqual(previous.to_date, day)
+        current = self.current_holder(fruit)
+        self.assertEqual(current.pk, created.pk)
+        self.assertEqual((current.character, current.from_date), (self.people[5], day))
+        # Déjà détenteur: rien à faire
+        self.assertIsNone(holders.transfer_fruit(fruit.pk, self.people[5].pk, day))
+
+    def test_transfer_fruits_in_batches(self):
+        day = date(2024, 5, 1)
+        # Le premier fruit garde son détenteur, les autres changent
+        assignments = {self.fruits[0]: self.people[0]}
+        assignments.update({fruit: self.people[7] for fruit in self.fruits[1:]})
+        with mock.patch.object(holders, 'BATCH_SIZE', 2), mock.patch.object(holders, 'GRAPH_REFRESH_LIMIT', 1), \
+                mock.patch.object(holders.graph_index, 'reset') as reset, \
+                self.captureOnCommitCallbacks(execute=True):
+            created = holders.transfer_fruits(assignments, day)
+        reset.assert_called_once()
+        self.assertEqual(len(created), len(self.fruits) - 1)
+        self.assertEqual(self.current_holder(self.fruits[0]).character, self.people[0])
+        for fruit in self.fruits[1:]:
+            self.assertEqual(self.current_holder(fruit).character, self.people[7])
+            self.assertEqual(fruit.holders.filter(is_current=True).count(), 1)
+        self.assertEqual(FruitHolder.objects.filter(is_current=False, to_date=day).count(), len(self.fruits) - 1)
+
+
+class FruitHolderInlineTests(TestCase):
+    """Inlines de l'admin: un détenteur actuel en trop est une erreur du formulaire, pas une IntegrityError"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.people = create_dataset(characters=6)
+        cls.fruit = DevilFruit.objects.get(name='Fruit 0')
+        cls.request = RequestFactory().post('/')
+        cls.request.user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'secret')
+
+    def formset(self, parent, rows):
+        """Formset de l'inline de ``parent``: lignes existantes puis nouvelles (dicts de champs)"""
+        model_admin = site._registry[type(parent)]
+        inline = model_admin.get_inline_instances(self.request, parent)[0]
+        formset_class = inline.get_formset(self.request, parent)
+        prefix = formset_class.get_default_prefix()
+        existing = [row for row in rows if 'id' in row]
+        data = {
+            f'{prefix}-TOTAL_FORMS': str(len(rows)), f'{prefix}-INITIAL_FORMS': str(len(existing)),
+            f'{prefix}-MIN_NUM_FORMS': '0', f'{prefix}-MAX_NUM_FORMS': '1000',
+        }
+        for i, row in enumerate(rows):
+            for name, value in row.items():
+                if value is False:
+                    continue
+                data[f'{prefix}-{i}-{name}'] = 'on' if value is True else str(value)
+        return formset_class(data, instance=parent, prefix=prefix, queryset=FruitHolder.objects.filter(
+            **{formset_class.fk.name: parent}).order_by('pk'))
+
+    def holder_rows(self):
+        return [
+            {'id': holder.pk, 'character': holder.character_id, 'is_current': holder.is_current}
+            for holder in FruitHolder.objects.filter(devil_fruit=self.fruit).order_by('pk')
+        ]
+
+    def test_second_current_holder_is_rejected(self):
+        rows = self.holder_rows() + [{'character': self.people[3].pk, 'is_current': True}]
+        formset = self.formset(self.fruit, rows)
+        self.assertFalse(formset.is_valid())
+        self.assertTrue(formset.non_form_errors())
+
+    def test_replacing_the_current_holder(self):
+        rows = self.holder_rows()
+        for row in rows:
+            row['is_current'] = False
+        rows.append({'character': self.people[3].pk, 'is_current': True})
+        formset = self.formset(self.fruit, rows)
+        self.assertTrue(formset.is_valid(), formset.non_form_errors())
+        formset.save()
+        self.assertEqual(self.fruit.holders.get(is_current=True).character, self.people[3])
+
+    def test_swapping_existing_holders(self):
+        rows = self.holder_rows()
+        for row in rows:
+            row['is_current'] = not row['is_current']
+        formset = self.formset(self.fruit, rows)
+        self.assertTrue(formset.is_valid(), formset.non_form_errors())
+        formset.save()
+        self.assertEqual(self.fruit.holders.get(is_current=True).character, self.people[1])
+
+    def test_character_inline(self):
+        character = self.people[4]
+        rows = [{'devil_fruit': self.fruit.pk, 'is_current': True}]
+        self.assertFalse(self.formset(character, rows).is_valid())
+        rows = [{'devil_fruit': self.fruit.pk, 'is_current': False}]
+        self.assertTrue(self.formset(character, rows).is_valid())
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'knowledge-tests-autocomplete',
+}})
+class AutocompleteTests(TestCase):
+    """Index d'autocomplétion: candidats du terme le plus sélectif, bonus de phrase dans l'ordre tapé"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Plus d'équipages « Équipage … » que MAX_CANDIDATES, le recherché en dernier
+        Crew.objects.bulk_create([Crew(name=f'Équipage {i}') for i in range(autocomplete.MAX_CANDIDATES + 20)])
+        Crew.objects.create(name='Équipage Noël', ship_name='Traîneau')
+        Character.objects.create(name='Luffy D Monkey')
+        Character.objects.create(name='Monkey D. Luffy')
+
+    def setUp(self):
+        autocomplete.index.reset()
+        self.addCleanup(autocomplete.index.reset)
+
+    def labels(self, query, **kwargs):
+        return [result['label'] for result in autocomplete.index.search(query, **kwargs)]
+
+    def test_rare_term_beyond_common_term_candidates(self):
+        self.assertEqual(self.labels('Équipage Noël'), ['Équipage Noël'])
+        self.assertEqual(self.labels('noel equipage'), ['Équipage Noël'])
+        self.assertEqual(self.labels('equipag traineau'), ['Équipage Noël'])
+
+    def test_phrase_bonus_uses_typed_order(self):
+        self.assertEqual(self.labels('monkey d luffy')[0], 'Monkey D. Luffy')
+        self.assertEqual(self.labels('luffy d monkey')[0], 'Luffy D Monkey')
+
+    def test_preload(self):
+        with self.settings(AUTOCOMPLETE_PRELOAD=True):
+            autocomplete.preload()
+        self.assertTrue(autocomplete.index.built)
+
+    def test_update_after_commit(self):
+        autocomplete.index.build()
+        with self.captureOnCommitCallbacks(execute=True):
+            character = Character.objects.create(name='Nami Chatte Voleuse')
+        self.assertEqual(self.labels('chatte'), ['Nami Chatte Voleuse'])
+        with self.captureOnCommitCallbacks(execute=True):
+            character.name = 'Nami Navigatrice'
+            character.save()
+        self.assertEqual(self.labels('chatte'), [])
+        self.assertEqual(self.labels('navigatrice'), ['Nami Navigatrice'])
+        self.assertTrue(autocomplete.index.built)
+
+    def test_episodes_in_admin_widgets_only(self):
+        arc = Arc.objects.create(name='Water Seven')
+        episode = Episode.objects.create(number=312, title='Water Seven, la ville de l\'eau', arc=arc)
+        self.assertEqual(self.labels('water', kinds={'episode'}), [episode.title])
+        response = self.client.get('/api/search/', {'q': 'water'}, HTTP_ACCEPT='application/json')
+        self.assertEqual([result['type'] for result in response.json()['results']], ['arc'])
+
+        self.client.force_login(get_user_model().objects.create_superuser('admin', password='secret'))
+        response = self.client.get('/admin/autocomplete/', {
+            'term': 'watr seven', 'app_label': 'knowledge', 'model_name': 'character',
+            'field_name': 'first_appearance_episode',
+        })
+        self.assertEqual([result['id'] for result in response.json()['results']], [str(episode.pk)])
+
+    def test_writes_from_another_process(self):
+        here, elsewhere = autocomplete.AutocompleteIndex(), autocomplete.AutocompleteIndex()
+        here.build()
+        elsewhere.build()
+        # Renommage appliqué par l'autre processus: celui-ci reconstruit son index
+        character = Character.objects.get(name='Luffy D Monkey')
+        Character.objects.filter(pk=character.pk).update(name='Chapeau de paille')
+        character.refresh_from_db()
+        elsewhere.update(character)
+        self.assertTrue(elsewhere.built)
+        self.assertEqual([result['label'] for result in here.search('chapeau')], ['Chapeau de paille'])
+        self.assertTrue(here.built)
+        # Écritures des deux côtés intercalées: l'index qui a manqué la première est reconstruit
+        other = Crew.objects.create(name='Équipage Roux')
+        elsewhere.update(other)
+        here.remove(Character, character.pk)
+        self.assertFalse(here.built)
+        self.assertEqual([result['label'] for result in here.search('roux')], ['Équipage Roux'])
+
+
+class ImportUpsertTests(TestCase):
+    """import_json --upsert: lignes retrouvées par clé naturelle, jamais par la clé primaire source"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_dataset(characters=6)
+
+    def import_records(self, records):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False, encoding='utf-8') as f:
+            f.writelines(json.dumps(record) + '\n' for record in records)
+        self.addCleanup(os.remove, f.name)
+        call_command('import_json', f.name, upsert=True, stdout=StringIO())
+
+    def test_upsert_by_natural_key(self):
+        crew = Crew.objects.get(name='Équipage 0')
+        first, last = Character.objects.get(name='Personnage 000'), Character.objects.get(name='Personnage 005')
+        holder = FruitHolder.objects.filter(devil_fruit__name='Fruit 0').first()
+        fruit = DevilFruit.objects.get(name='Fruit 1')
+        holders = FruitHolder.objects.count()
+        stamp = '2026-01-01T00:00:00Z'
+        # Clés primaires source qui désignent d'autres lignes dans la base locale
+        records = [
+            {'model': 'knowledge.crew', 'pk': crew.pk, 'fields': {'name': 'Équipage source', 'updated_at': stamp}},
+            {'model': 'knowledge.character', 'pk': first.pk,
+             'fields': {'name': 'Personnage 005', 'bounty': 42, 'crews': [crew.pk], 'updated_at': stamp}},
+            {'model': 'knowledge.devilfruit', 'pk': 9999,
+             'fields': {'name': 'Fruit 1', 'ability': 'Importé', 'rarity': 3, 'updated_at': stamp}},
+            {'model': 'knowledge.fruitholder', 'pk': holder.pk,
+             'fields': {'devil_fruit': 9999, 'character': first.pk, 'from_date': '2020-01-01', 'is_current': False,
+                        'updated_at': stamp}},
+        ]
+        self.import_records(records)
+
+        self.assertEqual(Crew.objects.get(pk=crew.pk).name, 'Équipage 0')
+        created = Crew.objects.get(name='Équipage source')
+        self.assertNotEqual(created.pk, crew.pk)
+        last.refresh_from_db()
+        self.assertEqual(last.bounty, 42)
+        self.assertEqual(list(last.crews.all()), [created])
+        self.assertEqual(Character.objects.get(pk=first.pk).name, 'Personnage 000')
+        self.assertEqual(DevilFruit.objects.get(pk=fruit.pk).ability, 'Importé')
+        self.assertEqual(FruitHolder.objects.get(pk=holder.pk).devil_fruit.name, 'Fruit 0')
+        self.assertTrue(FruitHolder.objects.filter(devil_fruit=fruit, character=last, from_date='2020-01-01').exists())
+        self.assertEqual(FruitHolder.objects.count(), holders + 1)
+
+        # Réimport: les mêmes lignes sont mises à jour, rien n'est dupliqué
+        self.import_records(records)
+        self.assertEqual(Crew.objects.filter(name='Équipage source').count(), 1)
+        self.assertEqual(FruitHolder.objects.count(), holders + 1)
+
+    def test_reference_outside_file(self):
+        first, episode = Episode.objects.order_by('pk')[:2]
+        crew = Crew.objects.get(name='Équipage 1')
+        stamp = '2026-01-01T00:00:00Z'
+
+        def character(name, keys=None, **fields):
+            return {'model': 'knowledge.character', 'pk': 500,
+                    'fields': {'name': name, 'updated_at': stamp, 'crews': [], **fields},
+                    'natural_foreign_keys': keys or {}}
+
+        # Ligne de la base cible absente du fichier (export incrémental): retrouvée par sa clé
+        # naturelle, la clé primaire source désignant une autre ligne de la base cible
+        self.import_records([character(
+            'Delta', {'first_appearance_episode': [episode.number], 'crews': [[crew.name]]},
+            first_appearance_episode=first.pk, crews=[9998],
+        )])
+        delta = Character.objects.get(name='Delta')
+        self.assertEqual(delta.first_appearance_episode, episode)
+        self.assertEqual(list(delta.crews.all()), [crew])
+
+        # Sans clé naturelle, ou sans ligne correspondante: erreur plutôt qu'une clé étrangère d'une autre base
+        for fields, keys, label in [
+            ({'first_appearance_episode': first.pk}, {}, f'knowledge.episode #{first.pk}'),
+            ({'first_appearance_episode': 9999}, {'first_appearance_episode': [9999]}, 'knowledge.episode #9999'),
+            ({'crews': [9998]}, {'crews': [['Inconnu']]}, 'knowledge.crew #9998'),
+        ]:
+            with self.subTest(label), self.assertRaisesMessage(CommandError, label):
+                self.import_records([character('Orphelin', keys, **fields)])
+            self.assertFalse(Character.objects.filter(name='Orphelin').exists())
+        with self.assertRaisesMessage(CommandError, 'knowledge.character #9997'):
+            self.import_records([{'model': 'knowledge.crew', 'pk': 600,
+                                  'fields': {'name': 'Sans capitaine', 'captain': 9997, 'updated_at': stamp},
+                                  'natural_foreign_keys': {'captain': ['Inconnu']}}])
+        self.assertFalse(Crew.objects.filter(name='Sans capitaine').exists())
+
+    def test_tombstones_by_natural_key(self):
+        # Arc 1 de la base source porte la clé primaire locale de Arc 0
+        kept, removed = Arc.objects.get(name='Arc 0'), Arc.objects.get(name='Arc 1')
+        holder = FruitHolder.objects.select_related('devil_fruit', 'character').first()
+        self.import_records([
+            {'model': 'knowledge.arc', 'pk': kept.pk, 'natural_key': ['Arc 1']},
+            {'model': 'knowledge.arc', 'pk': removed.pk, 'natural_key': ['Arc absent']},
+            {'model': 'knowledge.fruitholder', 'pk': 9999, 'natural_key': [
+                [holder.devil_fruit.name], [holder.character.name], holder.from_date,
+            ]},
+        ])
+        self.assertTrue(Arc.objects.filter(pk=kept.pk, name='Arc 0').exists())
+        self.assertFalse(Arc.objects.filter(name='Arc 1').exists())
+        self.assertFalse(FruitHolder.objects.filter(pk=holder.pk).exists())
+
+        with self.assertRaisesMessage(CommandError, f'knowledge.arc #{kept.pk} sans clé naturelle'):
+            self.import_records([{'model': 'knowledge.arc', 'pk': kept.pk}])
+        self.assertTrue(Arc.objects.filter(pk=kept.pk).exists())
+
+    def test_tombstone_of_recreated_row(self):
+        # Supprimée puis recréée dans la base source: la ligne importée n'est pas supprimée
+        arc = Arc.objects.get(name='Arc 2')
+        self.import_records([
+            {'model': 'knowledge.arc', 'pk': 700, 'fields': {'name': 'Arc 2', 'saga': 'Recréé',
+                                                             'updated_at': '2026-01-01T00:00:00Z'}},
+            {'model': 'knowledge.arc', 'pk': 300, 'natural_key': ['Arc 2']},
+        ])
+        self.assertEqual(Arc.objects.get(pk=arc.pk).saga, 'Recréé')
+
+
+# Ligne d'EXPLAIN QUERY PLAN (SQLite) d'une lecture de table sans index: « SCAN knowledge_character »
+# (« SCAN TABLE ... » avant SQLite 3.36). Un parcours d'index (« USING INDEX ») n'en est pas un.
+TABLE_SCAN = re.compile(r'^SCAN (?:TABLE )?(?P<table>\w+)(?: AS \w+)?$')
+
+
+def full_scans(plan):
+    """Tables lues en entier d'après le ``plan`` d'une requête"""
+    return [match.group('table') for match in map(TABLE_SCAN.match, plan) if match]
+
+
+# Seuls parcours admis, (liste, table): première page d'une liste sans filtre triée par id
+# (?ordering=id ou -id). SQLite lit la table dans l'ordre de la clé primaire et s'arrête au
+# LIMIT, chaque ligne étant retenue; les pages suivantes (id > curseur) passent par la clé.
+PRIMARY_KEY_ORDER_SCANS = {
+    ('/api/arcs/', 'knowledge_arc'),
+    ('/api/characters/', 'knowledge_character'),
+    ('/api/crews/', 'knowledge_crew'),
+    ('/api/fruits/', 'knowledge_devilfruit'),
+}
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN est propre à SQLite')
+@override_settings(CACHES=NO_CACHE)
+class QueryPlanTests(TestCase):
+    """Aucune requête des listes (tris, filtres, page suivante), détails et détails groupés ne lit une table entière"""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('seed_onepiece', scale=2000, seed=1, stdout=StringIO())
+        with connection.cursor() as cursor:
+            # Statistiques des index pour le planificateur, comme sur une base en service
+            cursor.execute('ANALYZE')
+
+    def get_urls(self):
+        from .urls import router
+
+        urls = []
+        for prefix, viewset, _ in router.registry:
+            model = viewset.queryset.model
+            filters = [{}] + [
+                {field: model.objects.order_by('pk').values_list(field, flat=True).first()}
+                for field in getattr(viewset, 'filterset_fields', None) or []
+            ]
+            orderings = [None] + [sign + field for field in viewset.ordering_fields for sign in ('', '-')]
+            for params in filters:
+                for ordering in orderings:
+                    urls.append((f'/api/{prefix}/', dict(params, ordering=ordering) if ordering else params))
+            pks = list(model.objects.order_by('pk').values_list('pk', flat=True)[:5])
+            urls.append((f'/api/{prefix}/{pks[0]}/', {}))
+            urls.append((f'/api/{prefix}/batch/', {'ids': ','.join(map(str, pks))}))
+        return urls
+
+    def capture(self, path, params):
+        """Requêtes SELECT exécutées pour ``path`` et, pour une liste, pour sa page suivante"""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(path, params, HTTP_ACCEPT='application/json')
+            self.assertEqual(response.status_code, 200, (path, params))
+            next_link = response.json().get('next')
+            if next_link:
+                self.client.get(next_link, HTTP_ACCEPT='application/json')
+        return [query['sql'] for query in context.captured_queries if query['sql'].startswith('SELECT')]
+
+    def test_no_full_table_scan(self):
+        queries = {}
+        for fast in (False, True):
+            with self.settings(API_FAST_LISTS=fast):
+                for path, params in self.get_urls():
+                    for sql in self.capture(path, params):
+                        queries.setdefault(sql, (path, params))
+        for sql, url in queries.items():
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plan = [row[3] for row in cursor.fetchall()]
+            path, params = url
+            tables = full_scans(plan)
+            if params in ({'ordering': 'id'}, {'ordering': '-id'}):
+                tables = [table for table in tables if (path, table) not in PRIMARY_KEY_ORDER_SCANS]
+            with self.subTest(url=url, sql=sql):
+                self.assertEqual(tables, [], '\n'.join(plan))
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'knowledge-tests-caching',
+}})
+class ConditionalRequestTests(TestCase):
+    """Last-Modified / If-Modified-Since sans 304 périmé pour une modification dans la même seconde"""
+
+    url = '/api/arcs/'
+
+    @classmethod
+    def setUpTestData(cls):
+        create_dataset(characters=4)
+
+    def get(self, now, **headers):
+        with mock.patch.object(caching.time, 'time_ns', return_value=int(now * 10 ** 9)):
+            return self.client.get(self.url, HTTP_ACCEPT='application/json', **headers)
+
+    def test_last_modified_once_the_second_is_over(self):
+        with mock.patch.object(caching.time, 'time_ns', return_value=1000_200_000_000):
+            caching.bump_generation()
+        response = self.get(1000.5)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+        # Même seconde que la modification: If-Modified-Since ignoré
+        self.assertEqual(self.get(1000.5, HTTP_IF_MODIFIED_SINCE=http_date(1000)).status_code, 200)
+
+        response = self.get(1001.5)
+        self.assertEqual(response['Last-Modified'], http_date(1000))
+        self.assertEqual(self.get(1001.5, HTTP_IF_MODIFIED_SINCE=http_date(1000)).status_code, 304)
+        self.assertEqual(self.get(1001.5, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_write_then_read_returns_fresh_data(self):
+        arc = Arc.objects.get(name='Arc 0')
+        url = f'/api/arcs/{arc.pk}/'
+        before = self.client.get(url, HTTP_ACCEPT='application/json')
+        generations = caching.get_generations([Arc])
+        with self.captureOnCommitCallbacks(execute=True):
+            arc.name = 'Arc renommé'
+            arc.save()
+            # Avant le commit, la génération ne change pas: une lecture concurrente garde l'ancienne clé
+            self.assertEqual(caching.get_generations([Arc]), generations)
+        response = self.client.get(url, HTTP_ACCEPT='application/json', HTTP_IF_NONE_MATCH=before['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], 'Arc renommé')
+        self.assertNotEqual(response['ETag'], before['ETag'])
+
+    def test_crew_members_change(self):
+        crew = Crew.objects.get(name='Équipage 0')
+        url = f'/api/crews/{crew.pk}/'
+        before = self.client.get(url, HTTP_ACCEPT='application/json')
+        character = Character.objects.exclude(crews=crew).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            crew.members.add(character)
+        response = self.client.get(url, HTTP_ACCEPT='application/json')
+        self.assertNotEqual(response['ETag'], before['ETag'])
+
+    def test_renderer_variants_are_cached_separately(self):
+        compact = self.client.get(self.url, HTTP_ACCEPT='application/json')
+        indented = self.client.get(self.url, HTTP_ACCEPT='application/json; indent=4')
+        self.assertEqual(indented.status_code, 200)
+        self.assertIn(b'\n    ', indented.content)
+        self.assertNotEqual(indented['ETag'], compact['ETag'])
+        self.assertEqual(json.loads(indented.content), json.loads(compact.content))
+        self.assertNotIn(b'\n', self.client.get(self.url, HTTP_ACCEPT='application/json').content)
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'knowledge-tests-stats',
+}})
+class StatsTests(TestCase):
+    """/api/stats/: résumé en cache, invalidé après le commit des modifications"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_dataset(characters=8)
+
+    def setUp(self):
+        stats.invalidate_stats()
+
+    def get_stats(self):
+        response = self.client.get('/api/stats/', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_stats(self):
+        data = self.get_stats()
+        self.assertEqual(data['totals']['characters'], 8)
+        self.assertEqual(data['totals']['fruit_holders'], 8)
+        self.assertEqual(sum(bucket['count'] for bucket in data['bounty_distribution']['buckets']), 8)
+        self.assertEqual(data['bounty_distribution']['max'], 3000)
+        self.assertEqual(
+            {crew['name']: crew['member_count'] for crew in data['top_crews']},
+            {crew.name: crew.members.count() for crew in Crew.objects.all()},
+        )
+        # Deuxième appel servi par le cache
+        with self.assertNumQueries(0):
+            self.get_stats()
+
+    def test_invalidated_after_commit(self):
+        self.get_stats()
+        with self.captureOnCommitCallbacks(execute=True):
+            Character.objects.create(name='Nouveau', bounty=5000)
+            # Pendant la transaction, le résumé en cache reste celui d'avant
+            self.assertEqual(self.get_stats()['totals']['characters'], 8)
+        self.assertEqual(self.get_stats()['totals']['characters'], 9)
+        crew = Crew.objects.first()
+        members = crew.members.count()
+        with self.captureOnCommitCallbacks(execute=True):
+            crew.members.add(Character.objects.get(name='Nouveau'))
+        top = {row['name']: row['member_count'] for row in self.get_stats()['top_crews']}
+        self.assertEqual(top[crew.name], members + 1)
+
+
+@override_settings(CACHES=NO_CACHE)
+class StreamingCSVTests(TestCase):
+    """Export CSV en flux: colonnes de l'export d'origine, liste filtrée de l'admin"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_dataset(characters=12)
+        cls.admin = get_user_model().objects.create_superuser('admin', password='secret')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    @staticmethod
+    def baseline_rows(fruits):
+        # Colonnes de l'export CSV d'origine, calculées par les méthodes du modèle
+        return [
+            ['Nom', 'Romanji', 'Type', 'Capacité', 'Rareté', 'Statut', 'Arc première apparition'],
+        ] + [
+            [fruit.name, fruit.romanji, fruit.get_fruit_type_display(), fruit.ability[:100], str(fruit.rarity),
+             fruit.get_status_display(), fruit.first_appearance_arc.name if fruit.first_appearance_arc else '']
+            for fruit in fruits
+        ]
+
+    @staticmethod
+    def read_csv(response):
+        content = b''.join(response.streaming_content).decode()
+        return list(csv.reader(StringIO(content)))
+
+    def test_stream_csv_matches_baseline(self):
+        fruits = DevilFruit.objects.order_by('name')
+        fruits.filter(name='Fruit 0').update(
+            fruit_type=DevilFruit.FruitType.LOGIA, ability='x' * 150, first_appearance_arc=Arc.objects.first(),
+        )
+        with mock.patch.object(exports, 'CSV_STREAM_ROWS', 2):
+            chunks = list(exports.stream_csv('fruits', fruits))
+        self.assertEqual(len(chunks), len(fruits) // 2 + 1)
+        self.assertEqual(list(csv.reader(StringIO(''.join(chunks)))), self.baseline_rows(fruits))
+
+    def test_selection_action(self):
+        fruits = DevilFruit.objects.order_by('name')[:2]
+        response = self.client.post('/admin/knowledge/devilfruit/', {
+            'action': 'export_csv', '_selected_action': [fruit.pk for fruit in fruits],
+        })
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="devil_fruits_export.csv"')
+        self.assertEqual(self.read_csv(response), self.baseline_rows(fruits))
+
+    def test_whole_list_follows_changelist(self):
+        params = {'q': 'Personnage', 'role__exact': 'PIRATE', 'o': '-4.1'}
+        changelist = self.client.get('/admin/knowledge/character/', params).context['cl']
+        expected = [character.name for character in changelist.queryset]
+        # Pirates seulement, par prime décroissante: ni toute la table ni l'ordre par défaut
+        self.assertTrue(0 < len(expected) < Character.objects.count())
+        self.assertNotEqual(expected, sorted(expected))
+        response = self.client.get('/admin/knowledge/character/export-csv/', params)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="characters_export.csv"')
+        rows = self.read_csv(response)
+        self.assertEqual(rows[0], exports.CHARACTER_CSV_HEADER)
+        self.assertEqual([row[0] for row in rows[1:]], expected)
+
+    def test_bad_lookup(self):
+        response = self.client.get('/admin/knowledge/character/export-csv/', {'inconnu__exact': '1'})
+        self.assertRedirects(response, '/admin/knowledge/character/?e=1', fetch_redirect_response=False)
+
+    def test_requires_view_permission(self):
+        self.client.force_login(get_user_model().objects.create_user('staff', password='secret', is_staff=True))
+        self.assertEqual(self.client.get('/admin/knowledge/character/export-csv/').status_code, 403)
+
+
+class ExportImportTests(TestCase):
+    """export_json puis import_json: même contenu, et export incrémental avec tombstones"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.people = create_dataset(characters=6)
+
+    def setUp(self):
+        self.directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.manifest = os.path.join(self.directory, 'manifest.json')
+        # Données écrites bien avant le premier export, hors du recouvrement des deltas
+        for model in (Arc, Episode, Crew, Character, DevilFruit, FruitHolder):
+            model.objects.update(updated_at=timezone.now() - 2 * EXPORT_SINCE_OVERLAP)
+
+    @staticmethod
+    def snapshot():
+        # Contenu indépendant des clés primaires (--upsert en attribue de nouvelles) et
+        # de updated_at, date de modification dans la base où la ligne est écrite
+        return {
+            'arcs': set(Arc.objects.values_list('name', 'saga', 'start_episode_number', 'end_episode_number')),
+            'episodes': set(Episode.objects.values_list('number', 'title', 'arc__name')),
+            'crews': set(Crew.objects.values_list('name', 'captain__name')),
+            'characters': {
+                (character.name, character.role, character.bounty, character.first_appearance_episode.number,
+                 tuple(sorted(crew.name for crew in character.crews.all())))
+                for character in Character.objects.select_related('first_appearance_episode').prefetch_related('crews')
+            },
+            'fruits': set(DevilFruit.objects.values_list('name', 'ability', 'rarity')),
+            'holders': set(FruitHolder.objects.values_list(
+                'devil_fruit__name', 'character__name', 'from_date', 'to_date', 'is_current'
+            )),
+        }
+
+    @staticmethod
+    def wipe():
+        for model in (FruitHolder, DevilFruit, Character, Crew, Episode, Arc):
+            model.objects.all().delete()
+
+    def export(self, name, **options):
+        output = os.path.join(self.directory, name)
+        call_command('export_json', output=output, manifest=self.manifest, stdout=StringIO(), **options)
+        return output
+
+    def import_(self, filename, **options):
+        call_command('import_json', filename, stdout=StringIO(), **options)
+
+    def test_round_trip(self):
+        expected = self.snapshot()
+        for name, options in [('full.json', {}), ('full.jsonl.gz', {'format': 'jsonl', 'compress': 'gzip'})]:
+            with self.subTest(name):
+                filename = self.export(name, chunk_size=4, **options)
+                self.wipe()
+                self.assertEqual(Character.objects.count(), 0)
+                self.import_(filename)
+                self.assertEqual(self.snapshot(), expected)
+
+    def test_delta_with_tombstones(self):
+        full = self.export('full.json')
+        with open(self.manifest, encoding='utf-8') as f:
+            high_water_mark = json.load(f)['high_water_mark']
+
+        # people[3] a détenu Fruit 2: sa suppression supprime aussi ce détenteur
+        changed, removed = self.people[5], self.people[3]
+        changed.bounty = 777
+        changed.save()
+        newcomer = Character.objects.create(name='Nouveau', first_appearance_episode=changed.first_appearance_episode)
+        newcomer.crews.add(Crew.objects.get(name='Équipage 2'))
+        removed_pk, removed_name = removed.pk, removed.name
+        removed_holders = list(removed.fruit_history.values_list('pk', flat=True))
+        removed_keys = [
+            [[fruit], [removed_name], from_date and from_date.isoformat()]
+            for fruit, from_date in removed.fruit_history.values_list('devil_fruit__name', 'from_date')
+        ]
+        self.assertTrue(removed_holders)
+        removed.delete()
+        expected = self.snapshot()
+
+        delta = self.export('delta.jsonl.gz', since='last', format='jsonl', compress='gzip')
+        with gzip.open(delta, 'rt', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(
+            {(record['model'], record['pk']) for record in records if 'fields' in record},
+            {('knowledge.character', changed.pk), ('knowledge.character', newcomer.pk)},
+        )
+        self.assertEqual(
+            {(record['model'], record['pk']) for record in records if 'fields' not in record},
+            {('knowledge.character', removed_pk)} | {('knowledge.fruitholder', pk) for pk in removed_holders},
+        )
+        # Clé naturelle enregistrée à la suppression, pour une base cible aux autres clés primaires
+        tombstones = [record for record in records if 'fields' not in record]
+        self.assertCountEqual(
+            [record['natural_key'] for record in tombstones], [[removed_name]] + removed_keys,
+        )
+        with open(self.manifest, encoding='utf-8') as f:
+            manifest = json.load(f)
+        self.assertEqual(manifest['since'], high_water_mark)
+        self.assertEqual(manifest['counts']['characters'], 2)
+
+        # Base cible: l'export complet, puis le delta par-dessus
+        self.wipe()
+        self.import_(full)
+        self.import_(delta, upsert=True)
+        self.assertEqual(self.snapshot(), expected)
+
+    def test_delta_overlaps_previous_export(self):
+        # Ligne enregistrée juste avant l'export complet mais validée après sa lecture
+        late = self.people[2]
+        Character.objects.filter(pk=late.pk).update(updated_at=timezone.now() - timedelta(seconds=1))
+        self.export('full.json')
+        delta = self.export('delta.jsonl', since='last', format='jsonl')
+        with open(delta, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([(record['model'], record['pk']) for record in records], [('knowledge.character', late.pk)])
+
+    def test_delta_with_diverged_primary_keys(self):
+        full = self.export('full.json')
+        # Arc 1 supprimé; le personnage modifié garde un épisode et rejoint un équipage absents du delta
+        removed = Arc.objects.get(name='Arc 1')
+        removed.delete()
+        changed = self.people[4]
+        changed.bounty = 555
+        changed.first_appearance_episode = episode = Episode.objects.get(number=6)
+        changed.save()
+        changed.crews.add(crew := Crew.objects.get(name='Équipage 0'))
+        expected = self.snapshot()
+        delta = self.export('delta.jsonl', since='last', format='jsonl')
+
+        # Base cible dont les lignes locales portent les clés primaires source de ces lignes
+        self.wipe()
+        local_arc = Arc.objects.create(pk=removed.pk, name='Local')
+        local_episode = Episode.objects.create(pk=episode.pk, number=999, title='Local', arc=local_arc)
+        Crew.objects.create(pk=crew.pk, name='Local')
+        Character.objects.create(name='Local', first_appearance_episode=local_episode)
+        local = self.snapshot()
+        self.import_(full, upsert=True)
+        self.import_(delta, upsert=True)
+        self.assertEqual(self.snapshot(), {key: expected[key] | local[key] for key in expected})
+
+
+class AdminStatsViewTests(TestCase):
+    """/admin/stats/ réservé à l'équipe: les autres sont renvoyés vers la connexion de l'admin"""
+
+    url = '/admin/stats/'
+
+    @classmethod
+    def setUpTestData(cls):
+        create_dataset(characters=4)
+        users = get_user_model().objects
+        cls.staff = users.create_user('staff', password='secret', is_staff=True)
+        cls.visitor = users.create_user('visiteur', password='secret')
+
+    def assertRedirectsToLogin(self, response):
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith(f'/admin/login/?next={self.url}'), response['Location'])
+
+    def test_anonymous(self):
+        self.assertRedirectsToLogin(self.client.get(self.url))
+
+    def test_non_staff(self):
+        self.client.force_login(self.visitor)
+        self.assertRedirectsToLogin(self.client.get(self.url))
+
+    def test_staff(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('graph1', response.context)
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'knowledge-tests-graph',
+}})
+class GraphTests(TestCase):
+    """Graphe des relations: voisins, k sauts, plus court chemin, mises à jour et autres processus"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.people = create_dataset(characters=6)
+        cls.crews = list(Crew.objects.order_by('pk'))
+
+    def setUp(self):
+        graph.index.reset()
+        self.addCleanup(graph.index.reset)
+
+    def node(self, kind, obj):
+        return graph.index.get_node(kind, obj.pk)
+
+    def neighbors(self, kind, obj):
+        return {(n['type'], n['label'], n['relation']) for n in graph.index.neighbors(self.node(kind, obj))}
+
+    def path(self, source, target, **params):
+        params.update({'from': f'character:{source.pk}', 'to': f'character:{target.pk}'})
+        response = self.client.get('/api/graph/path/', params, HTTP_ACCEPT='application/json')
+        return response.json()['path'] if response.status_code == 200 else None
+
+    def test_neighbors_and_expand(self):
+        self.assertEqual(self.neighbors('character', self.people[0]), {
+            ('crew', 'Équipage 0', 'captain'), ('crew', 'Équipage 1', 'member'), ('fruit', 'Fruit 0', 'holder'),
+        })
+        nodes, truncated = graph.index.expand(self.node('character', self.people[0]), 1, 100)
+        self.assertEqual({(n['type'], n['distance']) for n in nodes}, {('crew', 1), ('fruit', 1)})
+        self.assertFalse(truncated)
+        # Deux sauts: les autres membres des équipages et l'autre détenteur du fruit
+        nodes, _ = graph.index.expand(self.node('character', self.people[0]), 2, 100, {'character', 'crew'})
+        self.assertEqual(
+            {n['label'] for n in nodes if n['distance'] == 2},
+            {person.name for person in self.people[1:]},
+        )
+        nodes, truncated = graph.index.expand(self.node('character', self.people[0]), 2, 2)
+        self.assertEqual(len(nodes), 2)
+        self.assertTrue(truncated)
+
+    def test_shortest_path(self):
+        first, other = self.people[0], self.people[4]
+        self.assertEqual([step['label'] for step in self.path(first, first)], [first.name])
+        self.assertEqual([step['label'] for step in self.path(first, other)], [first.name, 'Équipage 1', other.name])
+        # Sans passer par les équipages: people[0] -> Fruit 0 -> people[1] -> Fruit 1 -> people[2]
+        steps = self.path(first, self.people[2], via='character,fruit')
+        self.assertEqual([step['type'] for step in steps], ['character', 'fruit', 'character', 'fruit', 'character'])
+        self.assertIsNone(self.path(first, other, via='character,fruit'))
+        self.assertIsNone(self.path(first, self.people[2], via='character,fruit', max_length=2))
+        loner = Character.objects.create(name='Solitaire')
+        self.assertIsNone(self.path(first, loner))
+
+    def test_refresh_after_writes(self):
+        graph.index.build()
+        crew = self.crews[2]
+        with self.captureOnCommitCallbacks(execute=True):
+            newcomer = Character.objects.create(name='Recrue')
+            newcomer.crews.add(crew)
+            FruitHolder.objects.create(devil_fruit=DevilFruit.objects.get(name='Fruit 2'), character=newcomer)
+        self.assertTrue(graph.index.built)
+        self.assertEqual(self.neighbors('character', newcomer), {
+            ('crew', crew.name, 'member'), ('fruit', 'Fruit 2', 'holder'),
+        })
+        self.assertIn(('character', 'Recrue', 'member'), self.neighbors('crew', crew))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            crew.captain = newcomer
+            crew.save()
+        self.assertIn(('character', 'Recrue', 'captain'), self.neighbors('crew', crew))
+
+        pk = newcomer.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            newcomer.delete()
+        self.assertIsNone(graph.index.get_node('character', pk))
+        self.assertNotIn('Recrue', {label for _, label, _ in self.neighbors('crew', crew)})
+
+    def test_writes_from_another_process(self):
+        here, elsewhere = graph.GraphIndex(), graph.GraphIndex()
+        here.build()
+        elsewhere.build()
+        character = Character.objects.create(name='Ailleurs')
+        character.crews.add(self.crews[0])
+        # Écriture appliquée par l'autre processus: celui-ci reconstruit son index
+        elsewhere.refresh(character)
+        self.assertTrue(elsewhere.built)
+        self.assertIsNotNone(here.get_node('character', character.pk))
+        self.assertTrue(here.built)
+        # Écritures des deux côtés intercalées: l'index qui a manqué la première est reconstruit
+        other = Character.objects.create(name='Autre')
+        elsewhere.refresh(other)
+        here.refresh(character)
+        self.assertFalse(here.built)
+        self.assertIsNotNone(here.get_node('character', other.pk))
+
+
+def pdf_page_count(content):
+    # reportlab ne compresse que les flux de contenu: les objets /Page restent lisibles
+    return len(re.findall(rb'/Type /Page\b', content))
+
+
+@override_settings(CACHES=NO_CACHE)
+class AdminChangeListTests(TestCase):
+    """Listes de l'admin: nombre de requêtes indépendant du nombre de lignes, comptage estimé ou borné"""
+
+    # Session et utilisateur, puis comptage (estimation et COUNT exact sous ADMIN_EXACT_COUNT_LIMIT),
+    # lignes de la page avec leurs relations, et valeurs de list_filter lues en base
+    QUERIES = {
+        '/admin/knowledge/crew/': 6,
+        '/admin/knowledge/character/': 5,
+        '/admin/knowledge/fruitholder/': 5,
+        '/admin/knowledge/devilfruit/': 6,
+        # Liste filtrée: un seul COUNT borné
+        '/admin/knowledge/character/?q=Personnage&role__exact=PIRATE&o=-4': 4,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.people = create_dataset(characters=12)
+        cls.admin = get_user_model().objects.create_superuser('admin', password='secret')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_rows(self):
+        fruit = DevilFruit.objects.create(name='Fruit sans détenteur actuel')
+        for i in range(10):
+            character = Character.objects.create(name=f'Renfort {i}')
+            crew = Crew.objects.create(name=f'Équipage renfort {i}', captain=character, base_location=f'Île {i}')
+            character.crews.add(crew, *self.people[i].crews.all())
+            FruitHolder.objects.create(devil_fruit=fruit, character=character)
+
+    def test_query_counts(self):
+        for rows in ('initial', 'added'):
+            if rows == 'added':
+                self.add_rows()
+            for url, queries in self.QUERIES.items():
+                with self.subTest(url=url, rows=rows), self.assertNumQueries(queries):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_crew_member_count(self):
+        self.add_rows()
+        response = self.client.get('/admin/knowledge/crew/', {'o': '-5'})
+        rows = response.context['cl'].result_list
+        self.assertEqual([crew.member_total for crew in rows], [crew.members.count() for crew in rows])
+        totals = [crew.member_total for crew in rows]
+        self.assertEqual(totals, sorted(totals, reverse=True))
+
+    def paginator_count(self, queryset):
+        return pagination.EstimatedCountPaginator(queryset, 100).count
+
+    def test_estimated_count(self):
+        Character.objects.filter(pk=self.people[1].pk).delete()
+        queryset = Character.objects.all()
+        # Sous la limite: COUNT(*) exact
+        with self.assertNumQueries(2):
+            self.assertEqual(self.paginator_count(queryset), 11)
+        # Au-delà: estimation seule (plus grand rowid, qui ignore la suppression)
+        with mock.patch.object(pagination, 'ADMIN_EXACT_COUNT_LIMIT', 5), self.assertNumQueries(1):
+            self.assertEqual(self.paginator_count(queryset), 12)
+
+    def test_capped_count(self):
+        queryset = Character.objects.filter(name__startswith='Personnage')
+        with mock.patch.object(pagination, 'ADMIN_EXACT_COUNT_LIMIT', 5), self.assertNumQueries(1):
+            self.assertEqual(self.paginator_count(queryset), 12)
+        with mock.patch.object(pagination, 'ADMIN_COUNT_CAP', 5):
+            self.assertEqual(self.paginator_count(queryset), 5)
+            response = self.client.get('/admin/knowledge/character/', {'q': 'Personnage', 'o': '1'})
+            self.assertEqual(response.context['cl'].result_count, 5)
+
+
+class ExportPDFTests(TestCase):
+    """Fiches PDF: document combiné et ZIP de fiches, avec et sans pool de processus"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Plus de RENDER_BATCH_SIZE personnages pour que le ZIP passe par le pool
+        cls.people = create_dataset(characters=exports.RENDER_BATCH_SIZE + 4)
+        cls.fruits = list(DevilFruit.objects.order_by('pk'))
+
+    def setUp(self):
+        self.addCleanup(self.shutdown_pool)
+
+    @staticmethod
+    def shutdown_pool():
+        if exports._process_pool is not None:
+            exports._process_pool.shutdown()
+            exports._process_pool = None
+
+    def write(self, writer, objects):
+        output, progress = BytesIO(), []
+        filename = writer(output, [obj.pk for obj in objects], progress.append)
+        return filename, output.getvalue(), progress
+
+    def archive_members(self, content):
+        with zipfile.ZipFile(BytesIO(content)) as archive:
+            return {name: archive.read(name) for name in archive.namelist()}
+
+    def test_combined_document(self):
+        filename, content, progress = self.write(exports.write_fruit_pdf, self.fruits)
+        self.assertEqual(filename, f'fruits_{len(self.fruits)}.pdf')
+        self.assertTrue(content.startswith(b'%PDF'))
+        self.assertEqual(pdf_page_count(content), len(self.fruits))
+        self.assertEqual(progress, list(range(1, len(self.fruits) + 1)))
+
+        filename, content, _ = self.write(exports.write_character_pdf, self.people[:1])
+        self.assertEqual(filename, f'character_{self.people[0].name.replace(" ", "_")}.pdf')
+        self.assertEqual(pdf_page_count(content), 1)
+
+        with self.assertRaisesMessage(ValueError, 'Aucun objet'):
+            exports.write_character_pdf(BytesIO(), [], lambda count: None)
+
+    def check_zip(self, writer, objects, sheet):
+        filename, content, progress = self.write(writer, objects)
+        self.assertEqual(filename, f'{sheet}s_{len(objects)}.zip')
+        members = self.archive_members(content)
+        self.assertEqual(list(members), [f'{obj.pk}_{exports.pdf_filename(sheet, obj)}' for obj in objects])
+        self.assertEqual([pdf_page_count(member) for member in members.values()], [1] * len(objects))
+        self.assertEqual(progress[-1], len(objects))
+
+    @override_settings(EXPORT_PDF_PROCESSES=0)
+    def test_zip_in_process(self):
+        self.assertIsNone(exports.get_process_pool())
+        self.check_zip(exports.write_fruit_pdf_zip, self.fruits, 'fruit')
+        self.check_zip(exports.write_character_pdf_zip, self.people, 'character')
+
+    @override_settings(EXPORT_PDF_PROCESSES=2)
+    def test_zip_in_process_pool(self):
+        pool = exports.get_process_pool()
+        self.assertIsNotNone(pool)
+        with mock.patch.object(pool, 'submit', wraps=pool.submit) as pool_submit:
+            # Trop peu de fiches pour le pool: rendu dans le processus du job
+            self.check_zip(exports.write_fruit_pdf_zip, self.fruits, 'fruit')
+            pool_submit.assert_not_called()
+            # Les processus du pool reçoivent les objets déjà chargés et ne lisent pas la base de test
+            self.check_zip(exports.write_character_pdf_zip, self.people, 'character')
+            self.assertEqual(pool_submit.call_count, 2)
+
+    @override_settings(EXPORT_PDF_PROCESSES=2)
+    def test_zip_in_process_pool_window(self):
+        # Une fiche par paquet: au plus 2 paquets par processus soumis sans avoir été écrits
+        pool = exports.get_process_pool()
+        pool_submit, progress = pool.submit, []
+
+        def submit(*args):
+            # Paquets soumis, celui-ci compris, moins les paquets écrits
+            self.assertLessEqual(submitted.call_count - (progress[-1] if progress else 0), 2 * 2)
+            return pool_submit(*args)
+
+        with mock.patch.object(exports, 'RENDER_BATCH_SIZE', 1), \
+                mock.patch.object(pool, 'submit', side_effect=submit) as submitted:
+            exports.write_character_pdf_zip(output := BytesIO(), [obj.pk for obj in self.people], progress.append)
+        self.assertEqual(submitted.call_count, len(self.people))
+        self.assertEqual(len(self.archive_members(output.getvalue())), len(self.people))
+
+
+@override_settings(EXPORT_JOB_WORKERS=0, EXPORT_JOB_STALE_TIMEOUT=600)
+class StaleExportJobTests(TestCase):
+    """Un job resté « en cours » après l'arrêt de son processus est repris par run_export_jobs"""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_dataset(characters=4)
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(self.settings(MEDIA_ROOT=media.name))
+        self.media = media.name
+
+    def stored_files(self):
+        return sorted(
+            os.path.relpath(os.path.join(root, name), self.media)
+            for root, _, names in os.walk(self.media) for name in names
+        )
+
+    def running_job(self, minutes_ago):
+        since = timezone.now() - timedelta(minutes=minutes_ago)
+        ids = list(DevilFruit.objects.values_list('pk', flat=True))
+        return ExportJob.objects.create(
+            kind=ExportJob.Kind.FRUITS_CSV, object_ids=ids, total=len(ids),
+            status=ExportJob.Status.RUNNING, started_at=since, heartbeat_at=since,
+        )
+
+    def test_stale_job_is_requeued_and_run(self):
+        stale, alive = self.running_job(minutes_ago=60), self.running_job(minutes_ago=1)
+        with self.assertLogs('knowledge.jobs', 'WARNING'):
+            call_command('run_export_jobs', stdout=StringIO())
+        stale.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual(stale.status, ExportJob.Status.DONE)
+        self.assertTrue(stale.result.name)
+        self.assertEqual(alive.status, ExportJob.Status.RUNNING)
+
+    def test_stale_worker_result_is_ignored(self):
+        job = self.running_job(minutes_ago=60)
+        old_claim = ExportJob.objects.filter(pk=job.pk, status=ExportJob.Status.RUNNING, started_at=job.started_at)
+        with self.assertLogs('knowledge.jobs', 'WARNING'):
+            self.assertEqual(jobs.requeue_stale_jobs(), [job.pk])
+
+        write, text = jobs.EXPORTS[job.kind]
+
+        def write_then_requeue(output, object_ids, progress):
+            filename = write(output, object_ids, progress)
+            # Job jugé arrêté et remis en attente pendant l'écriture
+            ExportJob.objects.filter(pk=job.pk).update(status=ExportJob.Status.PENDING, started_at=None)
+            return filename
+
+        with mock.patch.dict(jobs.EXPORTS, {job.kind: (write_then_requeue, text)}):
+            self.assertTrue(jobs.run_job(job.pk))
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExportJob.Status.PENDING)
+        self.assertFalse(job.result.name)
+        # Fichier de l'exécution écartée supprimé: pas d'orphelin dans le stockage
+        self.assertEqual(self.stored_files(), [])
+
+        self.assertTrue(jobs.run_job(job.pk))
+        # L'ancien thread termine après la reprise: son écriture ne touche plus le job
+        self.assertEqual(old_claim.update(status=ExportJob.Status.FAILED, error='ancien thread'), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ExportJob.Status.DONE)
+        self.assertEqual(self.stored_files(), [os.path.relpath(job.result.path, self.media)])
+
+
+class SeedTests(TestCase):
+    """Données synthétiques de seed_onepiece --scale"""
+
+    def test_synthetic_captains_are_members(self):
+        call_command('seed_onepiece', scale=300, seed=1, stdout=StringIO())
+        captained = Crew.objects.filter(captain__isnull=False, name__contains='#')
+        self.assertTrue(captained.exists())
+        for crew in captained:
+            self.assertTrue(crew.members.filter(pk=crew.captain_id).exists(), crew.name)
+
+    def test_second_run_adds_data(self):
+        call_command('seed_onepiece', scale=300, seed=1, stdout=StringIO())
+        counts = [model.objects.count() for model in (Arc, Episode, Crew, DevilFruit, Character)]
+        call_command('seed_onepiece', scale=300, seed=1, stdout=StringIO())
+        self.assertEqual(Episode.objects.filter(number__gt=counts[1]).count(), 30)
+        self.assertEqual(Character.objects.count(), counts[4] + 300)
+        self.assertEqual(Arc.objects.filter(name__startswith='Arc synthétique').count(), 2)
+        self.assertEqual(Crew.objects.count(), counts[2] + 6)
+        self.assertEqual(DevilFruit.objects.count(), counts[3] + 15)
+
+    def test_second_run_after_deletions(self):
+        # 60 épisodes: deux arcs synthétiques
+        call_command('seed_onepiece', scale=600, seed=1, stdout=StringIO())
+        models = (Arc, Crew, DevilFruit, Character)
+        counts = [model.objects.count() for model in models]
+        # Premières lignes supprimées: count() redonnerait au lot suivant le numéro des dernières
+        for model in models:
+            model.objects.order_by('pk').first().delete()
+        call_command('seed_onepiece', scale=600, seed=1, stdout=StringIO())
+        self.assertEqual(
+            [model.objects.count() for model in models],
+            [counts[0] + 1, counts[1] + 11, counts[2] + 29, counts[3] + 599],
+        )
+
+    def test_refuses_reference_data_twice(self):
+        call_command('seed_onepiece', stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, '--reset'):
+            call_command('seed_onepiece', stdout=StringIO())
+        call_command('seed_onepiece', reset=True, stdout=StringIO())
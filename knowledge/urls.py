@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, views
 
 router = DefaultRouter()
 router.register(r'characters', views.CharacterViewSet, basename='character')
@@ -10,6 +10,19 @@ router.register(r'arcs', views.ArcViewSet, basename='arc')
 router.register(r'episodes', views.EpisodeViewSet, basename='episode')
 
 urlpatterns = [
+    path('stats/', views.stats_view, name='stats'),
+    path('search/', views.search_view, name='search'),
+    path('graph/neighbors/', views.graph_neighbors_view, name='graph-neighbors'),
+    path('graph/expand/', views.graph_expand_view, name='graph-expand'),
+    path('graph/path/', views.graph_path_view, name='graph-path'),
     path('', include(router.urls)),
 ]
 
+
+# Variantes asynchrones des lectures (serveur ASGI), voir knowledge/async_views.py
+for resource in async_views.LISTS:
+    urlpatterns += [
+        path(f'async/{resource}/', async_views.list_view, {'resource': resource}, name=f'async-{resource}-list'),
+        path(f'async/{resource}/<int:pk>/', async_views.detail_view, {'resource': resource},
+             name=f'async-{resource}-detail'),
+    ]
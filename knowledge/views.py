@@ -1,5 +1,10 @@
 from rest_framework import viewsets
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import cache
+from django.db.models import Prefetch
 from django.http import HttpResponse
 from django.shortcuts import render
 from django.conf import settings
@@ -9,8 +14,9 @@ matplotlib.use('Agg')  # Backend non-interactif
 import matplotlib.pyplot as plt
 from io import BytesIO
 import base64
+import hashlib
 
-from .models import Character, Crew, DevilFruit, Arc, Episode
+from .models import Character, Crew, DevilFruit, Arc, Episode, FruitHolder
 from .serializers import (
     CharacterListSerializer, CharacterDetailSerializer,
     CrewListSerializer, CrewDetailSerializer,
@@ -18,111 +24,284 @@ from .serializers import (
     ArcListSerializer, ArcDetailSerializer,
     EpisodeListSerializer, EpisodeDetailSerializer
 )
+from .autocomplete import SEARCH_KINDS, index as autocomplete_index
+from .caching import CachedResponseMixin
+from .graph import KINDS as GRAPH_KINDS, index as graph_index
+from .listing import BatchDetailMixin, ValuesListMixin, add_character_relations
+from .stats import get_stats
 
 
-class CharacterViewSet(viewsets.ReadOnlyModelViewSet):
+# Actions servies avec le queryset et le serializer de détail
+DETAIL_ACTIONS = ('retrieve', 'batch')
+
+
+class CharacterViewSet(CachedResponseMixin, BatchDetailMixin, ValuesListMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet pour les personnages"""
-    queryset = Character.objects.all().prefetch_related('crews', 'fruit_history__devil_fruit')
+    queryset = Character.objects.all()
     search_fields = ['name', 'epithet', 'role', 'description']
+    filterset_fields = ['role', 'status']
     ordering_fields = ['id', 'name', 'bounty']
-    ordering = ['name']
+    ordering = ['name', 'id']
+    list_fields = ['id', 'name', 'epithet', 'role', 'bounty', 'origin', 'status']
+    
+    def get_queryset(self):
+        # Relations et textes chargés seulement s'ils figurent dans la réponse (?fields=, ?omit=)
+        queryset = self.defer_unused_text(super().get_queryset())
+        if self.action in DETAIL_ACTIONS:
+            if self.wants('first_appearance_episode'):
+                queryset = queryset.select_related('first_appearance_episode__arc')
+            if self.wants('crews'):
+                queryset = queryset.prefetch_related(Prefetch('crews', queryset=Crew.objects.select_related('captain')))
+                if 'crews.members' in self.get_expand():
+                    queryset = queryset.prefetch_related(
+                        Prefetch('crews__members', queryset=Character.objects.only('id', 'name', 'bounty'))
+                    )
+            if self.wants('fruits_history'):
+                queryset = queryset.prefetch_related('fruit_history__devil_fruit')
+            return queryset
+        if self.wants('crews'):
+            queryset = queryset.prefetch_related('crews')
+        if self.wants('current_fruits'):
+            # Un seul prefetch pour les fruits actuels de toute la page (pas de requête par ligne)
+            queryset = queryset.prefetch_related(Prefetch(
+                'fruit_history',
+                queryset=FruitHolder.objects.filter(is_current=True).select_related('devil_fruit'),
+                to_attr='current_holders'
+            ))
+        return queryset
+    
+    def add_list_relations(self, rows):
+        add_character_relations(rows, crews=self.wants('crews'), current_fruits=self.wants('current_fruits'))
+    
+    def get_expand(self):
+        """Relations imbriquées demandées via ?expand=crews.members"""
+        expand = self.request.query_params.get('expand', '')
+        return {item.strip() for item in expand.split(',') if item.strip()}
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expand'] = self.get_expand()
+        return context
     
     def get_serializer_class(self):
-        if self.action == 'retrieve':
+        if self.action in DETAIL_ACTIONS:
             return CharacterDetailSerializer
         return CharacterListSerializer
 
 
-class CrewViewSet(viewsets.ReadOnlyModelViewSet):
+class CrewViewSet(CachedResponseMixin, BatchDetailMixin, ValuesListMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet pour les équipages"""
-    queryset = Crew.objects.all().prefetch_related('members')
+    queryset = Crew.objects.all()
+    cache_models = (Crew, Character)
     search_fields = ['name', 'ship_name', 'base_location']
     ordering_fields = ['id', 'name']
-    ordering = ['name']
+    ordering = ['name', 'id']
+    
+    def get_queryset(self):
+        queryset = self.defer_unused_text(super().get_queryset())
+        if self.action in DETAIL_ACTIONS:
+            if self.wants('captain'):
+                queryset = queryset.select_related('captain')
+            if self.wants('members'):
+                queryset = queryset.prefetch_related('members')
+        return queryset
     
     def get_serializer_class(self):
-        if self.action == 'retrieve':
+        if self.action in DETAIL_ACTIONS:
             return CrewDetailSerializer
         return CrewListSerializer
 
 
-class DevilFruitViewSet(viewsets.ReadOnlyModelViewSet):
+class DevilFruitViewSet(CachedResponseMixin, BatchDetailMixin, ValuesListMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet pour les fruits du démon"""
-    queryset = DevilFruit.objects.all().prefetch_related('holders__character')
+    queryset = DevilFruit.objects.all()
+    cache_models = (DevilFruit, FruitHolder, Character, Arc)
     search_fields = ['name', 'romanji', 'ability', 'description']
     ordering_fields = ['id', 'name', 'rarity', 'fruit_type']
-    ordering = ['name']
+    ordering = ['name', 'id']
+    
+    def get_queryset(self):
+        queryset = self.defer_unused_text(super().get_queryset())
+        if self.action in DETAIL_ACTIONS:
+            if self.wants('first_appearance_arc'):
+                queryset = queryset.select_related('first_appearance_arc')
+            if self.wants('holders'):
+                queryset = queryset.prefetch_related('holders__character')
+        return queryset
     
     def get_serializer_class(self):
-        if self.action == 'retrieve':
+        if self.action in DETAIL_ACTIONS:
             return DevilFruitDetailSerializer
         return DevilFruitListSerializer
 
 
-class ArcViewSet(viewsets.ReadOnlyModelViewSet):
+class ArcViewSet(CachedResponseMixin, BatchDetailMixin, ValuesListMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet pour les arcs"""
-    queryset = Arc.objects.all().prefetch_related('episodes')
+    queryset = Arc.objects.all()
+    cache_models = (Arc, Episode)
     search_fields = ['name', 'saga', 'description']
     ordering_fields = ['id', 'name', 'start_episode_number']
-    ordering = ['start_episode_number']
+    ordering = ['start_episode_number', 'id']
+    
+    def get_queryset(self):
+        queryset = self.defer_unused_text(super().get_queryset())
+        if self.action in DETAIL_ACTIONS and self.wants('episodes'):
+            queryset = queryset.prefetch_related('episodes')
+        return queryset
     
     def get_serializer_class(self):
-        if self.action == 'retrieve':
+        if self.action in DETAIL_ACTIONS:
             return ArcDetailSerializer
         return ArcListSerializer
 
 
-class EpisodeViewSet(viewsets.ReadOnlyModelViewSet):
+class EpisodeViewSet(CachedResponseMixin, BatchDetailMixin, ValuesListMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet pour les épisodes"""
-    queryset = Episode.objects.all().select_related('arc')
+    queryset = Episode.objects.all()
+    cache_models = (Episode, Arc)
     search_fields = ['title']
     ordering_fields = ['number', 'title']
     ordering = ['number']
     
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in DETAIL_ACTIONS and self.wants('arc'):
+            queryset = queryset.select_related('arc')
+        return queryset
+    
     def get_serializer_class(self):
-        if self.action == 'retrieve':
+        if self.action in DETAIL_ACTIONS:
             return EpisodeDetailSerializer
         return EpisodeListSerializer
 
 
-def admin_stats_view(request):
-    """Vue admin pour les statistiques avec graphiques matplotlib"""
-    if not request.user.is_staff:
-        from django.contrib.auth.decorators import login_required
-        from django.contrib.admin.views.decorators import staff_member_required
-        return staff_member_required(login_required(lambda: None))()
-    
-    # Graphique 1: Répartition des fruits par type
-    fruits = DevilFruit.objects.all()
-    fruit_types = {}
-    for fruit in fruits:
-        fruit_types[fruit.get_fruit_type_display()] = fruit_types.get(fruit.get_fruit_type_display(), 0) + 1
-    
+@api_view(['GET'])
+def stats_view(request):
+    """Statistiques agrégées (précalculées) pour les graphiques côté client"""
+    return Response(get_stats())
+
+
+SEARCH_DEFAULT_LIMIT = 10
+SEARCH_MAX_LIMIT = 50
+
+
+@api_view(['GET'])
+def search_view(request):
+    """Recherche transverse (personnages, fruits, équipages, arcs) pour l'autocomplétion"""
+    query = request.query_params.get('q', '')
+    try:
+        limit = int(request.query_params.get('limit', SEARCH_DEFAULT_LIMIT))
+    except ValueError:
+        limit = SEARCH_DEFAULT_LIMIT
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    return Response({'query': query, 'results': autocomplete_index.search(query, limit, SEARCH_KINDS)})
+
+
+GRAPH_MAX_DEPTH = 4
+GRAPH_MAX_PATH_LENGTH = 12
+GRAPH_DEFAULT_LIMIT = 200
+GRAPH_MAX_LIMIT = 5000
+
+
+def _graph_node(request, param):
+    """Nœud désigné par ?<param>=<type>:<id> (ex: character:1)"""
+    value = request.query_params.get(param, '')
+    kind, _, pk = value.partition(':')
+    if kind not in GRAPH_KINDS or not pk.isdigit():
+        raise ValidationError({param: f"Format attendu: <type>:<id>, type parmi {', '.join(GRAPH_KINDS)}."})
+    node = graph_index.get_node(kind, int(pk))
+    if node is None:
+        raise NotFound(f'{value} introuvable.')
+    return node
+
+
+def _graph_kinds(request, param):
+    value = request.query_params.get(param)
+    if not value:
+        return None
+    kinds = {kind.strip() for kind in value.split(',') if kind.strip()}
+    unknown = kinds - set(GRAPH_KINDS)
+    if unknown:
+        raise ValidationError({param: f"Types inconnus: {', '.join(sorted(unknown))}."})
+    return kinds
+
+
+def _graph_int(request, param, default, maximum):
+    try:
+        value = int(request.query_params.get(param, default))
+    except ValueError:
+        raise ValidationError({param: 'Entier attendu.'})
+    return max(1, min(value, maximum))
+
+
+@api_view(['GET'])
+def graph_neighbors_view(request):
+    """Voisins directs d'un nœud: /api/graph/neighbors/?node=character:1[&types=crew,fruit]"""
+    node = _graph_node(request, 'node')
+    return Response({
+        'node': graph_index.describe(node),
+        'neighbors': graph_index.neighbors(node, _graph_kinds(request, 'types')),
+    })
+
+
+@api_view(['GET'])
+def graph_expand_view(request):
+    """Nœuds à k sauts au plus: /api/graph/expand/?node=crew:1&depth=2[&types=...][&limit=...]"""
+    node = _graph_node(request, 'node')
+    depth = _graph_int(request, 'depth', 1, GRAPH_MAX_DEPTH)
+    nodes, truncated = graph_index.expand(
+        node, depth, _graph_int(request, 'limit', GRAPH_DEFAULT_LIMIT, GRAPH_MAX_LIMIT), _graph_kinds(request, 'types')
+    )
+    return Response({'node': graph_index.describe(node), 'depth': depth, 'nodes': nodes, 'truncated': truncated})
+
+
+@api_view(['GET'])
+def graph_path_view(request):
+    """Plus court chemin: /api/graph/path/?from=character:1&to=character:42[&via=crew,fruit]"""
+    source, target = _graph_node(request, 'from'), _graph_node(request, 'to')
+    path = graph_index.shortest_path(
+        source, target, _graph_int(request, 'max_length', GRAPH_MAX_PATH_LENGTH, GRAPH_MAX_PATH_LENGTH),
+        _graph_kinds(request, 'via')
+    )
+    if path is None:
+        raise NotFound('Aucun chemin entre ces deux nœuds.')
+    steps = [graph_index.describe(path[0])]
+    for previous, node in zip(path, path[1:]):
+        steps.append(dict(graph_index.describe(node), relation=graph_index.relation(previous, node)))
+    return Response({'length': len(path) - 1, 'path': steps})
+
+
+STATS_CHART_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def _render_chart(key, data, draw):
+    """Rend un graphique matplotlib en PNG base64, mis en cache selon les données affichées"""
+    fingerprint = hashlib.sha1(repr(data).encode()).hexdigest()
+    cache_key = f'admin_stats:{key}:{fingerprint}'
+    image_base64 = cache.get(cache_key)
+    if image_base64 is None:
+        fig = draw(data)
+        plt.tight_layout()
+        buffer = BytesIO()
+        plt.savefig(buffer, format='png', dpi=100)
+        image_base64 = base64.b64encode(buffer.getvalue()).decode()
+        plt.close(fig)
+        cache.set(cache_key, image_base64, STATS_CHART_CACHE_TIMEOUT)
+    return image_base64
+
+
+def _draw_fruit_types(fruit_types):
     fig1, ax1 = plt.subplots(figsize=(8, 6))
     if fruit_types:
-        ax1.pie(fruit_types.values(), labels=fruit_types.keys(), autopct='%1.1f%%', startangle=90)
+        ax1.pie([c[1] for c in fruit_types], labels=[c[0] for c in fruit_types], autopct='%1.1f%%', startangle=90)
         ax1.set_title('Répartition des fruits du démon par type')
     else:
         ax1.text(0.5, 0.5, 'Aucune donnée disponible', ha='center', va='center', transform=ax1.transAxes)
         ax1.set_title('Répartition des fruits du démon par type')
-    
-    plt.tight_layout()
-    buffer1 = BytesIO()
-    plt.savefig(buffer1, format='png', dpi=100)
-    buffer1.seek(0)
-    image1_base64 = base64.b64encode(buffer1.getvalue()).decode()
-    plt.close(fig1)
-    
-    # Graphique 2: Top 10 équipages par nombre de membres
-    crews = Crew.objects.all()
-    crew_member_counts = []
-    for crew in crews:
-        member_count = crew.members.count()
-        crew_member_counts.append((crew.name, member_count))
-    
-    crew_member_counts.sort(key=lambda x: x[1], reverse=True)
-    top_10 = crew_member_counts[:10]
-    
+    return fig1
+
+
+def _draw_top_crews(top_10):
     fig2, ax2 = plt.subplots(figsize=(10, 6))
     if top_10:
         names = [c[0] for c in top_10]
@@ -134,16 +313,20 @@ def admin_stats_view(request):
     else:
         ax2.text(0.5, 0.5, 'Aucune donnée disponible', ha='center', va='center', transform=ax2.transAxes)
         ax2.set_title('Top 10 équipages par nombre de membres')
+    return fig2
+
+
+@staff_member_required
+def admin_stats_view(request):
+    """Vue admin pour les statistiques avec graphiques matplotlib"""
+    stats = get_stats()
+    # Graphique 1: Répartition des fruits par type
+    fruit_types = [(f['label'], f['count']) for f in stats['fruit_types']]
+    # Graphique 2: Top 10 équipages par nombre de membres
+    top_10 = [(c['name'], c['member_count']) for c in stats['top_crews']]
     
-    plt.tight_layout()
-    buffer2 = BytesIO()
-    plt.savefig(buffer2, format='png', dpi=100)
-    buffer2.seek(0)
-    image2_base64 = base64.b64encode(buffer2.getvalue()).decode()
-    plt.close(fig2)
-    
+    # Les PNG ne sont recalculés que si les données agrégées ont changé
     return render(request, 'admin/stats.html', {
-        'graph1': image1_base64,
-        'graph2': image2_base64,
+        'graph1': _render_chart('fruit_types', fruit_types, _draw_fruit_types),
+        'graph2': _render_chart('top_crews', top_10, _draw_top_crews),
     })
-
@@ -4,9 +4,19 @@ ASGI config for opkb project.
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'opkb.settings')
 
 application = get_asgi_application()
 
+from knowledge.autocomplete import preload  # noqa: E402
+
+preload()
+
+# uvicorn ne sert pas les fichiers statiques (runserver le fait en DEBUG)
+if settings.DEBUG:
+    from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
+
+    application = ASGIStaticFilesHandler(application)
@@ -125,15 +125,70 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # REST Framework
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'knowledge.pagination.KnowledgeCursorPagination',
     'PAGE_SIZE': 10,
+    'DEFAULT_RENDERER_CLASSES': [
+        'knowledge.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_FILTER_BACKENDS': [
-        'rest_framework.filters.SearchFilter',
-        'rest_framework.filters.OrderingFilter',
+        'knowledge.filters.FullTextSearchFilter',
+        'knowledge.filters.RankedOrderingFilter',
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
 }
 
+# Moteur de recherche plein texte: 'auto', 'sqlite' (FTS5), 'oracle' (Oracle Text),
+# 'python' (index en mémoire) ou chemin vers une sous-classe de knowledge.search.SearchBackend
+SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'auto')
+
+# Index d'autocomplétion (/api/search/, widgets de l'admin) construit au démarrage du
+# serveur (opkb.wsgi, opkb.asgi) plutôt qu'à la première recherche
+AUTOCOMPLETE_PRELOAD = os.environ.get('AUTOCOMPLETE_PRELOAD', 'True') == 'True'
+
+# Cache (statistiques, réponses de l'API, versions du graphe et de l'autocomplétion): mémoire
+# locale par défaut, propre à chaque processus. Réservé à un serveur à processus unique
+# (runserver): avec plusieurs processus (uvicorn --workers, gunicorn), une modification
+# n'invaliderait que le cache du processus qui l'a faite, les autres serviraient des réponses
+# périmées jusqu'à API_CACHE_TIMEOUT. Ils doivent partager un cache, ex:
+# CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache avec
+# CACHE_LOCATION=/var/tmp/opkb_cache (réglage des services de docker-compose.yml)
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'opkb'),
+    }
+}
+
+# Durée de conservation des réponses de l'API en cache (invalidées à chaque modification)
+API_CACHE_TIMEOUT = int(os.environ.get('API_CACHE_TIMEOUT', 60 * 60))
+
+# max-age envoyé au navigateur (Cache-Control); 0: revalidation par ETag à chaque visite
+API_CACHE_MAX_AGE = int(os.environ.get('API_CACHE_MAX_AGE', 0))
+
+# Listes de l'API construites depuis values() au lieu des serializers (voir knowledge/listing.py)
+API_FAST_LISTS = os.environ.get('API_FAST_LISTS', 'False') == 'True'
+
+# Nombre maximal d'ids acceptés par /api/<ressource>/batch/?ids=
+API_BATCH_MAX_IDS = int(os.environ.get('API_BATCH_MAX_IDS', 100))
+
+# Taille de page maximale demandable via ?page_size=
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 100))
+
+# Listes de l'admin: nombre de lignes estimé au-delà de ce seuil (liste complète), compté au
+# plus jusqu'à ADMIN_COUNT_CAP (liste filtrée), voir knowledge/pagination.py
+ADMIN_EXACT_COUNT_LIMIT = int(os.environ.get('ADMIN_EXACT_COUNT_LIMIT', 100_000))
+ADMIN_COUNT_CAP = int(os.environ.get('ADMIN_COUNT_CAP', 10_000))
+
+# Threads d'exécution des exports en arrière-plan (0: jobs exécutés par manage.py run_export_jobs)
+EXPORT_JOB_WORKERS = int(os.environ.get('EXPORT_JOB_WORKERS', 2))
+
+# Job « en cours » sans avancement depuis ce délai (secondes): processus arrêté, job remis en attente
+EXPORT_JOB_STALE_TIMEOUT = int(os.environ.get('EXPORT_JOB_STALE_TIMEOUT', 10 * 60))
+
+# Processus de rendu des fiches PDF exportées en ZIP (0 ou 1: rendu dans le thread du job)
+EXPORT_PDF_PROCESSES = int(os.environ.get('EXPORT_PDF_PROCESSES', min(4, os.cpu_count() or 1)))
+
 # CORS
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:8000",
@@ -9,8 +9,9 @@ from django.views.generic import TemplateView
 from knowledge import views as knowledge_views
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
+    # Avant admin.site.urls, sinon le catch-all de l'admin renvoie un 404
     path('admin/stats/', knowledge_views.admin_stats_view, name='admin_stats'),
+    path('admin/', admin.site.urls),
     path('api/', include('knowledge.urls')),
     # Catch-all pour SPA React
     re_path(r'^(?!api|admin|static|media).*$', TemplateView.as_view(template_name='index.html')),
@@ -10,3 +10,6 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'opkb.settings')
 
 application = get_wsgi_application()
 
+from knowledge.autocomplete import preload  # noqa: E402
+
+preload()